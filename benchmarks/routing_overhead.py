@@ -0,0 +1,120 @@
+'''
+Micro-benchmark of the host-side overhead of routing an LED to its cathode pin, anode channel,
+and driver. The Arduino class is constructed against a stubbed Telemetrix board which accepts
+every command without doing any I/O, so the timings only include work done in Python.
+
+Three measurements are reported for every LED in the configuration file:
+    routing: the lookup of (pin, channel, driver) for one LED, using the NumPy lookups
+             telemetrix_controller originally made on every call ('before') and the compiled
+             integer tables it uses now ('after')
+    LED_on/LED_off: one LED_on and LED_off call pair through the full controller, including the
+                    shadow state checks and the TelemetrixPCA9685 message encoding
+    event log: the same call pair with an EventLog recording the LEDs each call changes
+
+Run from the repository root:
+    python benchmarks/routing_overhead.py [config_file] [--repeat N]
+'''
+
+import argparse
+import concurrent.futures
+import contextlib
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import telemetrix_controller
+
+
+class StubBoard:
+    '''
+    Stand-in for telemetrix.Telemetrix which accepts every command without doing any I/O.
+    I2C reads are answered immediately with zeros.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self.digital_callbacks = {}
+
+    def i2c_read(self, address, register, number_of_bytes, callback=None, i2c_port=0,
+                 write_register=True):
+        callback([10, i2c_port, number_of_bytes, address, register] +
+                 [0] * number_of_bytes + [0.0])
+
+    def i2c_read_future(self, address, register, number_of_bytes, i2c_port=0, **kwargs):
+        future = concurrent.futures.Future()
+        self.i2c_read(address, register, number_of_bytes, callback=future.set_result,
+                      i2c_port=i2c_port)
+        return future
+
+    def batch(self, *args, **kwargs):
+        return contextlib.nullcontext()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def legacy_route(attributes, n):
+    '''
+    Routes LED number n the way telemetrix_controller did before the routing tables were
+    compiled: a float-to-int conversion of the _LEDs entry and an np.where lookup of the driver.
+    '''
+    LEDs = attributes['LEDs']
+    num_cols = LEDs.shape[1]
+    r, c = int(n / num_cols), n % num_cols
+    pin, channel, address = LEDs[r, c].astype(int)
+    driver = attributes['Drivers'][np.where(attributes['Addresses'] == address)[0][0]]
+    return pin, channel, driver
+
+
+def table_route(arduino, n):
+    '''
+    Routes LED number n with the compiled routing tables.
+    '''
+    address = arduino._led_addresses[n]
+    return arduino._led_pins[n], arduino._led_channels[n], arduino._drivers_by_address[address]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('config', nargs='?',
+                        default=os.path.join(os.path.dirname(__file__), '..', 'warm_test.txt'))
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='number of passes over every LED in the array')
+    args = parser.parse_args()
+
+    telemetrix_controller.Telemetrix = StubBoard
+    arduino = telemetrix_controller.Arduino(args.config)
+    num_LEDs = len(arduino._led_pins)
+    calls = num_LEDs * args.repeat
+
+    attributes = arduino.get_attributes()
+
+    def sweep(route, target):
+        for n in range(num_LEDs):
+            route(target, n)
+
+    def toggle():
+        for n in range(num_LEDs):
+            arduino.LED_on(n)
+            arduino.LED_off(n)
+
+    before = timeit.timeit(lambda: sweep(legacy_route, attributes), number=args.repeat) / calls
+    after = timeit.timeit(lambda: sweep(table_route, arduino), number=args.repeat) / calls
+    # best of several runs, since the event log's overhead is small next to the call itself
+    cycle = min(timeit.repeat(toggle, number=args.repeat, repeat=5)) / calls
+    arduino._event_log = telemetrix_controller.EventLog(capacity=2 * calls)
+    logged = min(timeit.repeat(toggle, number=args.repeat, repeat=5)) / calls
+
+    print(f'{num_LEDs} LEDs, {args.repeat} passes')
+    print(f'routing before:        {before * 1e6:8.2f} us/LED')
+    print(f'routing after:         {after * 1e6:8.2f} us/LED  ({before / after:.1f}x faster)')
+    print(f'LED_on + LED_off:      {cycle * 1e6:8.2f} us/LED')
+    print(f'with event log:        {logged * 1e6:8.2f} us/LED  '
+          f'(+{(logged - cycle) / 2 * 1e9:.0f} ns/call)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+'''
+Benchmark suite for the full telemetrix_controller stack: Arduino, TelemetrixPCA9685, Telemetrix,
+and the transport, run against a telemetrix_simulator.SimulatedArduino over TCP or a
+pseudo-terminal. Results are written as JSON so they can be compared across changes.
+
+Measurements:
+    startup: time to construct an Arduino object, including Telemetrix and driver
+             initialization and the first global_off
+    LED_on/LED_off: LEDs per second for a sweep turning every LED on then off
+    global_off: time per global_off call, including the readback confirming the LEDs are off
+    send_command: bytes per second written by Telemetrix._send_command for digital_write
+                  commands, both one write per command and coalesced with Telemetrix.batch
+    report_parse: reports per second received and dispatched by Telemetrix for a flood of
+                  loop back reports, and the CPU time its receive and reporter threads spend
+                  per kilobyte received
+    receivers: report_parse over a pseudo-terminal for each serial receive thread: reading one
+               byte per poll of in_waiting as _serial_receiver originally did ('polling'), and
+               reading every available byte in one call ('chunked')
+    loop_back: round trip latency of single loop back commands
+    idle: fraction of a CPU used by the receive and reporter threads while no data arrives
+    discovery: time for Telemetrix to find its board by auto com port detection among several
+               simulated boards on pseudo-terminals, with only the last port holding the board
+               with the right arduino_instance_id; measured probing one port at a time as
+               _find_arduino originally did ('sequential'), probing every port at once without
+               the discovery cache ('parallel'), and with the discovery cache holding the
+               board's port ('cached')
+
+Every throughput measurement ends with a loop back round trip, so it includes the time for the
+simulated board to handle every command that was sent.
+
+Run from the repository root:
+    python benchmarks/run_benchmarks.py [--transport tcp|pty] [--rows R] [--cols C]
+                                        [--baud BAUD] [--boot-poll-interval SECONDS]
+                                        [--no-receivers] [--discovery-ports N]
+                                        [--arduino-wait SECONDS]
+                                        [--output FILE]
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetrix_controller
+from serial.tools import list_ports
+from serial.tools.list_ports_common import ListPortInfo
+from telemetrix.telemetrix import Telemetrix
+from telemetrix_simulator import SimulatedArduino
+
+
+class SequentialTelemetrix(Telemetrix):
+    '''
+    Telemetrix which probes candidate ports one at a time, each only after the previous port
+    failed to match, as _find_arduino did before the ports were probed in parallel.
+    '''
+
+    def _probe_ports(self, ports):
+        for port in ports:
+            match = super()._probe_ports([port])
+            if match:
+                return match
+        return None
+
+
+class PollingTelemetrix(Telemetrix):
+    '''
+    Telemetrix whose serial receive thread polls in_waiting and reads a single byte at a time,
+    sleeping for sleep_tune when no byte has arrived, as _serial_receiver did before it read
+    every available byte in one call.
+    '''
+
+    def _serial_receiver(self):
+        self.run_event.wait()
+        if self.ip_address:
+            return
+
+        while self._is_running() and not self.shutdown_flag:
+            try:
+                if self.serial_port.in_waiting:
+                    self.the_queue.put(self.serial_port.read())
+                else:
+                    time.sleep(self.sleep_tune)
+            except OSError:
+                if self.shutdown_flag:
+                    break
+
+
+def write_config(file, rows, cols):
+    '''
+    Writes a configuration file for a rows x cols LED array, with one pin per row starting at
+    pin 2 and 16 channels per driver starting at address 64.
+    '''
+    file.write('# Row/Column Number, Pin/Channel Number, Driver Address (0 for N/A)\n')
+    for row in range(rows):
+        file.write(f'{row + 1} {row + 2} 0\n')
+    for col in range(cols):
+        file.write(f'{col + 1} {col % 16} {64 + col // 16}\n')
+    file.flush()
+
+
+def sync(board, timeout=10):
+    '''
+    Sends a loop back command and waits for its reply, so every command sent before it has been
+    handled by the board.
+    '''
+    replied = threading.Event()
+    board.loop_back('S', callback=lambda data: replied.set())
+    if not replied.wait(timeout):
+        raise RuntimeError('Loop back reply timed out')
+
+
+def timed(function, repeat=1):
+    '''
+    Returns the elapsed time.perf_counter() seconds of calling function repeat times.
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return time.perf_counter() - start
+
+
+def thread_cpu(threads):
+    '''
+    Returns the CPU seconds used so far by the given threads, or by the whole process where
+    per-thread CPU clocks are not available.
+    '''
+    try:
+        return sum(time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+                   for thread in threads)
+    except (AttributeError, OSError):
+        return time.process_time()
+
+
+def bench_startup(config, board_kwargs):
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        arduino = telemetrix_controller.Arduino(config, **board_kwargs)
+        elapsed = time.perf_counter() - start
+    return arduino, {'seconds': elapsed}
+
+
+def bench_LED_sweep(arduino, board, simulator, repeat):
+    num_LEDs = len(arduino._led_pins)
+    commands, received = simulator.command_count, simulator.byte_count
+
+    def sweep():
+        for n in range(num_LEDs):
+            arduino.LED_on(n)
+            arduino.LED_off(n)
+        sync(board)
+
+    elapsed = timed(sweep, repeat)
+    return {'LEDs': num_LEDs,
+            'LEDs_per_second': num_LEDs * repeat / elapsed,
+            'commands_per_LED': (simulator.command_count - commands) / (num_LEDs * repeat),
+            'bytes_per_LED': (simulator.byte_count - received) / (num_LEDs * repeat)}
+
+
+def bench_global_off(arduino, repeat):
+    elapsed = timed(arduino.global_off, repeat)
+    return {'seconds_per_call': elapsed / repeat}
+
+
+def bench_send_command(board, simulator, count, batched=False):
+    received = simulator.byte_count
+
+    def send():
+        with board.batch() if batched else contextlib.nullcontext():
+            for k in range(count):
+                board.digital_write(2, k & 1)
+        sync(board)
+
+    elapsed = timed(send)
+    return {'commands_per_second': count / elapsed,
+            'bytes_per_second': (simulator.byte_count - received) / elapsed}
+
+
+def bench_report_parse(board, count):
+    threads = [board.the_data_receive_thread, board.the_reporter_thread]
+    done = threading.Event()
+    replies = []
+
+    def on_report(data):
+        replies.append(data)
+        if len(replies) == count:
+            done.set()
+
+    with board.capture_commands() as commands:
+        for _ in range(count):
+            board.loop_back('R')
+    board.loop_back_callback = on_report
+
+    start, cpu = time.perf_counter(), thread_cpu(threads)
+    board.write_encoded(bytes(commands))
+    if not done.wait(60):
+        raise RuntimeError(f'Only {len(replies)} of {count} loop back reports were received')
+    elapsed, cpu = time.perf_counter() - start, thread_cpu(threads) - cpu
+    # every loop back report is 3 bytes long
+    kilobytes = 3 * count / 1024
+    return {'reports_per_second': count / elapsed,
+            'receive_cpu_seconds_per_kilobyte': cpu / kilobytes}
+
+
+def bench_receivers(count, arduino_wait, boot_poll_interval):
+    results = {}
+    for name, board_class in (('polling', PollingTelemetrix), ('chunked', Telemetrix)):
+        simulator = SimulatedArduino()
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                board = board_class(com_port=simulator.open_pty(), arduino_wait=arduino_wait,
+                                    boot_poll_interval=boot_poll_interval)
+            try:
+                results[name] = bench_report_parse(board, count)
+            finally:
+                with contextlib.redirect_stdout(sys.stderr):
+                    board.shutdown()
+        finally:
+            simulator.close()
+        results[name]['simulator_errors'] = simulator.errors
+    return results
+
+
+def bench_loop_back(board, count):
+    latencies = []
+    for _ in range(count):
+        latencies.append(timed(lambda: sync(board)))
+    latencies.sort()
+    return {'mean_seconds': statistics.mean(latencies),
+            'median_seconds': statistics.median(latencies),
+            'p99_seconds': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+            'max_seconds': latencies[-1]}
+
+
+def bench_idle(board, seconds=1):
+    threads = [board.the_data_receive_thread, board.the_reporter_thread]
+    cpu = thread_cpu(threads)
+    time.sleep(seconds)
+    return {'cpu_fraction': (thread_cpu(threads) - cpu) / seconds}
+
+
+def bench_discovery(num_ports, arduino_wait, boot_poll_interval):
+    simulators = [SimulatedArduino(arduino_id=1 if k == num_ports - 1 else 100 + k)
+                  for k in range(num_ports)]
+    ports = []
+    for k, simulator in enumerate(simulators):
+        port = ListPortInfo(simulator.open_pty(), skip_link_detection=True)
+        # an Arduino Nano Every's USB vendor and product id
+        port.vid, port.pid, port.serial_number = 0x2341, 0x0058, f'SIM{k}'
+        ports.append(port)
+
+    comports = list_ports.comports
+    list_ports.comports = lambda *args, **kwargs: list(ports)
+    results = {'ports': num_ports, 'arduino_wait': arduino_wait}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = os.path.join(directory, 'discovery.json')
+            for name, board_class, discovery_cache in (('sequential', SequentialTelemetrix, None),
+                                                       ('parallel', Telemetrix, None),
+                                                       # the first run fills the cache
+                                                       (None, Telemetrix, cache),
+                                                       ('cached', Telemetrix, cache)):
+                with contextlib.redirect_stdout(sys.stderr):
+                    start = time.perf_counter()
+                    board = board_class(arduino_wait=arduino_wait,
+                                        boot_poll_interval=boot_poll_interval,
+                                        discovery_cache=discovery_cache)
+                    elapsed = time.perf_counter() - start
+                    board.shutdown()
+                if name:
+                    results[name] = {'seconds': elapsed}
+    finally:
+        list_ports.comports = comports
+        for simulator in simulators:
+            simulator.close()
+    results['simulator_errors'] = [error for simulator in simulators
+                                   for error in simulator.errors]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transport', choices=['tcp', 'pty'], default='tcp')
+    parser.add_argument('--rows', type=int, default=32)
+    parser.add_argument('--cols', type=int, default=32)
+    parser.add_argument('--baud', type=int, default=None,
+                        help='serial baud rate for the simulated board to throttle to')
+    parser.add_argument('--boot-poll-interval', type=float, default=None,
+                        help='poll the serial board every BOOT_POLL_INTERVAL seconds while it '
+                             'resets instead of waiting the full arduino_wait')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of LED sweeps and global_off calls')
+    parser.add_argument('--count', type=int, default=2000,
+                        help='number of commands or reports for the transport benchmarks')
+    parser.add_argument('--no-receivers', action='store_true',
+                        help='skip the serial receive thread comparison')
+    parser.add_argument('--discovery-ports', type=int, default=4,
+                        help='number of simulated boards for the discovery benchmark; 0 skips it')
+    parser.add_argument('--arduino-wait', type=float, default=1,
+                        help='arduino_wait for the receivers and discovery benchmarks, in '
+                             'seconds')
+    parser.add_argument('--output', default=None, help='JSON file to write; default is stdout')
+    args = parser.parse_args()
+
+    addresses = range(64, 64 + (args.cols + 15) // 16)
+    simulator = SimulatedArduino(i2c_addresses=addresses, baud=args.baud)
+    if args.transport == 'tcp':
+        host, port = simulator.serve_tcp()
+        board_kwargs = {'ip_address': host, 'ip_port': port}
+    else:
+        board_kwargs = {'com_port': simulator.open_pty(),
+                        'boot_poll_interval': args.boot_poll_interval}
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as config:
+        write_config(config, args.rows, args.cols)
+        arduino, startup = bench_startup(config.name, board_kwargs)
+    board = arduino.get_attributes()['Board']
+
+    results = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'transport': args.transport,
+               'baud': args.baud,
+               'boot_poll_interval': args.boot_poll_interval,
+               'rows': args.rows,
+               'cols': args.cols,
+               'startup': startup,
+               'LED_sweep': bench_LED_sweep(arduino, board, simulator, args.repeat),
+               'global_off': bench_global_off(arduino, args.repeat),
+               'send_command': bench_send_command(board, simulator, args.count),
+               'send_command_batched': bench_send_command(board, simulator, args.count,
+                                                          batched=True),
+               'report_parse': bench_report_parse(board, args.count),
+               'loop_back': bench_loop_back(board, min(args.count, 200)),
+               'idle': bench_idle(board),
+               'simulator_errors': simulator.errors}
+    if not args.no_receivers:
+        results['receivers'] = bench_receivers(args.count, args.arduino_wait,
+                                               args.boot_poll_interval)
+    if args.discovery_ports > 0:
+        results['discovery'] = bench_discovery(args.discovery_ports, args.arduino_wait,
+                                               args.boot_poll_interval)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        board.shutdown()
+    simulator.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+'''
+This module compiles the configuration text files used by telemetrix_controller into typed routing
+tables. The configuration is validated while it is compiled, so wiring mistakes such as a pin used
+by two rows, a missing column, or a row on the Arduino Nano's RX or TX pin are reported before the
+board is connected, and the compiled tables are cached as a .npz file keyed by a hash of the
+configuration file's contents, so a configuration is only parsed and validated again after it
+changes.
+
+The module can also be run directly to check configuration files without connecting to a board:
+    python config_compiler.py warm_test.txt
+
+--------------
+University of Chicago South Pole Telescope Group
+'''
+
+import argparse
+import hashlib
+import os
+import sys
+import zipfile
+import numpy as np
+
+# Incremented whenever the compiled tables change, so that older cache files are not used
+COMPILER_VERSION = 1
+
+DEFAULT_CACHE_DIR = '~/.telemetrix_config_cache'
+
+# Pins 0 and 1 of the Arduino Nano are the RX and TX lines of its USB serial connection
+SERIAL_PINS = (0, 1)
+
+# Range of I2C addresses which a PCA9685 can be set to
+DRIVER_ADDRESSES = range(0x40, 0x80)
+
+class CompiledConfig:
+
+    '''
+    The CompiledConfig object holds the routing tables compiled from a configuration file. All
+    tables are int32 NumPy arrays. LED numbers count from the upper left corner of the LED array
+    left-to-right then downward, as in telemetrix_controller.Arduino.LED_on.
+
+    Attributes:
+        shape (tuple): (rows, columns) of the LED array
+        row_pins (1D array): cathode pin of each row
+        col_channels (1D array): anode channel of each column
+        col_addresses (1D array): driver address of each column's anode channel
+        addresses (1D array): sorted distinct driver addresses
+        LEDs (3D array): [cathode_pin, anode_channel, address] of each LED, indexed by row and
+                         column; the _LEDs attribute of telemetrix_controller.Arduino
+        led_pins (1D array): cathode pin of each LED, indexed by LED number
+        led_channels (1D array): anode channel of each LED, indexed by LED number
+        led_addresses (1D array): driver address of each LED, indexed by LED number
+
+    Methods:
+        __init__ (dunder): constructor
+        from_tables (public): builds a CompiledConfig from the row and column tables
+        save (public): writes the tables to a .npz file
+        load (public): reads the tables from a .npz file written by save
+    '''
+
+    TABLES = ('row_pins', 'col_channels', 'col_addresses', 'addresses', 'LEDs', 'led_pins',
+              'led_channels', 'led_addresses')
+
+    def __init__(self, tables):
+        '''
+        Constructor method for the CompiledConfig class. CompiledConfig objects should be created
+        through compile_config, from_tables, or load rather than directly.
+
+        Parameters:
+            self
+            tables (dict): array for each name in TABLES
+
+        Returns:
+            None
+        '''
+        for name in self.TABLES:
+            setattr(self, name, np.asarray(tables[name], dtype=np.int32))
+        self.shape = self.LEDs.shape[0:2]
+
+    @classmethod
+    def from_tables(cls, row_pins, col_channels, col_addresses):
+        '''
+        Builds a CompiledConfig from the row and column tables, deriving every other table.
+
+        Parameters:
+            cls
+            row_pins (1D array): cathode pin of each row
+            col_channels (1D array): anode channel of each column
+            col_addresses (1D array): driver address of each column's anode channel
+
+        Returns:
+            compiled (CompiledConfig obj)
+        '''
+        row_pins = np.asarray(row_pins, dtype=np.int32)
+        col_channels = np.asarray(col_channels, dtype=np.int32)
+        col_addresses = np.asarray(col_addresses, dtype=np.int32)
+        num_rows, num_cols = len(row_pins), len(col_channels)
+
+        LEDs = np.empty((num_rows, num_cols, 3), dtype=np.int32)
+        LEDs[:, :, 0] = row_pins[:, np.newaxis]
+        LEDs[:, :, 1] = col_channels
+        LEDs[:, :, 2] = col_addresses
+        return cls({'row_pins': row_pins,
+                    'col_channels': col_channels,
+                    'col_addresses': col_addresses,
+                    'addresses': np.unique(col_addresses),
+                    'LEDs': LEDs,
+                    'led_pins': LEDs[:, :, 0].ravel(),
+                    'led_channels': LEDs[:, :, 1].ravel(),
+                    'led_addresses': LEDs[:, :, 2].ravel()})
+
+    def save(self, file):
+        '''
+        Writes every table to a .npz file.
+
+        Parameters:
+            self
+            file (file obj): binary file to write to
+
+        Returns:
+            None
+        '''
+        np.savez(file, version=COMPILER_VERSION,
+                 **{name: getattr(self, name) for name in self.TABLES})
+
+    @classmethod
+    def load(cls, file_path):
+        '''
+        Reads every table from a .npz file written by save.
+
+        Parameters:
+            cls
+            file_path (str): path of the .npz file
+
+        Returns:
+            compiled (CompiledConfig obj)
+        '''
+        with np.load(file_path) as data:
+            if int(data['version']) != COMPILER_VERSION:
+                raise ValueError(f'{file_path} was written by compiler version '
+                                 f'{int(data["version"])}')
+            return cls({name: data[name] for name in cls.TABLES})
+
+def validate_config(config):
+    '''
+    Checks a configuration for wiring mistakes.
+
+    Parameters:
+        config (2D array): configuration file's data, with axis 1 as [row_or_col_number,
+                           pin_or_channel_number, driver_address], where driver_address is 0 for
+                           a pin
+
+    Returns:
+        errors (list): description of each mistake found; empty if the configuration is valid
+    '''
+    config = np.asarray(config)
+    if config.ndim != 2 or config.shape[1] != 3:
+        return [f'Configuration must have 3 columns per line, not shape {config.shape}']
+    if np.any(config != np.round(config)):
+        return ['Configuration values must all be integers']
+    config = config.astype(int)
+
+    errors = []
+    rows = config[config[:, 2] == 0]
+    cols = config[config[:, 2] != 0]
+
+    for kind, entries in (('row', rows), ('column', cols)):
+        if not len(entries):
+            errors.append(f'No {kind}s are configured')
+            continue
+        numbers, counts = np.unique(entries[:, 0], return_counts=True)
+        if numbers[0] < 1:
+            errors.append(f'{kind.capitalize()} numbers must start from 1, not {numbers[0]}')
+        for number, count in zip(numbers, counts):
+            if count > 1:
+                errors.append(f'{kind.capitalize()} {number} is configured {count} times')
+        missing = np.setdiff1d(np.arange(1, numbers[-1] + 1), numbers)
+        if len(missing):
+            errors.append(f'{kind.capitalize()}s {missing.tolist()} are missing')
+
+    pins, counts = np.unique(rows[:, 1], return_counts=True)
+    for pin in pins[counts > 1]:
+        errors.append(f'Pin {pin} is used by rows {rows[rows[:, 1] == pin][:, 0].tolist()}')
+    for pin in pins[np.isin(pins, SERIAL_PINS)]:
+        errors.append(f'Pin {pin} is one of the Arduino Nano\'s RX and TX pins, which carry '
+                      f'its USB serial connection and cannot drive a row (LED Array PCB v3.0 '
+                      f'routes them to the D-sub 37 connector; see KiCad Files/README.md)')
+    if len(pins) and pins[0] < 0:
+        errors.append(f'Pin numbers cannot be negative, not {pins[0]}')
+
+    for channel in np.unique(cols[(cols[:, 1] < 0) | (cols[:, 1] > 15)][:, 1]):
+        errors.append(f'Channel {channel} is not between 0 and 15')
+    for address in np.unique(cols[~np.isin(cols[:, 2], DRIVER_ADDRESSES)][:, 2]):
+        errors.append(f'Driver address {address} is not a PCA9685 address (64 to 127)')
+    channels, counts = np.unique(cols[:, 1:3], axis=0, return_counts=True)
+    for channel, address in channels[counts > 1]:
+        used_by = cols[(cols[:, 1] == channel) & (cols[:, 2] == address)][:, 0].tolist()
+        errors.append(f'Channel {channel} of driver {address} is used by columns {used_by}')
+
+    return errors
+
+def compile_array(config):
+    '''
+    Validates a configuration and compiles it into routing tables.
+
+    Parameters:
+        config (2D array): configuration file's data, as in validate_config
+
+    Returns:
+        compiled (CompiledConfig obj)
+    '''
+    errors = validate_config(config)
+    if errors:
+        raise ValueError('Invalid LED array configuration:\n    ' + '\n    '.join(errors))
+
+    config = np.asarray(config).astype(int)
+    rows = config[config[:, 2] == 0]
+    cols = config[config[:, 2] != 0]
+    rows = rows[np.argsort(rows[:, 0])]
+    cols = cols[np.argsort(cols[:, 0])]
+    return CompiledConfig.from_tables(rows[:, 1], cols[:, 1], cols[:, 2])
+
+def compile_config(config, cache_dir=DEFAULT_CACHE_DIR):
+    '''
+    Compiles a configuration file into routing tables, validating it first. The compiled tables
+    are cached in cache_dir under a SHA-256 hash of the file's contents, so an unchanged file is
+    loaded from the cache without being parsed or validated again. The cache is only an
+    optimization, so errors reading or writing it are ignored.
+
+    Parameters:
+        config (str | 2D array | CompiledConfig obj): file path of the configuration file, or
+                                                     the configuration file's already loaded
+                                                     data, which is compiled without the cache;
+                                                     a CompiledConfig obj is returned as is
+        cache_dir (str | None): directory of the cache; None disables the cache
+
+    Returns:
+        compiled (CompiledConfig obj)
+    '''
+    if isinstance(config, CompiledConfig):
+        return config
+    if not isinstance(config, str):
+        return compile_array(config)
+
+    with open(config, 'rb') as file:
+        contents = file.read()
+    if cache_dir is None:
+        return compile_array(np.loadtxt(contents.decode().splitlines(), ndmin=2))
+
+    cache_dir = os.path.expanduser(cache_dir)
+    digest = hashlib.sha256(b'%d\0' % COMPILER_VERSION + contents).hexdigest()
+    cache_path = os.path.join(cache_dir, f'{digest}.npz')
+    try:
+        return CompiledConfig.load(cache_path)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+
+    compiled = compile_array(np.loadtxt(contents.decode().splitlines(), ndmin=2))
+    temporary = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temporary, 'wb') as file:
+            compiled.save(file)
+        os.replace(temporary, cache_path)
+    except OSError:
+        pass
+    return compiled
+
+def main():
+    parser = argparse.ArgumentParser(description='Validates and compiles LED array configuration '
+                                                 'files.')
+    parser.add_argument('files', nargs='+', help='configuration files to check')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='compile without reading or writing the cache')
+    args = parser.parse_args()
+
+    failed = False
+    for file_path in args.files:
+        try:
+            compiled = compile_config(file_path,
+                                      cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR)
+        except (OSError, ValueError) as error:
+            print(f'{file_path}: {error}')
+            failed = True
+            continue
+        print(f'{file_path}: {compiled.shape[0]} rows x {compiled.shape[1]} columns, drivers '
+              f'{compiled.addresses.tolist()}')
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -105,6 +105,22 @@ class PrivateConstants:
 
     TELEMETRIX_VERSION = "1.40"
 
+    # USB vendor ids of Arduino boards and of the USB-serial converters
+    # used on Arduino compatible boards. _find_arduino only opens ports
+    # with one of these vendor ids.
+    USB_VENDOR_IDS = (0x2341,  # Arduino
+                      0x2A03,  # Arduino.org
+                      0x1A86,  # WCH CH340
+                      0x0403,  # FTDI
+                      0x10C4,  # Silicon Labs CP210x
+                      0x067B,  # Prolific
+                      0x239A,  # Adafruit
+                      0x1B4F,  # SparkFun
+                      0x16C0,  # PJRC Teensy
+                      0x2E8A,  # Raspberry Pi Pico
+                      0x303A,  # Espressif
+                      0x0483)  # STMicroelectronics
+
     # reporting control
     REPORTING_DISABLE_ALL = 0
     REPORTING_ANALOG_ENABLE = 1
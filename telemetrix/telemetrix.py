@@ -15,11 +15,16 @@
  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 """
+import concurrent.futures
+import json
+import os
+import queue
 import socket
 import sys
 import threading
 import time
 from collections import deque
+from contextlib import contextmanager
 
 import serial
 # noinspection PyPackageRequirementscd
@@ -45,7 +50,10 @@ class Telemetrix(threading.Thread):
     def __init__(self, com_port=None, arduino_instance_id=1,
                  arduino_wait=4, sleep_tune=0.000001,
                  shutdown_on_exception=True,
-                 ip_address=None, ip_port=31335):
+                 ip_address=None, ip_port=31335, receive_timeout=0.1,
+                 boot_poll_interval=None,
+                 usb_ids=PrivateConstants.USB_VENDOR_IDS,
+                 discovery_cache='~/.telemetrix_discovery.json'):
 
         """
 
@@ -57,9 +65,12 @@ class Telemetrix(threading.Thread):
                                     arduino-telemetrix sketch.
 
         :param arduino_wait: Amount of time to wait for an Arduino to
-                             fully reset itself.
+                             fully reset itself. If boot_poll_interval
+                             is set, this is the maximum time to wait.
 
-        :param sleep_tune: A tuning parameter (typically not changed by user)
+        :param sleep_tune: A tuning parameter (typically not changed by user).
+                           No longer used; the reporter thread waits on
+                           received data instead of sleeping.
 
         :param shutdown_on_exception: call shutdown before raising
                                       a RunTimeError exception, or
@@ -68,6 +79,25 @@ class Telemetrix(threading.Thread):
         :param ip_address: ip address of tcp/ip connected device.
 
         :param ip_port: ip port of tcp/ip connected device
+
+        :param receive_timeout: Maximum time in seconds the serial receive
+                                thread blocks waiting for data before
+                                checking for shutdown or a port change
+
+        :param boot_poll_interval: If set, send an are_u_there request every
+                                   boot_poll_interval seconds while the
+                                   Arduino resets, and continue as soon as
+                                   it replies instead of always waiting
+                                   arduino_wait seconds
+
+        :param usb_ids: USB vendor ids, or (vendor id, product id) pairs,
+                        of the serial ports auto com port detection will
+                        open. None opens every USB serial port.
+
+        :param discovery_cache: File where auto com port detection records
+                                the port each arduino_instance_id was found
+                                on, so that port is tried first next time.
+                                None disables the cache.
         """
 
         # initialize threading parent
@@ -107,10 +137,17 @@ class Telemetrix(threading.Thread):
         self.arduino_instance_id = arduino_instance_id
         self.arduino_wait = arduino_wait
         self.sleep_tune = sleep_tune
+        self.receive_timeout = receive_timeout
+        self.boot_poll_interval = boot_poll_interval
+        self.usb_ids = usb_ids
+        if discovery_cache:
+            discovery_cache = os.path.expanduser(discovery_cache)
+        self.discovery_cache = discovery_cache
         self.shutdown_on_exception = shutdown_on_exception
 
-        # create a deque to receive and process data from the arduino
-        self.the_deque = deque()
+        # create a queue of received chunks of data from the arduino
+        # for the reporter thread to process
+        self.the_queue = queue.SimpleQueue()
 
         # The report_dispatch dictionary is used to process
         # incoming report messages by looking up the report message
@@ -179,6 +216,17 @@ class Telemetrix(threading.Thread):
         self.i2c_callback = None
         self.i2c_callback2 = None
 
+        # outstanding i2c reads, keyed by (i2c port, address, register).
+        # Each value is a deque of [callback, deadline, future] entries in
+        # the order the reads were requested.
+        self.i2c_pending = {}
+        self.i2c_pending_lock = threading.Lock()
+        # number of abandoned reads, keyed like i2c_pending, whose replies
+        # are still to arrive
+        self.i2c_expired = {}
+        # earliest deadline of the outstanding i2c reads, or None
+        self.i2c_next_deadline = None
+
         self.i2c_1_active = False
         self.i2c_2_active = False
 
@@ -204,12 +252,24 @@ class Telemetrix(threading.Thread):
         # socket for tcp/ip communications
         self.sock = None
 
+        # set by the tcp/ip receive thread if the connection is closed
+        # by the device
+        self.connection_lost = False
+
         # flag to indicate we are in shutdown mode
         self.shutdown_flag = False
 
         # debug loopback callback method
         self.loop_back_callback = None
 
+        # when set by capture_commands, encoded commands are appended
+        # here instead of being written to the transport
+        self.captured_commands = None
+
+        # per-thread state of the batch opened by batch(); buffer is
+        # None outside of a batch
+        self.batch_state = threading.local()
+
         # flag to indicate the start of a new report
         # self.new_report_start = True
 
@@ -222,6 +282,12 @@ class Telemetrix(threading.Thread):
         # reported features
         self.reported_features = 0
 
+        # set by the report handlers when the arduino id, firmware version
+        # and features are received
+        self.arduino_id_received = threading.Event()
+        self.firmware_version_received = threading.Event()
+        self.features_received = threading.Event()
+
         # flag to indicate if i2c was previously enabled
         self.i2c_enabled = False
 
@@ -298,6 +364,9 @@ class Telemetrix(threading.Thread):
                 raise RuntimeError('No Arduino Found or User Aborted Program')
         else:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # send each command as soon as it is written rather than
+            # waiting to coalesce it with the next one
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.sock.connect((self.ip_address, self.ip_port))
             print(f'Successfully connected to: {self.ip_address}:{self.ip_port}')
 
@@ -324,9 +393,7 @@ class Telemetrix(threading.Thread):
         self._send_command(command)
 
         # get the features list
-        command = [PrivateConstants.GET_FEATURES]
-        self._send_command(command)
-        time.sleep(.2)
+        self._get_features()
 
         # Have the server reset its data structures
         command = [PrivateConstants.RESET]
@@ -338,55 +405,214 @@ class Telemetrix(threading.Thread):
         containing a sketch that has a matching arduino_instance_id as
         specified in the input parameters of this class.
 
+        The port recorded in the discovery cache for arduino_instance_id
+        is tried first, on its own. If it does not match, every other
+        candidate port is probed at the same time, each by its own
+        thread, and the first port that replies with a matching id is
+        used. The other ports are closed as soon as it is found.
+
         This is used explicitly with the Telemetrix4Arduino sketch.
         """
+        print('Opening all potential serial ports...')
+        ports = [port for port in list_ports.comports() if self._is_candidate_port(port)]
+
+        match = None
+        cached_port = self._cached_port(ports)
+        if cached_port:
+            print(f'\t{cached_port.device} (cached)')
+            match = self._probe_ports([cached_port])
+            ports.remove(cached_port)
+        if not match:
+            for port in ports:
+                # display to the user
+                print('\t' + port.device)
+            match = self._probe_ports(ports)
+
+        if match:
+            port, self.serial_port = match
+            print('Valid Arduino ID Found.')
+            self.serial_port.reset_input_buffer()
+            self.serial_port.reset_output_buffer()
+            self._cache_port(port)
+            self._run_threads()
+            return
+        if self.shutdown_on_exception:
+            self.shutdown()
+        raise RuntimeError(f'Incorrect Arduino ID: {self.reported_arduino_id}')
 
-        # a list of serial ports to be checked
-        serial_ports = []
+    def _probe_ports(self, ports):
+        """
+        Probe ports at the same time for an Arduino with a matching
+        arduino_instance_id.
 
-        print('Opening all potential serial ports...')
-        the_ports_list = list_ports.comports()
-        for port in the_ports_list:
-            if port.pid is None:
-                continue
-            try:
-                self.serial_port = serial.Serial(port.device, 115200,
-                                                 timeout=1, writeTimeout=0)
-            except SerialException:
-                continue
-            # create a list of serial ports that we opened
-            serial_ports.append(self.serial_port)
-
-            # display to the user
-            print('\t' + port.device)
-
-            # clear out any possible data in the input buffer
-        # wait for arduino to reset
-        print(
-            f'\nWaiting {self.arduino_wait} seconds(arduino_wait) for Arduino devices to '
-            'reset...')
-        # temporary for testing
-        time.sleep(self.arduino_wait)
-        self._run_threads()
+        :param ports: list of serial.tools.list_ports_common.ListPortInfo
+
+        :returns: (ListPortInfo, open serial.Serial) of the matching port,
+                  or None if no port matched
+        """
+        if self.boot_poll_interval:
+            print(
+                f'\nPolling for up to {self.arduino_wait} seconds(arduino_wait) for '
+                'Arduino devices to reset...')
+        else:
+            print(
+                f'\nWaiting {self.arduino_wait} seconds(arduino_wait) for Arduino devices to '
+                'reset...')
 
+        results = queue.SimpleQueue()
+        # the ports opened by the probes, or None once the search is over
+        # and any port opened later should be closed by its probe
+        self.probed_ports = []
+        self.probed_ports_lock = threading.Lock()
+        for port in ports:
+            threading.Thread(target=self._probe_port, args=(port, results),
+                             daemon=True).start()
+
+        match = None
+        for _ in ports:
+            port, serial_port, arduino_id = results.get()
+            if arduino_id is not None:
+                self.reported_arduino_id = arduino_id
+            if arduino_id == self.arduino_instance_id:
+                match = port, serial_port
+                break
+
+        # close every other port, stopping the probes still running on them
+        with self.probed_ports_lock:
+            serial_ports, self.probed_ports = self.probed_ports, None
         for serial_port in serial_ports:
-            self.serial_port = serial_port
+            if not match or serial_port is not match[1]:
+                serial_port.close()
+        return match
 
-            # Since opening the port, there might be e.g., boot logs in the
-            # buffer. Clear them before proceeding.
-            self.serial_port.reset_input_buffer()
+    def _cached_port(self, ports):
+        """
+        Look up the port recorded in the discovery cache for
+        arduino_instance_id.
 
-            self._get_arduino_id()
-            if self.reported_arduino_id != self.arduino_instance_id:
+        :param ports: list of serial.tools.list_ports_common.ListPortInfo
+
+        :returns: the port in ports with the cached serial number, or with
+                  the cached USB location if the device has no serial
+                  number, or None
+        """
+        entry = self._read_discovery_cache().get(str(self.arduino_instance_id))
+        if not entry:
+            return None
+        for port in ports:
+            if (port.vid, port.pid) != (entry.get('vid'), entry.get('pid')):
                 continue
+            if entry.get('serial_number'):
+                if port.serial_number == entry['serial_number']:
+                    return port
+            elif port.location and port.location == entry.get('location'):
+                return port
+        return None
+
+    def _cache_port(self, port):
+        """
+        Record the port arduino_instance_id was found on in the discovery
+        cache. The cache is only an optimization, so errors writing it are
+        ignored.
+
+        :param port: serial.tools.list_ports_common.ListPortInfo
+        """
+        if not self.discovery_cache:
+            return
+        cache = self._read_discovery_cache()
+        cache[str(self.arduino_instance_id)] = {'vid': port.vid, 'pid': port.pid,
+                                                'serial_number': port.serial_number,
+                                                'location': port.location,
+                                                'device': port.device}
+        temporary = f'{self.discovery_cache}.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'w') as file:
+                json.dump(cache, file, indent=2)
+            os.replace(temporary, self.discovery_cache)
+        except OSError:
+            pass
+
+    def _read_discovery_cache(self):
+        """
+        :returns: the discovery cache, a dictionary keyed by
+                  arduino_instance_id, or an empty dictionary if it is
+                  disabled, missing or unreadable
+        """
+        if not self.discovery_cache:
+            return {}
+        try:
+            with open(self.discovery_cache) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def _is_candidate_port(self, port):
+        """
+        Check whether a port could be an Arduino before opening it.
+
+        :param port: serial.tools.list_ports_common.ListPortInfo
+
+        :returns: True if the port is a USB serial port matching usb_ids
+        """
+        if port.vid is None or port.pid is None:
+            return False
+        if self.usb_ids is None:
+            return True
+        return port.vid in self.usb_ids or (port.vid, port.pid) in self.usb_ids
+
+    def _probe_port(self, port, results):
+        """
+        Thread to open a port, wait for the Arduino on it to reset, and
+        read its reply to are_u_there requests.
+
+        :param port: serial.tools.list_ports_common.ListPortInfo
+
+        :param results: queue the (port, serial port, arduino id) result is
+                        put on. The id is None if the Arduino did not reply.
+        """
+        serial_port, arduino_id = None, None
+        try:
+            serial_port = serial.Serial(port.device, 115200,
+                                        timeout=self.receive_timeout,
+                                        writeTimeout=0)
+            with self.probed_ports_lock:
+                if self.probed_ports is None:
+                    # another port has already matched
+                    serial_port.close()
+                    return
+                self.probed_ports.append(serial_port)
+
+            # the arduino resets when the port is opened
+            deadline = time.monotonic() + self.arduino_wait
+            if self.boot_poll_interval:
+                interval = self.boot_poll_interval
             else:
-                print('Valid Arduino ID Found.')
-                self.serial_port.reset_input_buffer()
-                self.serial_port.reset_output_buffer()
-                return
-        if self.shutdown_on_exception:
-            self.shutdown()
-        raise RuntimeError(f'Incorrect Arduino ID: {self.reported_arduino_id}')
+                time.sleep(self.arduino_wait)
+                interval = .5
+                deadline += interval
+
+            # Since opening the port, there might be e.g., boot logs in the
+            # buffer. Clear them before proceeding.
+            serial_port.reset_input_buffer()
+            buffer = bytearray()
+            request = bytes((1, PrivateConstants.ARE_U_THERE))
+            next_request = time.monotonic()
+            while arduino_id is None and time.monotonic() < deadline:
+                if time.monotonic() >= next_request:
+                    serial_port.write(request)
+                    next_request += interval
+                buffer += serial_port.read(max(1, serial_port.in_waiting))
+                # look for an i_am_here report among the received messages
+                while buffer and len(buffer) > buffer[0]:
+                    if buffer[0] == 2 and buffer[1] == PrivateConstants.I_AM_HERE_REPORT:
+                        arduino_id = buffer[2]
+                    del buffer[:buffer[0] + 1]
+        except (SerialException, OSError, TypeError, ValueError):
+            # the port could not be opened, or was closed by _find_arduino
+            # because another port matched
+            pass
+        results.put((port, serial_port, arduino_id))
 
     def _manual_open(self):
         """
@@ -397,15 +623,21 @@ class Telemetrix(threading.Thread):
         try:
             print(f'Opening {self.com_port}...')
             self.serial_port = serial.Serial(self.com_port, 115200,
-                                             timeout=1, writeTimeout=0)
+                                             timeout=self.receive_timeout,
+                                             writeTimeout=0)
 
-            print(
-                f'\nWaiting {self.arduino_wait} seconds(arduino_wait) for Arduino devices to '
-                'reset...')
             self._run_threads()
-            time.sleep(self.arduino_wait)
-
-            self._get_arduino_id()
+            if self.boot_poll_interval:
+                print(
+                    f'\nPolling for up to {self.arduino_wait} seconds(arduino_wait) for '
+                    'Arduino devices to reset...')
+                self._poll_arduino_id(self.arduino_wait)
+            else:
+                print(
+                    f'\nWaiting {self.arduino_wait} seconds(arduino_wait) for Arduino '
+                    'devices to reset...')
+                time.sleep(self.arduino_wait)
+                self._get_arduino_id()
 
             if self.reported_arduino_id != self.arduino_instance_id:
                 if self.shutdown_on_exception:
@@ -510,26 +742,63 @@ class Telemetrix(threading.Thread):
                    PrivateConstants.REPORTING_DIGITAL_ENABLE, pin]
         self._send_command(command)
 
-    def _get_arduino_id(self):
+    def _get_arduino_id(self, timeout=.5):
         """
         Retrieve arduino-telemetrix arduino id
 
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
         """
+        self.arduino_id_received.clear()
         command = [PrivateConstants.ARE_U_THERE]
         self._send_command(command)
-        # provide time for the reply
-        time.sleep(.5)
+        return self.arduino_id_received.wait(timeout)
+
+    def _poll_arduino_id(self, timeout):
+        """
+        Repeat are_u_there requests every boot_poll_interval seconds
+        until the arduino replies, for use while it is resetting.
+
+        :param timeout: maximum time to poll
 
-    def _get_firmware_version(self):
+        :returns: True if a reply was received
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._get_arduino_id(min(self.boot_poll_interval, remaining)):
+                return True
+
+    def _get_firmware_version(self, timeout=.5):
         """
         This method retrieves the
         arduino-telemetrix firmware version
 
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
         """
+        self.firmware_version_received.clear()
         command = [PrivateConstants.GET_FIRMWARE_VERSION]
         self._send_command(command)
-        # provide time for the reply
-        time.sleep(.5)
+        return self.firmware_version_received.wait(timeout)
+
+    def _get_features(self, timeout=.2):
+        """
+        This method retrieves the features supported by the
+        arduino-telemetrix firmware
+
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
+        """
+        self.features_received.clear()
+        command = [PrivateConstants.GET_FEATURES]
+        self._send_command(command)
+        return self.features_received.wait(timeout)
 
     def i2c_read(self, address, register, number_of_bytes,
                  callback=None, i2c_port=0,
@@ -608,12 +877,53 @@ class Telemetrix(threading.Thread):
                                callback=callback, i2c_port=i2c_port,
                                write_register=write_register)
 
+    def i2c_read_future(self, address, register, number_of_bytes, i2c_port=0,
+                        write_register=True, stop_transmission=True, timeout=None):
+        """
+        Read the specified number of bytes from the specified register for
+        the i2c device, returning a future instead of calling a callback.
+
+        Any number of reads may be outstanding at once. Replies are matched
+        to requests by i2c port, address and register, in the order the
+        requests were made.
+
+        :param address: i2c device address
+
+        :param register: i2c register (or None if no register
+                                       selection is needed)
+
+        :param number_of_bytes: number of bytes to be read
+
+        :param i2c_port: 0 = default, 1 = secondary
+
+        :param write_register: If True, the register is written before read
+                               Else, the write is suppressed
+
+        :param stop_transmission: stop transmission after read
+
+        :param timeout: If set, the future fails with TimeoutError if no
+                        reply arrives within timeout seconds. A reply that
+                        arrives later is discarded.
+
+        :returns: concurrent.futures.Future whose result is the data list:
+
+        [I2C_READ_REPORT, i2c_port, number of bytes read, address, register,
+        bytes read..., time-stamp]
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self._i2c_read_request(address, register, number_of_bytes,
+                               stop_transmission=stop_transmission,
+                               i2c_port=i2c_port, write_register=write_register,
+                               timeout=timeout, future=future)
+        return future
+
     def _i2c_read_request(self, address, register, number_of_bytes,
                           stop_transmission=True, callback=None, i2c_port=0,
-                          write_register=True):
+                          write_register=True, timeout=None, future=None):
         """
         This method requests the read of an i2c device. Results are retrieved
-        via callback.
+        via callback, or via future.
 
         :param address: i2c device address
 
@@ -623,12 +933,18 @@ class Telemetrix(threading.Thread):
 
         :param stop_transmission: stop transmission after read
 
-        :param callback: Required callback function to report i2c data as a
-                   result of read command.
+        :param callback: callback function to report i2c data as a result
+                         of read command. Required unless future is given.
 
        :param write_register: If True, the register is written before read
                               Else, the write is suppressed
 
+       :param timeout: If set, the read is abandoned if no reply arrives
+                       within timeout seconds
+
+       :param future: future to set with the i2c data, or to fail with
+                      TimeoutError if the read is abandoned
+
         """
         if not i2c_port:
             if not self.i2c_1_active:
@@ -644,19 +960,30 @@ class Telemetrix(threading.Thread):
                 raise RuntimeError(
                     'I2C Read: set_pin_mode i2c never called for i2c port 2.')
 
-        if not callback:
+        if not callback and not future:
             if self.shutdown_on_exception:
                 self.shutdown()
             raise RuntimeError('I2C Read: A callback function must be specified.')
 
-        if not i2c_port:
-            self.i2c_callback = callback
-        else:
-            self.i2c_callback2 = callback
+        if callback:
+            if not i2c_port:
+                self.i2c_callback = callback
+            else:
+                self.i2c_callback2 = callback
 
         if not register:
             register = 0
 
+        # register the read before sending it, so its reply can be matched
+        # to it however soon the reply arrives
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.i2c_pending_lock:
+            self.i2c_pending.setdefault((i2c_port, address, register), deque()).append(
+                [callback, deadline, future])
+            if deadline is not None and (self.i2c_next_deadline is None or
+                                         deadline < self.i2c_next_deadline):
+                self.i2c_next_deadline = deadline
+
         if write_register:
             write_register = 1
         else:
@@ -1752,9 +2079,10 @@ class Telemetrix(threading.Thread):
         self._stop_threads()
 
         try:
-            command = [PrivateConstants.STOP_ALL_REPORTS]
-            self._send_command(command)
-            time.sleep(.5)
+            if not self.connection_lost:
+                command = [PrivateConstants.STOP_ALL_REPORTS]
+                self._send_command(command)
+                time.sleep(.5)
 
             if self.ip_address:
                 try:
@@ -2218,6 +2546,7 @@ class Telemetrix(threading.Thread):
         """
 
         self.firmware_version = [data[0], data[1], data[2]]
+        self.firmware_version_received.set()
 
     def _i2c_read_report(self, data):
         """
@@ -2239,10 +2568,64 @@ class Telemetrix(threading.Thread):
         cb_list = [PrivateConstants.I2C_READ_REPORT, data[0], data[1]] + data[2:]
         cb_list.append(time.time())
 
-        if cb_list[1]:
-            self.i2c_callback2(cb_list)
-        else:
-            self.i2c_callback(cb_list)
+        # replies arrive in the order the reads were sent, so a reply owed
+        # to an abandoned read comes before those of any later reads of the
+        # same register: drop it rather than hand it to a later read
+        key = (data[0], data[2], data[3])
+        with self.i2c_pending_lock:
+            expired = self.i2c_expired.get(key)
+            if expired:
+                if expired == 1:
+                    del self.i2c_expired[key]
+                else:
+                    self.i2c_expired[key] = expired - 1
+                return
+
+            # complete the oldest outstanding read of this register
+            pending = self.i2c_pending.get(key)
+            if pending:
+                callback, deadline, future = pending.popleft()
+                if not pending:
+                    del self.i2c_pending[key]
+            elif cb_list[1]:
+                callback, future = self.i2c_callback2, None
+            else:
+                callback, future = self.i2c_callback, None
+
+        if future:
+            if not future.done():
+                future.set_result(cb_list)
+        elif callback:
+            callback(cb_list)
+
+    def _expire_i2c_reads(self):
+        """
+        Abandon the outstanding i2c reads whose timeout has passed, failing
+        their futures with TimeoutError.
+        """
+        now = time.monotonic()
+        expired = []
+        with self.i2c_pending_lock:
+            self.i2c_next_deadline = None
+            for key, pending in list(self.i2c_pending.items()):
+                for entry in list(pending):
+                    deadline = entry[1]
+                    if deadline is None:
+                        continue
+                    if deadline <= now:
+                        pending.remove(entry)
+                        self.i2c_expired[key] = self.i2c_expired.get(key, 0) + 1
+                        expired.append((key, entry[2]))
+                    elif self.i2c_next_deadline is None or deadline < self.i2c_next_deadline:
+                        self.i2c_next_deadline = deadline
+                if not pending:
+                    del self.i2c_pending[key]
+
+        for (i2c_port, address, register), future in expired:
+            if future and not future.done():
+                future.set_exception(TimeoutError(
+                    f'i2c read of port {i2c_port} address {address} register {register} '
+                    f'timed out'))
 
     def _i2c_too_few(self, data):
         """
@@ -2272,6 +2655,7 @@ class Telemetrix(threading.Thread):
         :param data: arduino id
         """
         self.reported_arduino_id = data[0]
+        self.arduino_id_received.set()
 
     def _spi_report(self, report):
 
@@ -2305,6 +2689,79 @@ class Telemetrix(threading.Thread):
         if self.loop_back_callback:
             self.loop_back_callback(data)
 
+    @contextmanager
+    def capture_commands(self):
+        """
+        Context manager that captures the encoded bytes of every command
+        sent within it instead of writing them to the Arduino.
+        The captured bytes can later be sent with write_encoded.
+
+        :return: bytearray to which the encoded commands are appended
+
+        """
+        self.captured_commands = bytearray()
+        try:
+            yield self.captured_commands
+        finally:
+            self.captured_commands = None
+
+    @contextmanager
+    def batch(self, flush_size=256):
+        """
+        Context manager that coalesces the commands sent by the calling
+        thread within it into as few writes as possible. Commands are
+        encoded into a preallocated buffer, which is written when the
+        batch ends or once flush_size bytes are pending. Batches may be
+        nested; only the outermost batch writes. Commands sent by other
+        threads are written immediately as usual.
+
+        Replies to commands in the batch cannot arrive before the batch
+        is written, so do not wait for a reply within a batch.
+
+        :param flush_size: number of pending bytes at which the buffer
+                           is written before the batch ends
+
+        """
+        state = self.batch_state
+        if getattr(state, 'buffer', None) is not None:
+            yield
+            return
+
+        # room for one more command of the maximum length past flush_size
+        state.buffer = bytearray(flush_size + 32)
+        state.length = 0
+        state.flush_size = flush_size
+        try:
+            yield
+        finally:
+            try:
+                self._flush_batch(state)
+            finally:
+                state.buffer = None
+
+    def _flush_batch(self, state):
+        """
+        This is a private utility method.
+        Writes the commands pending in a batch.
+
+        :param state: batch_state of the thread which opened the batch
+
+        """
+        if state.length:
+            length = state.length
+            state.length = 0
+            self._write(memoryview(state.buffer)[:length])
+
+    def write_encoded(self, message):
+        """
+        Write one or more already encoded commands, such as those
+        collected by capture_commands, in a single write.
+
+        :param message: bytes of the encoded commands
+
+        """
+        self._write(message)
+
     def _send_command(self, command):
         """
         This is a private utility method.
@@ -2313,10 +2770,36 @@ class Telemetrix(threading.Thread):
         :param command:  command data in the form of a list
 
         """
+        length = len(command)
+        buffer = getattr(self.batch_state, 'buffer', None)
+        if buffer is not None and self.captured_commands is None:
+            state = self.batch_state
+            if state.length + 1 + length > len(buffer):
+                self._flush_batch(state)
+            start = state.length
+            # the length of the list is added at the head
+            buffer[start] = length
+            buffer[start + 1:start + 1 + length] = command
+            state.length = start + 1 + length
+            if state.length >= state.flush_size:
+                self._flush_batch(state)
+            return
+
         # the length of the list is added at the head
-        command.insert(0, len(command))
-        send_message = bytes(command)
+        send_message = bytes((length, *command))
+
+        if self.captured_commands is not None:
+            self.captured_commands += send_message
+        else:
+            self._write(send_message)
 
+    def _write(self, send_message):
+        """
+        This is a private utility method.
+
+        :param send_message: bytes to write to the serial port or socket
+
+        """
         if self.serial_port:
             try:
                 self.serial_port.write(send_message)
@@ -2325,6 +2808,9 @@ class Telemetrix(threading.Thread):
                     self.shutdown()
                 raise RuntimeError('write fail in _send_command')
         elif self.ip_address:
+            if self.connection_lost:
+                raise RuntimeError(f'Connection to {self.ip_address}:{self.ip_port} '
+                                   f'was lost')
             self.sock.sendall(send_message)
         else:
             raise RuntimeError('No serial port or ip address set.')
@@ -2472,6 +2958,7 @@ class Telemetrix(threading.Thread):
 
     def _features_report(self, report):
         self.reported_features = report[0]
+        self.features_received.set()
 
     def _run_threads(self):
         self.run_event.set()
@@ -2484,52 +2971,78 @@ class Telemetrix(threading.Thread):
 
     def _reporter(self):
         """
-        This is the reporter thread. It continuously pulls data from
-        the deque. When a full message is detected, that message is
-        processed.
+        This is the reporter thread. It waits for chunks of received data
+        on the queue and appends them to a buffer. Each complete message in
+        the buffer is processed, and any partial message is kept until the
+        rest of it arrives.
         """
         self.run_event.wait()
 
+        buffer = bytearray()
+
         while self._is_running() and not self.shutdown_flag:
-            if len(self.the_deque):
-                # response_data will be populated with the received data for the report
-                response_data = []
-                packet_length = self.the_deque.popleft()
-                if packet_length:
-                    # get all the data for the report and place it into response_data
-                    for i in range(packet_length):
-                        while not len(self.the_deque):
-                            time.sleep(self.sleep_tune)
-                        data = self.the_deque.popleft()
-                        response_data.append(data)
-
-                    # print(response_data)
-
-                    # get the report type and look up its dispatch method
-                    # here we pop the report type off of response_data
-                    report_type = response_data.pop(0)
-                    # print(report_type)
-
-                    # retrieve the report handler from the dispatch table
-                    dispatch_entry = self.report_dispatch.get(report_type)
-
-                    # if there is additional data for the report,
-                    # it will be contained in response_data
-                    # noinspection PyArgumentList
-                    dispatch_entry(response_data)
+            # block until data arrives, waking periodically to check for shutdown
+            # and in time to abandon i2c reads when their timeout passes
+            wait = self.receive_timeout
+            next_deadline = self.i2c_next_deadline
+            if next_deadline is not None:
+                wait = next_deadline - time.monotonic()
+                if wait <= 0:
+                    self._expire_i2c_reads()
                     continue
-                else:
+                wait = min(wait, self.receive_timeout)
+            try:
+                buffer += self.the_queue.get(timeout=wait)
+            except queue.Empty:
+                continue
+            # take any other chunks that are already waiting
+            while not self.the_queue.empty():
+                buffer += self.the_queue.get_nowait()
+
+            consumed = self._process_reports(buffer)
+            del buffer[:consumed]
+
+    def _process_reports(self, buffer):
+        """
+        Dispatch every complete message in buffer.
+
+        :param buffer: bytearray of received data, starting at the packet
+                       length byte of a message
+
+        :returns: the number of bytes consumed
+        """
+        position = 0
+        with memoryview(buffer) as view:
+            while position < len(view):
+                packet_length = view[position]
+                if not packet_length:
                     if self.shutdown_on_exception:
                         self.shutdown()
                     raise RuntimeError(
                         'A report with a packet length of zero was received.')
-            else:
-                time.sleep(self.sleep_tune)
+
+                # wait for the rest of a partial message
+                end = position + 1 + packet_length
+                if end > len(view):
+                    break
+
+                # get the report type and look up its dispatch method
+                report_type = view[position + 1]
+                dispatch_entry = self.report_dispatch.get(report_type)
+
+                # if there is additional data for the report,
+                # it will be contained in response_data
+                response_data = list(view[position + 2:end])
+                position = end
+                # noinspection PyArgumentList
+                dispatch_entry(response_data)
+        return position
 
     def _serial_receiver(self):
         """
         Thread to continuously check for incoming data.
-        When a byte comes in, place it onto the deque.
+        Block until data arrives or receive_timeout expires, then place
+        every byte that has arrived onto the queue in a single step.
         """
         self.run_event.wait()
 
@@ -2541,32 +3054,50 @@ class Telemetrix(threading.Thread):
             # we can get an OSError: [Errno9] Bad file descriptor when shutting down
             # just ignore it
             try:
-                if self.serial_port.inWaiting():
-                    c = self.serial_port.read()
-                    self.the_deque.append(ord(c))
-                    # print(ord(c))
-                else:
-                    time.sleep(self.sleep_tune)
-                    # continue
+                # the port is opened with timeout=receive_timeout, so this
+                # blocks for at most that long waiting for the first byte
+                serial_port = self.serial_port
+                data = serial_port.read(max(1, serial_port.in_waiting))
+                if data:
+                    self.the_queue.put(data)
             except OSError:
-                pass
+                if self.shutdown_flag:
+                    break
+                time.sleep(self.receive_timeout)
 
-    def _tcp_receiver(self):
+    def _tcp_receiver(self, buffer_size=4096):
         """
         Thread to continuously check for incoming data.
-        When a byte comes in, place it onto the deque.
+        Receive whatever has arrived into a preallocated buffer and place
+        it onto the queue as a single chunk.
+
+        :param buffer_size: maximum number of bytes received per call
         """
         self.run_event.wait()
 
         # Start this thread only if ip_address is set
 
         if self.ip_address:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
 
             while self._is_running() and not self.shutdown_flag:
                 try:
-                    payload = self.sock.recv(1)
-                    self.the_deque.append(ord(payload))
-                except Exception:
-                    pass
+                    received = self.sock.recv_into(buffer)
+                except OSError:
+                    received = 0
+                if received:
+                    self.the_queue.put(bytes(view[:received]))
+                    continue
+
+                # a zero length receive or a socket error means the connection
+                # was closed, either by shutdown or by the device
+                if self.shutdown_flag:
+                    return
+                self.connection_lost = True
+                if self.shutdown_on_exception:
+                    self.shutdown()
+                raise RuntimeError(f'Connection to {self.ip_address}:{self.ip_port} '
+                                   f'was lost')
         else:
             return
@@ -0,0 +1,1326 @@
+"""
+ Copyright (c) 2015-2021 Alan Yorinks All rights reserved.
+
+ This program is free software; you can redistribute it and/or
+ modify it under the terms of the GNU AFFERO GENERAL PUBLIC LICENSE
+ Version 3 as published by the Free Software Foundation; either
+ or (at your option) any later version.
+ This library is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ General Public License for more details.
+
+ You should have received a copy of the GNU AFFERO GENERAL PUBLIC LICENSE
+ along with this library; if not, write to the Free Software
+ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+import asyncio
+import inspect
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import serial
+# noinspection PyPackageRequirements
+from serial.serialutil import SerialException
+
+# noinspection PyUnresolvedReferences
+from telemetrix.private_constants import PrivateConstants
+
+
+# noinspection PyPep8,PyMethodMayBeStatic,GrazieInspection,PyBroadException
+class TelemetrixAio:
+    """
+    This class exposes and implements an asyncio version of the
+    telemetrix API. Everything runs in a single event loop without any
+    threads: commands are written without blocking, data is read when
+    the serial port or socket becomes readable, and reports are
+    dispatched by a coroutine.
+
+    The digital, analog, loop back and i2c portions of the API are
+    implemented, with the same arguments as Telemetrix. Callbacks may be
+    plain functions or coroutine functions; coroutines are awaited before
+    the next report is dispatched. For servos, sonar, DHT, SPI, OneWire
+    and steppers, use Telemetrix.
+
+    """
+
+    # noinspection PyPep8,PyPep8,PyPep8
+    def __init__(self, com_port=None, arduino_instance_id=1,
+                 arduino_wait=4, shutdown_on_exception=True,
+                 ip_address=None, ip_port=31335,
+                 boot_poll_interval=None, autostart=True, loop=None):
+
+        """
+
+        :param com_port: e.g. /dev/ttyACM0. Required for a serial
+                         connection, since auto com port detection is
+                         not supported. Serial ports are only supported
+                         on platforms whose event loop can watch a file
+                         descriptor, such as Linux and macOS.
+
+        :param arduino_instance_id: Match with the value installed on the
+                                    arduino-telemetrix sketch.
+
+        :param arduino_wait: Amount of time to wait for an Arduino to
+                             fully reset itself. If boot_poll_interval
+                             is set, this is the maximum time to wait.
+
+        :param shutdown_on_exception: call shutdown before raising
+                                      a RunTimeError exception
+
+        :param ip_address: ip address of tcp/ip connected device.
+
+        :param ip_port: ip port of tcp/ip connected device
+
+        :param boot_poll_interval: If set, send an are_u_there request every
+                                   boot_poll_interval seconds while the
+                                   Arduino resets, and continue as soon as
+                                   it replies instead of always waiting
+                                   arduino_wait seconds
+
+        :param autostart: If True, the constructor runs start_aio on loop
+                          until the board is connected. This requires
+                          a loop that is not already running; from within
+                          a coroutine, set autostart to False and await
+                          start_aio instead.
+
+        :param loop: asyncio loop to use for autostart. If None, the
+                     running loop is used, or a new loop is created if
+                     none is running.
+        """
+
+        if not loop:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                if autostart:
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
+        # start_aio replaces this with the loop it runs in
+        self.loop = loop
+
+        # save input parameters as instance variables
+        self.com_port = com_port
+        self.arduino_instance_id = arduino_instance_id
+        self.arduino_wait = arduino_wait
+        self.shutdown_on_exception = shutdown_on_exception
+        self.ip_address = ip_address
+        self.ip_port = ip_port
+        self.boot_poll_interval = boot_poll_interval
+
+        # queue of received chunks of data for the reporter task to process,
+        # created by start_aio so that it belongs to the running loop.
+        # None is queued when the connection is lost.
+        self.the_queue = None
+
+        # task running the _reporter coroutine
+        self.the_reporter_task = None
+
+        # The report_dispatch dictionary is used to process
+        # incoming report messages by looking up the report message
+        # and awaiting its associated processing coroutine.
+
+        self.report_dispatch = {}
+
+        # To add a command to the command dispatch table, append here.
+        self.report_dispatch.update(
+            {PrivateConstants.LOOP_COMMAND: self._report_loop_data})
+        self.report_dispatch.update(
+            {PrivateConstants.DEBUG_PRINT: self._report_debug_data})
+        self.report_dispatch.update(
+            {PrivateConstants.DIGITAL_REPORT: self._digital_message})
+        self.report_dispatch.update(
+            {PrivateConstants.ANALOG_REPORT: self._analog_message})
+        self.report_dispatch.update(
+            {PrivateConstants.FIRMWARE_REPORT: self._firmware_message})
+        self.report_dispatch.update({PrivateConstants.I_AM_HERE_REPORT: self._i_am_here})
+        self.report_dispatch.update(
+            {PrivateConstants.I2C_READ_REPORT: self._i2c_read_report})
+        self.report_dispatch.update(
+            {PrivateConstants.I2C_TOO_FEW_BYTES_RCVD: self._i2c_too_few})
+        self.report_dispatch.update(
+            {PrivateConstants.I2C_TOO_MANY_BYTES_RCVD: self._i2c_too_many})
+        self.report_dispatch.update(
+            {PrivateConstants.FEATURES: self._features_report})
+
+        # dictionaries to store the callbacks for each pin
+        self.analog_callbacks = {}
+
+        self.digital_callbacks = {}
+
+        self.i2c_callback = None
+        self.i2c_callback2 = None
+
+        # outstanding i2c reads, keyed by (i2c port, address, register).
+        # Each value is a deque of [callback, future, timer] entries in
+        # the order the reads were requested.
+        self.i2c_pending = {}
+        # number of abandoned reads, keyed like i2c_pending, whose replies
+        # are still to arrive
+        self.i2c_expired = {}
+
+        self.i2c_1_active = False
+        self.i2c_2_active = False
+
+        # serial port in use, and its file descriptor
+        self.serial_port = None
+        self.serial_fd = None
+
+        # encoded commands waiting for the serial port to become writable
+        self.serial_write_buffer = bytearray()
+
+        # transport for tcp/ip communications
+        self.transport = None
+
+        # set if the serial port or tcp/ip connection is closed by the device
+        self.connection_lost = False
+
+        # flag to indicate we are in shutdown mode
+        self.shutdown_flag = False
+
+        # debug loopback callback method
+        self.loop_back_callback = None
+
+        # encoded commands of the batch opened by batch(); None outside of
+        # a batch
+        self.batch_buffer = None
+
+        # firmware version to be stored here
+        self.firmware_version = []
+
+        # reported arduino instance id
+        self.reported_arduino_id = []
+
+        # reported features
+        self.reported_features = 0
+
+        # set by the report handlers when the arduino id, firmware version
+        # and features are received; created by start_aio
+        self.arduino_id_received = None
+        self.firmware_version_received = None
+        self.features_received = None
+
+        if autostart:
+            if self.loop.is_running():
+                raise RuntimeError('autostart requires a loop that is not running; '
+                                   'set autostart=False and await start_aio()')
+            self.loop.run_until_complete(self.start_aio())
+
+    async def start_aio(self):
+        """
+        Connect to the Arduino, wait for it to reset and retrieve its
+        firmware version and features. This is called by the constructor
+        if autostart is True, and must otherwise be awaited before any
+        other method is used.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.the_queue = asyncio.Queue()
+        self.arduino_id_received = asyncio.Event()
+        self.firmware_version_received = asyncio.Event()
+        self.features_received = asyncio.Event()
+        self.the_reporter_task = self.loop.create_task(self._reporter())
+
+        print(f"TelemetrixAio:  Version {PrivateConstants.TELEMETRIX_VERSION}\n\n"
+              f"Copyright (c) 2021 Alan Yorinks All Rights Reserved.\n")
+
+        if self.ip_address:
+            # asyncio enables TCP_NODELAY on the socket, so each write is
+            # sent as soon as it is made
+            self.transport, _ = await self.loop.create_connection(
+                lambda: _TelemetrixProtocol(self), self.ip_address, self.ip_port)
+            print(f'Successfully connected to: {self.ip_address}:{self.ip_port}')
+        elif self.com_port:
+            await self._serial_open()
+        else:
+            raise RuntimeError('TelemetrixAio: a com_port or ip_address must be specified')
+
+        # get telemetrix firmware version and print it
+        print('\nRetrieving Telemetrix4Arduino firmware ID...')
+        if not await self._get_firmware_version():
+            if self.shutdown_on_exception:
+                await self.shutdown()
+            raise RuntimeError('Telemetrix4Arduino Sketch Firmware Version Not Found')
+        print(f'Telemetrix4Arduino firmware version: {self.firmware_version[0]}.'
+              f'{self.firmware_version[1]}.{self.firmware_version[2]}')
+
+        command = [PrivateConstants.ENABLE_ALL_REPORTS]
+        self._send_command(command)
+
+        # get the features list
+        await self._get_features()
+
+        # Have the server reset its data structures
+        command = [PrivateConstants.RESET]
+        self._send_command(command)
+
+    async def _serial_open(self):
+        """
+        Open com_port without blocking, watch it for received data and
+        wait for the Arduino to reset.
+        """
+        print(f'Opening {self.com_port}...')
+        try:
+            self.serial_port = serial.Serial(self.com_port, 115200,
+                                             timeout=0, writeTimeout=0)
+        except SerialException:
+            raise RuntimeError(f'Could not open {self.com_port}') from None
+        self.serial_fd = self.serial_port.fileno()
+        os.set_blocking(self.serial_fd, False)
+        self.loop.add_reader(self.serial_fd, self._serial_readable)
+
+        if self.boot_poll_interval:
+            print(f'\nPolling for up to {self.arduino_wait} seconds(arduino_wait) for '
+                  'Arduino devices to reset...')
+            await self._poll_arduino_id(self.arduino_wait)
+        else:
+            print(f'\nWaiting {self.arduino_wait} seconds(arduino_wait) for Arduino '
+                  'devices to reset...')
+            await asyncio.sleep(self.arduino_wait)
+            await self._get_arduino_id()
+
+        if self.reported_arduino_id != self.arduino_instance_id:
+            if self.shutdown_on_exception:
+                await self.shutdown()
+            raise RuntimeError(f'Incorrect Arduino ID: {self.reported_arduino_id}')
+        print('Valid Arduino ID Found.')
+        print(f'Arduino compatible device found and connected to {self.com_port}')
+
+    async def analog_write(self, pin, value):
+        """
+        Set the specified pin to the specified value.
+
+        :param pin: arduino pin number
+
+        :param value: pin value (maximum 16 bits)
+
+        """
+        value_msb = value >> 8
+        value_lsb = value & 0xff
+        command = [PrivateConstants.ANALOG_WRITE, pin, value_msb, value_lsb]
+        self._send_command(command)
+
+    async def digital_write(self, pin, value):
+        """
+        Set the specified pin to the specified value.
+
+        :param pin: arduino pin number
+
+        :param value: pin value (1 or 0)
+
+        """
+
+        command = [PrivateConstants.DIGITAL_WRITE, pin, value]
+        self._send_command(command)
+
+    async def disable_all_reporting(self):
+        """
+        Disable reporting for all digital and analog input pins
+        """
+        command = [PrivateConstants.MODIFY_REPORTING,
+                   PrivateConstants.REPORTING_DISABLE_ALL, 0]
+        self._send_command(command)
+
+    async def disable_analog_reporting(self, pin):
+        """
+        Disables analog reporting for a single analog pin.
+
+        :param pin: Analog pin number. For example for A0, the number is 0.
+
+        """
+        command = [PrivateConstants.MODIFY_REPORTING,
+                   PrivateConstants.REPORTING_ANALOG_DISABLE, pin]
+        self._send_command(command)
+
+    async def disable_digital_reporting(self, pin):
+        """
+        Disables digital reporting for a single digital input.
+
+        :param pin: Pin number.
+
+        """
+        command = [PrivateConstants.MODIFY_REPORTING,
+                   PrivateConstants.REPORTING_DIGITAL_DISABLE, pin]
+        self._send_command(command)
+
+    async def enable_analog_reporting(self, pin):
+        """
+        Enables analog reporting for the specified pin.
+
+        :param pin: Analog pin number. For example for A0, the number is 0.
+
+
+        """
+        command = [PrivateConstants.MODIFY_REPORTING,
+                   PrivateConstants.REPORTING_ANALOG_ENABLE, pin]
+        self._send_command(command)
+
+    async def enable_digital_reporting(self, pin):
+        """
+        Enable reporting on the specified digital pin.
+
+        :param pin: Pin number.
+        """
+
+        command = [PrivateConstants.MODIFY_REPORTING,
+                   PrivateConstants.REPORTING_DIGITAL_ENABLE, pin]
+        self._send_command(command)
+
+    async def _get_arduino_id(self, timeout=.5):
+        """
+        Retrieve arduino-telemetrix arduino id
+
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
+        """
+        self.arduino_id_received.clear()
+        command = [PrivateConstants.ARE_U_THERE]
+        self._send_command(command)
+        return await self._wait_event(self.arduino_id_received, timeout)
+
+    async def _poll_arduino_id(self, timeout):
+        """
+        Repeat are_u_there requests every boot_poll_interval seconds
+        until the arduino replies, for use while it is resetting.
+
+        :param timeout: maximum time to poll
+
+        :returns: True if a reply was received
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if await self._get_arduino_id(min(self.boot_poll_interval, remaining)):
+                return True
+
+    async def _get_firmware_version(self, timeout=.5):
+        """
+        This method retrieves the
+        arduino-telemetrix firmware version
+
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
+        """
+        self.firmware_version_received.clear()
+        command = [PrivateConstants.GET_FIRMWARE_VERSION]
+        self._send_command(command)
+        return await self._wait_event(self.firmware_version_received, timeout)
+
+    async def _get_features(self, timeout=.2):
+        """
+        This method retrieves the features supported by the
+        arduino-telemetrix firmware
+
+        :param timeout: maximum time to wait for the reply
+
+        :returns: True if the reply was received
+        """
+        self.features_received.clear()
+        command = [PrivateConstants.GET_FEATURES]
+        self._send_command(command)
+        return await self._wait_event(self.features_received, timeout)
+
+    @staticmethod
+    async def _wait_event(event, timeout):
+        """
+        Wait for an asyncio event to be set.
+
+        :param event: asyncio.Event to wait for
+
+        :param timeout: maximum time to wait
+
+        :returns: True if the event was set
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def i2c_read(self, address, register, number_of_bytes,
+                       callback=None, i2c_port=0,
+                       write_register=True):
+        """
+        Read the specified number of bytes from the
+        specified register for the i2c device.
+
+
+        :param address: i2c device address
+
+        :param register: i2c register (or None if no register
+                                       selection is needed)
+
+        :param number_of_bytes: number of bytes to be read
+
+        :param callback: Required callback function or coroutine to report
+                         i2c data as a result of read command
+
+       :param i2c_port: 0 = default, 1 = secondary
+
+       :param write_register: If True, the register is written
+                                       before read
+                              Else, the write is suppressed
+
+
+        callback returns a data list:
+
+        [I2C_READ_REPORT, i2c_port, number of bytes read, address, register,
+        bytes read..., time-stamp]
+
+
+        """
+
+        await self._i2c_read_request(address, register, number_of_bytes,
+                                     callback=callback, i2c_port=i2c_port,
+                                     write_register=write_register)
+
+    async def i2c_read_restart_transmission(self, address, register,
+                                            number_of_bytes,
+                                            callback=None, i2c_port=0,
+                                            write_register=True):
+        """
+        Read the specified number of bytes from the specified
+        register for the i2c device. This restarts the transmission
+        after the read. It is required for some i2c devices such as the MMA8452Q
+        accelerometer.
+
+
+        :param address: i2c device address
+
+        :param register: i2c register (or None if no register
+                                                    selection is needed)
+
+        :param number_of_bytes: number of bytes to be read
+
+        :param callback: Required callback function or coroutine to report
+                         i2c data as a result of read command
+
+       :param i2c_port: 0 = default 1 = secondary
+
+       :param write_register: If True, the register is written before read
+                              Else, the write is suppressed
+
+
+
+        callback returns a data list:
+
+        [I2C_READ_REPORT, i2c_port, number of bytes read, address, register,
+        bytes read..., time-stamp]
+
+        """
+
+        await self._i2c_read_request(address, register, number_of_bytes,
+                                     stop_transmission=False,
+                                     callback=callback, i2c_port=i2c_port,
+                                     write_register=write_register)
+
+    async def i2c_read_future(self, address, register, number_of_bytes, i2c_port=0,
+                              write_register=True, stop_transmission=True, timeout=None):
+        """
+        Read the specified number of bytes from the specified register for
+        the i2c device, returning a future instead of calling a callback.
+        The read is sent before this returns, so any number of reads may
+        be sent before awaiting their futures.
+
+        Replies are matched to requests by i2c port, address and register,
+        in the order the requests were made.
+
+        :param address: i2c device address
+
+        :param register: i2c register (or None if no register
+                                       selection is needed)
+
+        :param number_of_bytes: number of bytes to be read
+
+        :param i2c_port: 0 = default, 1 = secondary
+
+        :param write_register: If True, the register is written before read
+                               Else, the write is suppressed
+
+        :param stop_transmission: stop transmission after read
+
+        :param timeout: If set, the future fails with TimeoutError if no
+                        reply arrives within timeout seconds. A reply that
+                        arrives later is discarded.
+
+        :returns: asyncio.Future whose result is the data list:
+
+        [I2C_READ_REPORT, i2c_port, number of bytes read, address, register,
+        bytes read..., time-stamp]
+        """
+        future = self.loop.create_future()
+        await self._i2c_read_request(address, register, number_of_bytes,
+                                     stop_transmission=stop_transmission,
+                                     i2c_port=i2c_port, write_register=write_register,
+                                     timeout=timeout, future=future)
+        return future
+
+    async def _i2c_read_request(self, address, register, number_of_bytes,
+                                stop_transmission=True, callback=None, i2c_port=0,
+                                write_register=True, timeout=None, future=None):
+        """
+        This method requests the read of an i2c device. Results are retrieved
+        via callback, or via future.
+
+        :param address: i2c device address
+
+        :param register: register number (or None if no register selection is needed)
+
+        :param number_of_bytes: number of bytes expected to be returned
+
+        :param stop_transmission: stop transmission after read
+
+        :param callback: callback function or coroutine to report i2c data
+                         as a result of read command. Required unless
+                         future is given.
+
+       :param write_register: If True, the register is written before read
+                              Else, the write is suppressed
+
+       :param timeout: If set, the read is abandoned if no reply arrives
+                       within timeout seconds
+
+       :param future: future to set with the i2c data, or to fail with
+                      TimeoutError if the read is abandoned
+
+        """
+        if not i2c_port:
+            if not self.i2c_1_active:
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                raise RuntimeError(
+                    'I2C Read: set_pin_mode i2c never called for i2c port 1.')
+
+        if i2c_port:
+            if not self.i2c_2_active:
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                raise RuntimeError(
+                    'I2C Read: set_pin_mode i2c never called for i2c port 2.')
+
+        if not callback and not future:
+            if self.shutdown_on_exception:
+                await self.shutdown()
+            raise RuntimeError('I2C Read: A callback function must be specified.')
+
+        if callback:
+            if not i2c_port:
+                self.i2c_callback = callback
+            else:
+                self.i2c_callback2 = callback
+
+        if not register:
+            register = 0
+
+        # register the read before sending it, so its reply can be matched
+        # to it however soon the reply arrives
+        key = (i2c_port, address, register)
+        entry = [callback, future, None]
+        self.i2c_pending.setdefault(key, deque()).append(entry)
+        if timeout is not None:
+            entry[2] = self.loop.call_later(timeout, self._expire_i2c_read, key, entry)
+
+        if write_register:
+            write_register = 1
+        else:
+            write_register = 0
+
+        # message contains:
+        # 1. address
+        # 2. register
+        # 3. number of bytes
+        # 4. restart_transmission - True or False
+        # 5. i2c port
+        # 6. suppress write flag
+
+        command = [PrivateConstants.I2C_READ, address, register, number_of_bytes,
+                   stop_transmission, i2c_port, write_register]
+        self._send_command(command)
+
+    async def i2c_write(self, address, args, i2c_port=0):
+        """
+        Write data to an i2c device.
+
+        :param address: i2c device address
+
+        :param i2c_port: 0= port 1, 1 = port 2
+
+        :param args: A variable number of bytes to be sent to the device
+                     passed in as a list
+
+        """
+        if not i2c_port:
+            if not self.i2c_1_active:
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                raise RuntimeError(
+                    'I2C Write: set_pin_mode i2c never called for i2c port 1.')
+
+        if i2c_port:
+            if not self.i2c_2_active:
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                raise RuntimeError(
+                    'I2C Write: set_pin_mode i2c never called for i2c port 2.')
+
+        command = [PrivateConstants.I2C_WRITE, len(args), address, i2c_port]
+
+        for item in args:
+            command.append(item)
+
+        self._send_command(command)
+
+    async def loop_back(self, start_character, callback=None):
+        """
+        This is a debugging method to send a character to the
+        Arduino device, and have the device loop it back.
+
+        :param start_character: The character to loop back. It should be
+                                an integer.
+
+        :param callback: Looped back character will appear in the callback method
+
+        """
+        command = [PrivateConstants.LOOP_COMMAND, ord(start_character)]
+        self.loop_back_callback = callback
+        self._send_command(command)
+
+    async def set_analog_scan_interval(self, interval):
+        """
+        Set the analog scanning interval.
+
+        :param interval: value of 0 - 255 - milliseconds
+        """
+
+        if 0 <= interval <= 255:
+            command = [PrivateConstants.SET_ANALOG_SCANNING_INTERVAL, interval]
+            self._send_command(command)
+        else:
+            if self.shutdown_on_exception:
+                await self.shutdown()
+            raise RuntimeError('Analog interval must be between 0 and 255')
+
+    async def set_pin_mode_analog_output(self, pin_number):
+        """
+        Set a pin as a pwm (analog output) pin.
+
+        :param pin_number:arduino pin number
+
+        """
+        await self._set_pin_mode(pin_number, PrivateConstants.AT_OUTPUT)
+
+    async def set_pin_mode_analog_input(self, pin_number, differential=0, callback=None):
+        """
+        Set a pin as an analog input.
+
+        :param pin_number: arduino pin number
+
+        :param differential: difference in previous to current value before
+                             report will be generated
+
+        :param callback: callback function or coroutine
+
+
+        callback returns a data list:
+
+        [pin_type, pin_number, pin_value, raw_time_stamp]
+
+        The pin_type for analog input pins = 3
+
+        """
+        await self._set_pin_mode(pin_number, PrivateConstants.AT_ANALOG, differential,
+                                 callback)
+
+    async def set_pin_mode_digital_input(self, pin_number, callback=None):
+        """
+        Set a pin as a digital input.
+
+        :param pin_number: arduino pin number
+
+        :param callback: callback function or coroutine
+
+
+        callback returns a data list:
+
+        [pin_type, pin_number, pin_value, raw_time_stamp]
+
+        The pin_type for all digital input pins = 2
+
+        """
+        await self._set_pin_mode(pin_number, PrivateConstants.AT_INPUT, callback=callback)
+
+    async def set_pin_mode_digital_input_pullup(self, pin_number, callback=None):
+        """
+        Set a pin as a digital input with pullup enabled.
+
+        :param pin_number: arduino pin number
+
+        :param callback: callback function or coroutine
+
+
+        callback returns a data list:
+
+        [pin_type, pin_number, pin_value, raw_time_stamp]
+
+        The pin_type for all digital input pins = 2
+        """
+        await self._set_pin_mode(pin_number, PrivateConstants.AT_INPUT_PULLUP,
+                                 callback=callback)
+
+    async def set_pin_mode_digital_output(self, pin_number):
+        """
+        Set a pin as a digital output pin.
+
+        :param pin_number: arduino pin number
+        """
+
+        await self._set_pin_mode(pin_number, PrivateConstants.AT_OUTPUT)
+
+    async def set_pin_mode_i2c(self, i2c_port=0):
+        """
+        Establish the standard Arduino i2c pins for i2c utilization.
+
+        :param i2c_port: 0 = i2c1, 1 = i2c2
+
+        NOTES: 1. THIS METHOD MUST BE CALLED BEFORE ANY I2C REQUEST IS MADE
+               2. Callbacks are set within the individual i2c read methods of this
+              API.
+
+              See i2c_read, or i2c_read_restart_transmission.
+
+        """
+        # test for i2c port 2
+        if i2c_port:
+            # if not previously activated set it to activated
+            # and the send a begin message for this port
+            if not self.i2c_2_active:
+                self.i2c_2_active = True
+            else:
+                return
+        # port 1
+        else:
+            if not self.i2c_1_active:
+                self.i2c_1_active = True
+            else:
+                return
+
+        command = [PrivateConstants.I2C_BEGIN, i2c_port]
+        self._send_command(command)
+
+    async def _set_pin_mode(self, pin_number, pin_state, differential=0, callback=None):
+        """
+        A private method to set the various pin modes.
+
+        :param pin_number: arduino pin number
+
+        :param pin_state: INPUT/OUTPUT/ANALOG/PWM/PULLUP
+
+        :param differential: for analog inputs - threshold
+                             value to be achieved for report to
+                             be generated
+
+        :param callback: A reference to a call back function or coroutine
+                         to be called when pin data value changes
+
+        """
+        if callback:
+            if pin_state == PrivateConstants.AT_INPUT:
+                self.digital_callbacks[pin_number] = callback
+            elif pin_state == PrivateConstants.AT_INPUT_PULLUP:
+                self.digital_callbacks[pin_number] = callback
+            elif pin_state == PrivateConstants.AT_ANALOG:
+                self.analog_callbacks[pin_number] = callback
+            else:
+                print('{} {}'.format('set_pin_mode: callback ignored for '
+                                     'pin state:', pin_state))
+
+        if pin_state == PrivateConstants.AT_INPUT:
+            command = [PrivateConstants.SET_PIN_MODE, pin_number,
+                       PrivateConstants.AT_INPUT, 1]
+
+        elif pin_state == PrivateConstants.AT_INPUT_PULLUP:
+            command = [PrivateConstants.SET_PIN_MODE, pin_number,
+                       PrivateConstants.AT_INPUT_PULLUP, 1]
+
+        elif pin_state == PrivateConstants.AT_OUTPUT:
+            command = [PrivateConstants.SET_PIN_MODE, pin_number,
+                       PrivateConstants.AT_OUTPUT]
+
+        elif pin_state == PrivateConstants.AT_ANALOG:
+            command = [PrivateConstants.SET_PIN_MODE, pin_number,
+                       PrivateConstants.AT_ANALOG,
+                       differential >> 8, differential & 0xff, 1]
+        else:
+            if self.shutdown_on_exception:
+                await self.shutdown()
+            raise RuntimeError('Unknown pin state')
+
+        self._send_command(command)
+
+    async def shutdown(self):
+        """
+        This method attempts an orderly shutdown
+        If any exceptions are thrown, they are ignored.
+        """
+        if self.shutdown_flag:
+            return
+        self.shutdown_flag = True
+
+        try:
+            if not self.connection_lost and (self.transport or self.serial_fd is not None):
+                self.batch_buffer = None
+                command = [PrivateConstants.STOP_ALL_REPORTS]
+                self._send_command(command)
+                await self._drain_serial(.5)
+
+            reporter = self.the_reporter_task
+            if reporter and reporter is not asyncio.current_task():
+                reporter.cancel()
+                try:
+                    await reporter
+                except BaseException:
+                    pass
+
+            self._fail_i2c_reads('TelemetrixAio was shut down')
+
+            if self.transport:
+                # pending writes are sent before the socket is closed
+                self.transport.close()
+                self.transport = None
+            elif self.serial_fd is not None:
+                fd, self.serial_fd = self.serial_fd, None
+                try:
+                    self.loop.remove_reader(fd)
+                    self.loop.remove_writer(fd)
+                    self.serial_port.close()
+                except (RuntimeError, SerialException, OSError):
+                    # ignore error on shutdown
+                    pass
+        except Exception:
+            raise RuntimeError('Shutdown failed - could not send stop streaming message')
+
+    async def _drain_serial(self, timeout):
+        """
+        Wait for the serial commands waiting in serial_write_buffer to be
+        written.
+
+        :param timeout: maximum time to wait
+        """
+        deadline = time.monotonic() + timeout
+        while self.serial_write_buffer and time.monotonic() < deadline:
+            await asyncio.sleep(.01)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that coalesces every command sent within it into
+        a single write when the block exits, instead of one write per
+        command. Since every task shares the event loop, commands sent by
+        other tasks while the block is suspended are included as well.
+        Nested batches are merged into the outermost batch.
+        """
+        if self.batch_buffer is not None:
+            yield
+            return
+
+        self.batch_buffer = bytearray()
+        try:
+            yield
+        finally:
+            buffer, self.batch_buffer = self.batch_buffer, None
+            if buffer:
+                self._write(bytes(buffer))
+
+    '''
+    report message handlers
+    '''
+
+    @staticmethod
+    async def _call(callback, data):
+        """
+        Call a report callback, awaiting it if it is a coroutine function.
+
+        :param callback: callback function or coroutine function
+
+        :param data: data list passed to the callback
+        """
+        result = callback(data)
+        if inspect.isawaitable(result):
+            await result
+
+    async def _analog_message(self, data):
+        """
+        This is a private message handler method.
+        It is a message handler for analog messages.
+
+        :param data: message data
+
+        """
+        pin = data[0]
+        value = (data[1] << 8) + data[2]
+        time_stamp = time.time()
+        callback = self.analog_callbacks.get(pin)
+        if callback:
+            message = [PrivateConstants.ANALOG_REPORT, pin, value, time_stamp]
+            await self._call(callback, message)
+
+    async def _digital_message(self, data):
+        """
+        This is a private message handler method.
+        It is a message handler for Digital Messages.
+
+        :param data: digital message
+
+        """
+        pin = data[0]
+        value = data[1]
+
+        time_stamp = time.time()
+        callback = self.digital_callbacks.get(pin)
+        if callback:
+            message = [PrivateConstants.DIGITAL_REPORT, pin, value, time_stamp]
+            await self._call(callback, message)
+
+    async def _firmware_message(self, data):
+        """
+        Telemetrix4Arduino firmware version message
+
+        :param data: data[0] = major number, data[1] = minor number.
+
+                               data[2] = patch number
+        """
+
+        self.firmware_version = [data[0], data[1], data[2]]
+        self.firmware_version_received.set()
+
+    async def _i2c_read_report(self, data):
+        """
+        Execute callback, or set the future, for i2c reads.
+
+        :param data: [I2C_READ_REPORT, i2c_port, number of bytes read, address, register, bytes read..., time-stamp]
+        """
+
+        # data[0] = i2c_port
+        # data[1] = number of bytes returned
+        # data[2] = address
+        # data[3] = register
+        # data[4] ... all the data bytes
+
+        cb_list = [PrivateConstants.I2C_READ_REPORT, data[0], data[1]] + data[2:]
+        cb_list.append(time.time())
+
+        # replies arrive in the order the reads were sent, so a reply owed
+        # to an abandoned read comes before those of any later reads of the
+        # same register: drop it rather than hand it to a later read
+        key = (data[0], data[2], data[3])
+        expired = self.i2c_expired.get(key)
+        if expired:
+            if expired == 1:
+                del self.i2c_expired[key]
+            else:
+                self.i2c_expired[key] = expired - 1
+            return
+
+        # complete the oldest outstanding read of this register
+        pending = self.i2c_pending.get(key)
+        if pending:
+            callback, future, timer = pending.popleft()
+            if not pending:
+                del self.i2c_pending[key]
+            if timer:
+                timer.cancel()
+            if future:
+                if not future.done():
+                    future.set_result(cb_list)
+                return
+        elif cb_list[1]:
+            callback = self.i2c_callback2
+        else:
+            callback = self.i2c_callback
+
+        if callback:
+            await self._call(callback, cb_list)
+
+    def _expire_i2c_read(self, key, entry):
+        """
+        Abandon an outstanding i2c read whose timeout has passed, failing
+        its future with TimeoutError.
+
+        :param key: (i2c port, address, register) of the read
+
+        :param entry: [callback, future, timer] entry of the read
+        """
+        pending = self.i2c_pending.get(key)
+        if not pending or not any(item is entry for item in pending):
+            return
+        pending.remove(entry)
+        if not pending:
+            del self.i2c_pending[key]
+        self.i2c_expired[key] = self.i2c_expired.get(key, 0) + 1
+
+        future = entry[1]
+        if future and not future.done():
+            i2c_port, address, register = key
+            future.set_exception(TimeoutError(
+                f'i2c read of port {i2c_port} address {address} register {register} '
+                f'timed out'))
+
+    async def _i2c_too_few(self, data):
+        """
+        I2c reports too few bytes received
+
+        :param data: data[0] = device address
+        """
+        if self.shutdown_on_exception:
+            await self.shutdown()
+        raise RuntimeError(
+            f'i2c too few bytes received from i2c port {data[0]} i2c address {data[1]}')
+
+    async def _i2c_too_many(self, data):
+        """
+        I2c reports too few bytes received
+
+        :param data: data[0] = device address
+        """
+        if self.shutdown_on_exception:
+            await self.shutdown()
+        raise RuntimeError(
+            f'i2c too many bytes received from i2c port {data[0]} i2c address {data[1]}')
+
+    async def _i_am_here(self, data):
+        """
+        Reply to are_u_there message
+        :param data: arduino id
+        """
+        self.reported_arduino_id = data[0]
+        self.arduino_id_received.set()
+
+    async def _report_debug_data(self, data):
+        """
+        Print debug data sent from Arduino
+        :param data: data[0] is a byte followed by 2
+                     bytes that comprise an integer
+        :return:
+        """
+        value = (data[1] << 8) + data[2]
+        print(f'DEBUG ID: {data[0]} Value: {value}')
+
+    async def _report_loop_data(self, data):
+        """
+        Print data that was looped back
+        :param data: byte of loop back data
+        :return:
+        """
+        if self.loop_back_callback:
+            await self._call(self.loop_back_callback, data)
+
+    async def _features_report(self, report):
+        self.reported_features = report[0]
+        self.features_received.set()
+
+    def _send_command(self, command):
+        """
+        This is a private utility method. It never blocks: the command is
+        either added to the open batch or handed to the transport.
+
+
+        :param command:  command data in the form of a list
+
+        """
+        # the length of the list is added at the head
+        send_message = bytes((len(command), *command))
+
+        if self.batch_buffer is not None:
+            self.batch_buffer += send_message
+        else:
+            self._write(send_message)
+
+    def _write(self, send_message):
+        """
+        This is a private utility method. Whatever the serial port cannot
+        take immediately is kept in serial_write_buffer and written once
+        the port becomes writable.
+
+        :param send_message: bytes to write to the serial port or socket
+
+        """
+        if self.connection_lost:
+            raise RuntimeError(f'Connection to {self.ip_address or self.com_port} '
+                               f'was lost')
+        if self.transport:
+            self.transport.write(send_message)
+        elif self.serial_fd is not None:
+            if self.serial_write_buffer:
+                # keep the commands in order behind those already waiting
+                self.serial_write_buffer += send_message
+                return
+            fd = self.serial_fd
+            try:
+                written = os.write(fd, send_message)
+            except BlockingIOError:
+                written = 0
+            except OSError:
+                self._connection_lost()
+                raise RuntimeError('write fail in _send_command')
+            if written < len(send_message):
+                self.serial_write_buffer += send_message[written:]
+                self.loop.add_writer(fd, self._serial_writable)
+        else:
+            raise RuntimeError('No serial port or ip address set.')
+
+    def _serial_writable(self):
+        """
+        Called by the event loop when the serial port can take more of
+        serial_write_buffer.
+        """
+        fd = self.serial_fd
+        try:
+            written = os.write(fd, self.serial_write_buffer)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._connection_lost()
+            return
+        del self.serial_write_buffer[:written]
+        if not self.serial_write_buffer:
+            self.loop.remove_writer(fd)
+
+    def _serial_readable(self):
+        """
+        Called by the event loop when the serial port has received data.
+        Everything that has arrived is placed onto the queue in a single
+        chunk.
+        """
+        try:
+            data = os.read(self.serial_fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if data:
+            self.the_queue.put_nowait(data)
+        else:
+            self._connection_lost()
+
+    def _connection_lost(self):
+        """
+        Called when the serial port or socket is closed by the device.
+        Stops watching the serial port, fails every outstanding i2c read
+        future and ends the reporter task.
+        """
+        if self.connection_lost:
+            return
+        self.connection_lost = True
+        self.serial_write_buffer.clear()
+        if self.serial_fd is not None:
+            self.loop.remove_reader(self.serial_fd)
+            self.loop.remove_writer(self.serial_fd)
+
+        self._fail_i2c_reads(f'Connection to {self.ip_address or self.com_port} was lost')
+        self.the_queue.put_nowait(None)
+
+    def _fail_i2c_reads(self, message):
+        """
+        Abandon every outstanding i2c read, failing their futures with
+        RuntimeError.
+
+        :param message: error message
+        """
+        for pending in self.i2c_pending.values():
+            for callback, future, timer in pending:
+                if timer:
+                    timer.cancel()
+                if future and not future.done():
+                    future.set_exception(RuntimeError(message))
+        self.i2c_pending.clear()
+        self.i2c_expired.clear()
+
+    async def _reporter(self):
+        """
+        This is the reporter coroutine. It waits for chunks of received
+        data on the queue and appends them to a buffer. Each complete
+        message in the buffer is dispatched, and any partial message is
+        kept until the rest of it arrives.
+        """
+        buffer = bytearray()
+
+        while not self.shutdown_flag:
+            chunk = await self.the_queue.get()
+            # take any other chunks that are already waiting
+            while chunk is not None:
+                buffer += chunk
+                if self.the_queue.empty():
+                    break
+                chunk = self.the_queue.get_nowait()
+
+            try:
+                reports, consumed = self._parse_reports(buffer)
+            except RuntimeError:
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                raise
+            del buffer[:consumed]
+            for report_type, response_data in reports:
+                dispatch_entry = self.report_dispatch.get(report_type)
+                if dispatch_entry:
+                    await dispatch_entry(response_data)
+
+            if chunk is None:
+                # the connection was lost
+                if self.shutdown_on_exception:
+                    await self.shutdown()
+                return
+
+    def _parse_reports(self, buffer):
+        """
+        Split every complete message in buffer into its report type and
+        data.
+
+        :param buffer: bytearray of received data, starting at the packet
+                       length byte of a message
+
+        :returns: a list of (report type, data list) tuples, and the
+                  number of bytes consumed
+        """
+        reports = []
+        position = 0
+        with memoryview(buffer) as view:
+            while position < len(view):
+                packet_length = view[position]
+                if not packet_length:
+                    raise RuntimeError(
+                        'A report with a packet length of zero was received.')
+
+                # wait for the rest of a partial message
+                end = position + 1 + packet_length
+                if end > len(view):
+                    break
+
+                reports.append((view[position + 1], list(view[position + 2:end])))
+                position = end
+        return reports, position
+
+
+class _TelemetrixProtocol(asyncio.Protocol):
+    """
+    asyncio protocol which passes data received over tcp/ip to a
+    TelemetrixAio instance.
+    """
+
+    def __init__(self, board):
+        """
+        :param board: TelemetrixAio instance
+        """
+        self.board = board
+
+    def data_received(self, data):
+        self.board.the_queue.put_nowait(data)
+
+    def connection_lost(self, exc):
+        if not self.board.shutdown_flag:
+            self.board._connection_lost()
@@ -10,7 +10,9 @@ an I2C connection.
 All connections are automatically set up when an instance of the Arduino class is created using a
 configuration text file. The Arduino class's public methods should be sufficient for controlling
 the LED array. In case more manual debugging is needed, the get_attributes method returns all
-attributes of the Arduino object, including private attributes.
+attributes of the Arduino object, including private attributes. The module-level functions hold
+the routing and frame logic which telemetrix_controller_aio.py shares, so that only the I/O
+differs between the two modules.
 
 This module was created to be used with the LED Array Controller v3.0 PCB.
 
@@ -19,10 +21,138 @@ Written by Logan Hanssler, September 05 2024
 University of Chicago South Pole Telescope Group
 '''
 
+import concurrent.futures
+import contextlib
+import heapq
+import itertools
+import struct
+import threading
 import time
+from array import array
 import numpy as np
+import config_compiler
 from telemetrix.telemetrix import Telemetrix
+from telemetrix_pca9685 import pca9685_constants
 from telemetrix_pca9685.telemetrix_pca9685 import TelemetrixPCA9685 as Driver
+from telemetrix_pca9685.telemetrix_pca9685 import TelemetrixPCA9685Broadcast as Broadcast
+
+def routing_tables(compiled):
+    '''
+    Copies a compiled configuration's lookup tables, which are indexed by LED number, into arrays
+    of Python ints, so that routing an LED to its pin, channel, and driver does not create any
+    NumPy temporaries. Shared by Arduino and telemetrix_controller_aio.ArduinoAio.
+
+    Parameters:
+        compiled (CompiledConfig obj): result of config_compiler.compile_config
+
+    Returns:
+        led_pins (int array), led_channels (int array), led_addresses (int array): cathode_pin,
+            anode_channel, and address of every LED
+    '''
+    return (array('i', compiled.led_pins.tolist()),
+            array('i', compiled.led_channels.tolist()),
+            array('i', compiled.led_addresses.tolist()))
+
+def LED_number(num_cols, i, j=None):
+    '''
+    Converts the i and j parameters of LED_on and LED_off to an LED's number and coordinates.
+    Shared by Arduino and telemetrix_controller_aio.ArduinoAio.
+
+    Parameters:
+        num_cols (int): number of columns of the LED array
+        i (int): either the 0-indexed row coordinate of the LED, or its LED number
+        j (int | None): 0-indexed column coordinate of the LED, or None if i is the LED number
+
+    Returns:
+        n (int): LED number
+        r (int): 0-indexed row coordinate
+        c (int): 0-indexed column coordinate
+    '''
+    if j is None:
+        # i refers to LED number
+        r, c = divmod(i, num_cols)
+        return i, r, c
+    # i, j are row, column
+    return i * num_cols + j, i, j
+
+def bright_ticks(bright):
+    '''
+    Converts the bright parameter of LED_on to [on, off] parameters for _channel_out, raising a
+    ValueError before anything is sent if they are not integers between 0 and 4096 inclusive
+    (4096 sets a channel's full on or full off bit). Shared by Arduino and
+    telemetrix_controller_aio.ArduinoAio.
+
+    Parameters:
+        bright (iterable | float): if iterable, then [on, off] parameters; if float, then the
+                                   LED's brightness between 0 and 1 inclusive, which is
+                                   converted to [0, int(4095 * bright)]
+
+    Returns:
+        ticks (list): [on, off] as ints
+    '''
+    ticks = list(bright) if np.iterable(bright) else [0, int(4095 * bright)]
+    if len(ticks) != 2 or any(tick != int(tick) or not 0 <= tick <= 4096 for tick in ticks):
+        raise ValueError(f'Brightness {bright} must be a float between 0 and 1 inclusive, or '
+                         f'[on, off] integers between 0 and 4096 inclusive')
+    return [int(tick) for tick in ticks]
+
+def frame_ticks(shape, brightness):
+    '''
+    Checks that a frame can be displayed on an LED array and converts it to driver ticks, raising
+    a ValueError if it cannot be displayed. Since cathodes are shared along rows and anodes are
+    shared along columns, a frame can only be displayed if every lit row shows the same
+    brightness pattern. Nothing is sent to the board. Shared by Arduino, MultiArduino, and
+    telemetrix_controller_aio.ArduinoAio.
+
+    Parameters:
+        shape (tuple): (rows, columns) of the LED array
+        brightness (2D array): brightness parameter for set_frame
+
+    Returns:
+        rows_on (1D array): True for each row with at least one lit LED
+        lit (2D array): off parameter of every column for each lit row, in ticks
+    '''
+    brightness = np.asarray(brightness, dtype=float)
+    if brightness.shape != tuple(shape):
+        raise ValueError(f'Frame shape {brightness.shape} does not match LED array shape '
+                         f'{tuple(shape)}')
+    if np.any(brightness < 0) or np.any(brightness > 1):
+        raise ValueError('Frame brightness values must be between 0 and 1 inclusive')
+
+    ticks = (4095 * brightness).astype(int)
+    rows_on = np.any(ticks != 0, axis=1)
+    lit = ticks[rows_on]
+    if np.any(lit != lit[0:1]):
+        raise ValueError('Frame cannot be displayed: every lit row must have the same '
+                         'brightness pattern, since rows share cathodes and columns share '
+                         'anodes')
+    return rows_on, lit
+
+def frame_changes(rows_on_now, cols_now, rows_on, lit):
+    '''
+    Compares a frame converted by frame_ticks against the last commanded row and column states,
+    to find the rows and columns set_frame has to write to. Shared by Arduino and
+    telemetrix_controller_aio.ArduinoAio.
+
+    Parameters:
+        rows_on_now (1D array): last commanded state of each row (the _rows_on attribute)
+        cols_now (2D array): last commanded [on, off] parameters of each column (the _cols
+                             attribute)
+        rows_on (1D array), lit (2D array): results of frame_ticks for the new frame
+
+    Returns:
+        cols (2D array): [on, off] parameters of each column for the new frame
+        departing (1D array): rows to release before the columns change
+        changed (1D array): columns whose [on, off] parameters change
+        arriving (1D array): rows to enable after the columns change
+    '''
+    cols = np.zeros_like(cols_now)
+    if len(lit):
+        cols[:, 1] = lit[0]
+    departing = np.where(rows_on_now & ~rows_on)[0]
+    changed = np.where(np.any(cols_now != cols, axis=1))[0]
+    arriving = np.where(rows_on & ~rows_on_now)[0]
+    return cols, departing, changed, arriving
 
 class Arduino:
 
@@ -36,6 +166,10 @@ class Arduino:
                               representations) which were initialized along with the Arduino board
         __addresses (1D array): contains all addresses of the Adafruit drivers;
                                 order in __addresses is the same as __drivers
+        __broadcast (TelemetrixPCA9685Broadcast obj | None): writes to every driver at once
+                                                             through their LED All Call
+                                                             address; None if broadcasts are
+                                                             not enabled
         _LEDs (3D array): axes 0 and 1 are analogous to the LED array being controlled (axis 0 is
                           the row counting downward, axis 1 is the column counting left-to-right);
                           axis 2 is [cathode_pin, anode_channel, address]:
@@ -44,106 +178,196 @@ class Arduino:
                               anode_channel is the driver's channel number which the LED uses as
                                   its anode
                               address is the driver address corresponding to anode_channel
+        _led_pins (int array): cathode_pin of every LED, indexed by LED number
+        _led_channels (int array): anode_channel of every LED, indexed by LED number
+        _led_addresses (int array): address of every LED, indexed by LED number
+        _drivers_by_address (dict): maps each driver address to its TelemetrixPCA9685 object
+        _oe_pin (int | None): Arduino board pin driving the drivers' shared active-low OE
+                              (output enable) line; None if OE is not controlled
+        _rows_on (1D array): last commanded state of each row's cathode pin; True if the pin is
+                             driven low as an output, False if it is released to read mode
+        _cols (2D array): last commanded [on, off] parameters of each column's anode channel
+        _pin_modes (dict): shadow of each Arduino board pin's mode ('READ', 'WRITE', or 'PWM');
+                           a pin is missing if its mode is unknown
+        _pin_levels (dict): shadow of the last digital output written to each Arduino board pin;
+                            a pin is missing if its level is unknown
+        _channel_ticks (dict): shadow of each driver channel's [on, off] parameters, keyed by
+                               (address, channel); a channel is missing if its state is unknown
+        __lock (RLock): held while commands are sent, so that blinks running in the background
+                        and calls from the main thread do not interleave
+        __blink_condition (Condition): wakes the blink scheduler thread when a blink is added
+        __blink_events (list): heap of [deadline, sequence number, Blink obj, action] for every
+                               pending blink action
+        __blink_thread (Thread): background thread which runs __blink_scheduler; None until the
+                                 first non-blocking blink is started
+        _event_log (EventLog obj | None): records every LED state change with timestamps; None if
+                                          events are not recorded
 
     Methods:
         __init__ (dunder): constructor
-        __LED_array (private): helper method for the constructor
+        __routing_tables (private): helper method for the constructor
         _pin_mode (internal): directly changes an Arduino board pin to digital input,
-                              digital output, or analog output mode
-        _pin_out (internal): writes a digital output to an Arduino board pin;
+                              digital output, or analog output mode, unless the pin is already
+                              in that mode
+        _pin_out (internal): writes a digital output to an Arduino board pin, unless the pin
+                             already has that output;
                              assumes the specified pin is in digital output mode before the
                              method is called
-        _channel_out (internal): writes a PWM output to a PCA9685 driver channel
+        _channel_out (internal): writes a PWM output to a PCA9685 driver channel, unless the
+                                 channel already has that output
         LED_on (public): turns a given LED on
-        LED_blink (public): blinks a given LED on and off by calling LED_on and LED_off
+        LED_blink (public): blinks a given LED on and off by calling LED_on and LED_off, either
+                            blocking or in the background
+        __blink_scheduler (private): runs every pending blink action at its deadline
+        __blink_step (private): helper method for __blink_scheduler
+        __blink_stop (private): stops a blink and turns its LED off
+        scan (public): lights a sequence of LEDs one at a time, each for a fixed dwell time
+        __wait_until (private): helper method for scan
         LED_off (public): turns a given LED off
-        global_off (public): calls LED_off for every LED
+        global_off (public): turns every driver channel off at once and releases every pin,
+                             then confirms the drivers are dark
+        set_pwm_freq (public): sets the PWM frequency of every driver
+        blank (public): disables every driver's outputs at once through the OE line
+        unblank (public): re-enables every driver's outputs through the OE line
+        _blanked (internal): helper method for set_frame which blanks the outputs for the
+                             duration of a with block
+        _confirm_dark (internal): reads back every driver channel and raises an error unless
+                                  all of them are off
+        _frame_ticks (internal): helper method for set_frame which checks that a frame can be
+                                 displayed and converts it to driver ticks
+        set_frame (public): drives the whole LED array to a 2D brightness array, sending only the
+                            pins and channels which changed since the last commanded state
+        __LED_ticks (private): helper method which returns the [on, off] parameters every LED
+                               is lit with
+        __LED_changes (private): helper method which finds the LEDs whose [on, off] parameters
+                                 changed
+        __record_LEDs (private): helper method which records the LEDs whose [on, off]
+                                 parameters changed in the event log
+        resync (public): re-sends every driver's mode registers and every known pin and channel
+                         state to the hardware
         get_attributes (public): returns all attributes as a dictionary,
                                  including private attributes
     '''
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, broadcast_address=None, oe_pin=None,
+                 config_cache=config_compiler.DEFAULT_CACHE_DIR, event_log=None, **board_kwargs):
         '''
         Constructor method for the Arduino class.
-        Calls __LED_array helper method to construct the LED array.
+        Calls config_compiler.compile_config to validate the configuration and compile it into
+        the LED array and its lookup tables, before the board is connected.
+        Calls __routing_tables helper method to take the lookup tables from the compiled
+        configuration.
         Calls global_off method to reset the board and all drivers.
 
         Parameters:
             self
-            file_path (str): file path for the configuration file which dictates the
-                             LED array's setup;
-                             required parameter, used to call __LED_array
+            file_path (str | 2D array | CompiledConfig obj): file path for the configuration
+                                        file which dictates the LED array's setup, the
+                                        configuration file's already loaded data, or an already
+                                        compiled configuration (as used by MultiArduino);
+                                        required parameter, a ValueError describing every wiring
+                                        mistake found is raised if it is invalid
+            broadcast_address (int | None): I2C address to enable as every driver's LED All
+                                            Call address, so that settings shared by all
+                                            drivers are sent once and take effect on every
+                                            driver at the same time; must not be used by any
+                                            other device on the I2C bus; default value None
+                                            leaves broadcasts disabled
+            oe_pin (int | None): Arduino board pin wired to the drivers' OE line, which enables
+                                 blank, unblank, and glitch-free set_frame updates; must not be
+                                 a row pin or one of the RX and TX pins in
+                                 config_compiler.SERIAL_PINS; default value None leaves OE
+                                 uncontrolled
+            config_cache (str | None): directory where compiled configurations are cached, keyed
+                                       by a hash of the configuration file's contents;
+                                       None disables the cache
+            event_log (EventLog obj | None): records every LED state change commanded from then
+                                             on, starting with the constructor's global_off;
+                                             default value None records nothing
+            board_kwargs: keyword arguments passed on to the Telemetrix constructor, such as
+                          com_port, or ip_address and ip_port for a board reached over TCP/IP
+                          (for example a telemetrix_simulator.SimulatedArduino)
 
         Returns:
             None
         '''
-        # Reading out the config file
-        config = np.loadtxt(file_path).astype(int)
-        addresses = np.unique(config[:, 2])
+        # Compiling the config file
+        compiled = config_compiler.compile_config(file_path, cache_dir=config_cache)
+        if oe_pin is not None and oe_pin in config_compiler.SERIAL_PINS:
+            raise ValueError(f'OE pin {oe_pin} is one of the Arduino Nano\'s RX and TX pins, '
+                             f'which carry its USB serial connection')
+        if oe_pin is not None and oe_pin in compiled.row_pins:
+            raise ValueError(f'OE pin {oe_pin} is also a row pin')
 
         # Setting up private attributes
-        self.__board = Telemetrix()
+        self.__board = Telemetrix(**board_kwargs)
         self.__board.set_pin_mode_i2c()
-        self.__addresses = addresses[np.where(addresses != 0)[0]]
+        self.__addresses = compiled.addresses
         self.__drivers = np.array([Driver(board=self.__board,
-                                          i2c_address=address) for address in self.__addresses])
+                                          i2c_address=int(address))
+                                   for address in self.__addresses])
+        self.__broadcast = None
+        if broadcast_address is not None:
+            if broadcast_address in self.__addresses:
+                raise ValueError(f'Broadcast address {broadcast_address} is also a driver address')
+            self.__broadcast = Broadcast(self.__drivers, i2c_address=broadcast_address)
+
+        self.__lock = threading.RLock()
+        self.__blink_condition = threading.Condition(self.__lock)
+        self.__blink_events = []
+        self.__blink_sequence = itertools.count()
+        self.__blink_thread = None
+        self._event_log = event_log
+
+        # Shadow copies of the hardware state; empty until the first write
+        self._pin_modes = {}
+        self._pin_levels = {}
+        self._channel_ticks = {}
 
         # Initializing the LED array
-        self._LEDs = self.__LED_array(config)
-        self.global_off()
+        self._LEDs = compiled.LEDs
+        self.__routing_tables(compiled)
+
+        # Every time a pin_number's mode is updated, telemetrix tries to call
+        # self.__board.digital_callbacks[pin_number]. This yields a warning if
+        # pin_number is not a valid index; the next line prevents the warning.
+        for pin in compiled.row_pins:
+            self.__board.digital_callbacks[int(pin)] = None
+        num_rows, num_cols = self._LEDs.shape[0:2]
+        self._rows_on = np.zeros(num_rows, dtype=bool)
+        self._cols = np.zeros((num_cols, 2), dtype=int)
+
+        self._oe_pin = oe_pin
+        if oe_pin is not None:
+            # The outputs stay blanked until every channel has been turned off
+            self.blank()
+            self.global_off()
+            self.unblank()
+        else:
+            self.global_off()
 
-    def __LED_array(self, config):
+    def __routing_tables(self, compiled):
         '''
         Private helper method for the Arduino object's constructor.
-        Called to create the _LEDs attribute from the configuration file's data.
-        It is assumed that cathodes correspond to rows and use pins on the board, while
-        anodes correspond to columns and use channels on a driver.
+        Calls routing_tables to take the compiled configuration's lookup tables, and maps each
+        driver address to its driver.
 
         Parameters:
             self
-            config (2D array): result of np.loadtxt call on the configuration file;
-                               data must be formatted as axis 0 distinguishing between different
-                               pins/channels, axis 1 as [row_or_col_number, pin_or_channel_number,
-                               driver_address];
-                               a pin has no driver address, so driver_address should be
-                               0 for a pin
+            compiled (CompiledConfig obj): result of config_compiler.compile_config
 
         Returns:
-            data (3D array): _LEDs attribute
+            None
         '''
-        cathode_indices = np.where(config[:, 2] == 0)[0]
-        anode_indices = np.where(config[:, 2] != 0)[0]
-        cathodes = config[cathode_indices][:, :2] # No need for a blank address
-        anodes = config[anode_indices]
-
-        sorted_cathode_indices = np.argsort(cathodes[:, 0])
-        sorted_anode_indices = np.argsort(anodes[:, 0])
-        cathodes = cathodes[sorted_cathode_indices]
-        anodes = anodes[sorted_anode_indices]
-
-        num_rows, num_cols = np.max(cathodes[:, 0]), np.max(anodes[:, 0])
-        pins, channels, addresses = np.zeros((3, num_rows, num_cols))
-
-        pins += cathodes[:, 1][:, np.newaxis]
-        channels += anodes[:, 1]
-        addresses += anodes[:, 2]
-
-        data = np.concatenate((pins[:, :, np.newaxis],
-                               channels[:, :, np.newaxis],
-                               addresses[:, :, np.newaxis]), axis=2)
-
-        # Every time a pin_number's mode is updated, telemetrix tries to call
-        # self.__board.digital_callbacks[pin_number]. This yields a warning if
-        # pin_number is not a valid index; the next line prevents the warning.
-        for pin in pins[:, 0]:
-            self.__board.digital_callbacks[int(pin)] = None
-
-        return data
+        self._led_pins, self._led_channels, self._led_addresses = routing_tables(compiled)
+        self._drivers_by_address = {int(address): driver for address, driver
+                                    in zip(self.__addresses, self.__drivers)}
 
     def _pin_mode(self, pin, mode):
         '''
         Directly changes an Arduino board pin to digital input, digital output, or analog output
         mode. These are equivalent to read, write, and pwm modes in the Arduino IDE.
+        No command is sent if _pin_modes shows the pin is already in the given mode.
 
         Parameters:
             self
@@ -156,6 +380,9 @@ class Arduino:
         Returns:
             None
         '''
+        if self._pin_modes.get(pin) == mode:
+            return
+
         if mode == 'READ':
             self.__board.set_pin_mode_digital_input(pin)
         elif mode == 'WRITE':
@@ -164,11 +391,13 @@ class Arduino:
             self.__board.set_pin_mode_analog_output(pin)
         else:
             raise NameError('Invalid mode; mode must be \'READ\', \'WRITE\', or \'PWM\'')
+        self._pin_modes[pin] = mode
 
     def _pin_out(self, pin, value):
         '''
         Writes a digital output to an Arduino board pin.
         Assumes the specified pin is in digital output mode before the method is called.
+        No command is sent if _pin_levels shows the pin already has the given output.
 
         Parameters:
             self
@@ -178,11 +407,16 @@ class Arduino:
         Returns:
             None
         '''
+        if self._pin_levels.get(pin) == value:
+            return
+
         self.__board.digital_write(pin, value)
+        self._pin_levels[pin] = value
 
     def _channel_out(self, address, channel, on, off):
         '''
         Writes a PWM output to a PCA9685 driver channel.
+        No command is sent if _channel_ticks shows the channel already has the given output.
 
         Parameters:
 
@@ -201,14 +435,18 @@ class Arduino:
         Returns:
             None
         '''
-        driver = self.__drivers[np.where(self.__addresses == address)[0][0]]
-        driver.set_pwm(channel, on, off)
+        if self._channel_ticks.get((address, channel)) == (on, off):
+            return
+
+        self._drivers_by_address[address].set_pwm(channel, on, off)
+        self._channel_ticks[(address, channel)] = (on, off)
 
     def LED_on(self, i, j=None, bright=1):
         '''
         Turns a given LED on by calling _pin_mode, _pin_out, and _channel_out methods for that
-        LED's cathode pin and anode channel. Does not make assumptions about a pin or channel's
-        state. Can either be called with an LED number or the LED's coordinates in the LED array.
+        LED's cathode pin and anode channel. Commands which would not change a pin or channel's
+        shadowed state are skipped, and the rest are sent in a single write. Can either be
+        called with an LED number or the LED's coordinates in the LED array.
 
         Parameters:
             self
@@ -223,34 +461,39 @@ class Arduino:
                                        if float, then creates [on, off] parameters as
                                        [0,int(4095 * cycle)], so float must be between 0 and 1
                                        inclusive and describes LED brightness; default value 1
-                                       corresponds to LED always on for max brightness
+                                       corresponds to LED always on for max brightness;
+                                       converted by bright_ticks, which raises a ValueError
+                                       before anything is sent if the [on, off] parameters are
+                                       not integers between 0 and 4096 inclusive
 
         Returns:
             None
         '''
-        if j is None:
-            # i refers to LED number
-            num_cols = self._LEDs.shape[1]
-            r = int(i / num_cols)
-            c = i % num_cols
-        else:
-            # i, j are row, column
-            r, c = i, j
+        n, r, c = LED_number(self._LEDs.shape[1], i, j)
+        bright = bright_ticks(bright)
 
-        if not np.iterable(bright):
-            bright = [0, int(4095 * bright)]
-
-        LED = self._LEDs[r, c].astype(int)
-        pin, channel, address = LED
-        self._pin_mode(pin, 'WRITE')
-        self._pin_out(pin, 0)
-        self._channel_out(address, channel, *bright)
+        with self.__lock:
+            if self._event_log is not None:
+                previous = self.__LED_ticks()
+            before = time.monotonic_ns()
+            with self.__board.batch():
+                pin = self._led_pins[n]
+                channel = self._led_channels[n]
+                address = self._led_addresses[n]
+                self._pin_mode(pin, 'WRITE')
+                self._pin_out(pin, 0)
+                self._channel_out(address, channel, *bright)
+                self._rows_on[r] = True
+                self._cols[c] = bright
+            if self._event_log is not None:
+                self.__record_LEDs(previous, before)
 
     def LED_off(self, i, j=None):
         '''
         Turns a given LED off by calling _pin_mode, _pin_out, and _channel_out methods for that
-        LED's cathode pin and anode channel. Does not make assumptions about a pin or channel's
-        state. Can either be called with an LED number or the LED's coordinates in the LED array.
+        LED's cathode pin and anode channel. Commands which would not change a pin or channel's
+        shadowed state are skipped, and the rest are sent in a single write. Can either be
+        called with an LED number or the LED's coordinates in the LED array.
 
         Parameters:
             self
@@ -264,50 +507,336 @@ class Arduino:
         Returns:
             None
         '''
-        if j is None:
-            # i refers to LED number
+        n, r, c = LED_number(self._LEDs.shape[1], i, j)
+
+        with self.__lock:
+            if self._event_log is not None:
+                previous = self.__LED_ticks()
+            before = time.monotonic_ns()
+            with self.__board.batch():
+                pin = self._led_pins[n]
+                channel = self._led_channels[n]
+                address = self._led_addresses[n]
+                self._channel_out(address, channel, 0, 0)
+                if self._pin_levels.get(pin) != 0:
+                    # The pin must be an output for its low voltage to be latched
+                    self._pin_mode(pin, 'WRITE')
+                    self._pin_out(pin, 0)
+                self._pin_mode(pin, 'READ')
+                self._rows_on[r] = False
+                self._cols[c] = 0
+            if self._event_log is not None:
+                self.__record_LEDs(previous, before)
+
+    def global_off(self, timeout=1):
+        '''
+        Turns every LED off, thus never turning on any channels in their cycle and setting all
+        pins to read mode with a write-ready low voltage. Each driver's channels are all turned
+        off with a single write to its ALL_LED registers, which is sent once to every driver if
+        broadcasts are enabled, and each distinct cathode pin is released once, with the
+        commands coalesced in a Telemetrix batch. Does not return until
+        _confirm_dark has read the channels back as off; since the board handles commands in
+        order, this also confirms the pins were released.
+
+        Parameters:
+            self
+            timeout (float): time in seconds to wait for the drivers' channels to be read back;
+                             default value 1
+
+        Returns:
+            None
+        '''
+        with self.__lock:
+            before = time.monotonic_ns()
+            with self.__board.batch():
+                if self.__broadcast:
+                    self.__broadcast.set_all_pwm(0, 0)
+                for address, driver in self._drivers_by_address.items():
+                    if not self.__broadcast:
+                        driver.set_all_pwm(0, 0)
+                    for channel in range(16):
+                        self._channel_ticks[(address, channel)] = (0, 0)
+
+                for pin in sorted(set(self._led_pins)):
+                    if self._pin_levels.get(pin) != 0:
+                        # The pin must be an output for its low voltage to be latched
+                        self._pin_mode(pin, 'WRITE')
+                        self._pin_out(pin, 0)
+                    self._pin_mode(pin, 'READ')
+
+            self._rows_on[:] = False
+            self._cols[:] = 0
+            if self._event_log is not None:
+                self._event_log.record(EventLog.GLOBAL_OFF, -1, 0, 0, before,
+                                       time.monotonic_ns())
+            self._confirm_dark(timeout)
+
+    def set_pwm_freq(self, freq):
+        '''
+        Sets the PWM frequency of every driver, with a single broadcast if broadcasts are enabled
+        so that every driver switches at the same time. The writes are not batched: each driver
+        waits for its oscillator to settle between clearing SLEEP and setting RESTART, and a
+        batch would hold both writes back until the wait was over and send them together.
+
+        Parameters:
+            self
+            freq (float): PWM frequency in Hz, clamped by the drivers to between 1 and 3500
+
+        Returns:
+            None
+        '''
+        with self.__lock:
+            if self.__broadcast:
+                self.__broadcast.set_pwm_freq(freq)
+            else:
+                for driver in self.__drivers:
+                    driver.set_pwm_freq(freq)
+
+    def blank(self):
+        '''
+        Disables the outputs of every driver at once by driving the shared OE line high with a
+        single digital write, turning every LED off without changing any driver registers.
+        The LEDs stay off until unblank is called. Requires oe_pin to have been given to the
+        constructor.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        if self._oe_pin is None:
+            raise RuntimeError('blank requires the oe_pin constructor argument')
+        with self.__lock:
+            before = time.monotonic_ns()
+            self._pin_mode(self._oe_pin, 'WRITE')
+            self._pin_out(self._oe_pin, 1)
+            if self._event_log is not None:
+                self._event_log.record(EventLog.BLANK, -1, 0, 0, before, time.monotonic_ns())
+
+    def unblank(self):
+        '''
+        Re-enables the outputs of every driver by driving the shared OE line low, showing the
+        current driver registers. Requires oe_pin to have been given to the constructor.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        if self._oe_pin is None:
+            raise RuntimeError('unblank requires the oe_pin constructor argument')
+        with self.__lock:
+            before = time.monotonic_ns()
+            self._pin_mode(self._oe_pin, 'WRITE')
+            self._pin_out(self._oe_pin, 0)
+            if self._event_log is not None:
+                self._event_log.record(EventLog.UNBLANK, -1, 0, 0, before, time.monotonic_ns())
+
+    @contextlib.contextmanager
+    def _blanked(self):
+        '''
+        Internal helper method for set_frame.
+        Blanks the outputs for the duration of a with block if oe_pin was given and the outputs
+        are not already blanked, and unblanks them afterwards. Does nothing otherwise. The OE
+        line is written directly rather than through blank and unblank, so that the event log
+        only records the LEDs which set_frame changed.
+
+        Parameters:
+            self
+
+        Returns:
+            context manager
+        '''
+        if self._oe_pin is None or self._pin_levels.get(self._oe_pin) == 1:
+            yield
+            return
+        self._pin_mode(self._oe_pin, 'WRITE')
+        self._pin_out(self._oe_pin, 1)
+        try:
+            yield
+        finally:
+            self._pin_out(self._oe_pin, 0)
+
+    def _confirm_dark(self, timeout):
+        '''
+        Reads back the LEDn registers of every driver and raises a RuntimeError unless every
+        channel's [on, off] parameters are [0, 0]. The registers are read 4 channels at a time to
+        stay within the board's I2C buffer. One driver's 4 reads (32 bytes of commands) are sent
+        in a single write, and their replies are waited for before the next driver's reads are
+        sent, so the reads in flight never overrun the board's 64-byte serial receive buffer.
+
+        Parameters:
+            self
+            timeout (float): time in seconds to wait for each driver's reads to complete
+
+        Returns:
+            None
+        '''
+        registers = [pca9685_constants.PCA9685_LED0_ON_L + 16 * block for block in range(4)]
+        for address in self._drivers_by_address:
+            # every read of the driver is sent before waiting on any reply
+            with self.__board.batch():
+                replies = [self.__board.i2c_read_future(address, register, 16, timeout=timeout)
+                           for register in registers]
+
+            for register, reply in zip(registers, replies):
+                try:
+                    # data is [i2c_read_report, port, number of bytes read, i2c address,
+                    #          device_register, data values..., time_stamp]
+                    values = reply.result()[5:-1]
+                except TimeoutError:
+                    raise RuntimeError('Could not confirm all LEDs are off; driver readback '
+                                       'timed out') from None
+                if any(values):
+                    raise RuntimeError(f'Could not confirm all LEDs are off; driver {address} '
+                                       f'register {register} read back {values}')
+
+    def set_frame(self, brightness):
+        '''
+        Drives the whole LED array to the state described by a 2D brightness array in one call.
+        The new frame is compared against the last commanded pin and channel states (which LED_on,
+        LED_off, and global_off also keep up to date), and only the pins and channels which
+        changed are written to.
+        Since cathodes are shared along rows and anodes are shared along columns, a frame can only
+        be displayed if every lit row shows the same brightness pattern; any other frame would
+        light unwanted LEDs, so a ValueError is raised instead.
+        If oe_pin was given, the outputs are blanked while the changes are written and then
+        unblanked, so the whole new frame appears at once rather than one write at a time.
+
+        Parameters:
+            self
+            brightness (2D array): same shape as the LED array, where each element is the
+                                   brightness of the corresponding LED as a float between 0 and 1
+                                   inclusive; brightness is converted to [on, off] parameters as
+                                   [0, int(4095 * brightness)], as in LED_on
+
+        Returns:
+            None
+        '''
+        rows_on, lit = self._frame_ticks(brightness)
+
+        with self.__lock:
+            cols, departing, changed, arriving = frame_changes(self._rows_on, self._cols,
+                                                               rows_on, lit)
             num_cols = self._LEDs.shape[1]
-            r = int(i / num_cols)
-            c = i % num_cols
-        else:
-            # i, j are row, column
-            r, c = i, j
+            pins = self._led_pins[::num_cols]
+            channels = self._led_channels[:num_cols]
+            addresses = self._led_addresses[:num_cols]
+
+            if not (len(departing) or len(changed) or len(arriving)):
+                return
+            if self._event_log is not None:
+                previous = self.__LED_ticks()
+
+            # Rows are released before channels change and enabled after, so no LED outside the new
+            # frame is lit while the update is in flight
+            before = time.monotonic_ns()
+            with self.__board.batch(), self._blanked():
+                for r in departing:
+                    self._pin_mode(pins[r], 'READ')
+                    self._rows_on[r] = False
+                for c in changed:
+                    self._channel_out(addresses[c], channels[c], *cols[c])
+                    self._cols[c] = cols[c]
+                for r in arriving:
+                    self._pin_mode(pins[r], 'WRITE')
+                    self._pin_out(pins[r], 0)
+                    self._rows_on[r] = True
+
+            if self._event_log is not None:
+                self.__record_LEDs(previous, before)
+
+    def __LED_ticks(self):
+        '''
+        Private helper method for LED_on, LED_off, set_frame, and scan.
+        Returns the [on, off] parameters each LED is lit with according to _rows_on and _cols,
+        which are [0, 0] for every LED in a row whose cathode pin is released.
+
+        Parameters:
+            self
+
+        Returns:
+            ticks (3D array): axes 0 and 1 are the LED array's rows and columns, as in _LEDs;
+                              axis 2 is [on, off]
+        '''
+        return np.where(self._rows_on[:, np.newaxis, np.newaxis], self._cols[np.newaxis], 0)
+
+    def __LED_changes(self, previous):
+        '''
+        Private helper method for LED_on, LED_off, set_frame, and scan.
+        Compares the [on, off] parameters each LED is now lit with against an earlier result of
+        __LED_ticks. Since cathodes are shared along rows and anodes along columns, a single
+        LED_on or LED_off can change every LED in its row and column.
+
+        Parameters:
+            self
+            previous (3D array): earlier result of __LED_ticks
 
-        LED = self._LEDs[r, c].astype(int)
-        pin, channel, address = LED
-        self._channel_out(address, channel, 0, 0)
-        self._pin_mode(pin, 'WRITE')
-        self._pin_out(pin, 0)
-        self._pin_mode(pin, 'READ')
+        Returns:
+            ticks (3D array): current result of __LED_ticks
+            changes (tuple): LED numbers (1D array) of the LEDs which changed, and their new on
+                             and off parameters (1D arrays), as taken by EventLog.record_many
+        '''
+        ticks = self.__LED_ticks()
+        changed = (ticks != previous).reshape(-1, 2)
+        LEDs = np.flatnonzero(changed[:, 0] | changed[:, 1])
+        on, off = ticks.reshape(-1, 2)[LEDs].T
+        return ticks, (LEDs, on, off)
 
-    def global_off(self):
+    def __record_LEDs(self, previous, before):
         '''
-        Calls LED_off for every LED, thus never turning on any channels in their cycle and setting
-        all pins to read mode with a write-ready low voltage.
+        Private helper method for LED_on, LED_off, and set_frame.
+        Records an event in the event log for every LED whose [on, off] parameters changed since
+        previous was taken.
 
         Parameters:
             self
+            previous (3D array): result of __LED_ticks from before the change
+            before (int): time.monotonic_ns() value from before the change was sent
 
         Returns:
             None
         '''
-        num_rows, num_cols = self._LEDs.shape[0:2]
-        num_LEDs = num_rows * num_cols
-        for i in range(num_LEDs):
-            self.LED_off(i)
+        after = time.monotonic_ns()
+        _, changes = self.__LED_changes(previous)
+        self._event_log.record_many(EventLog.LED, *changes, before, after)
+
+    def _frame_ticks(self, brightness):
+        '''
+        Internal helper method for set_frame.
+        Calls frame_ticks for the LED array's shape. Nothing is sent to the board, so
+        MultiArduino also calls this to check every board's part of a frame before any board is
+        updated.
+
+        Parameters:
+            self
+            brightness (2D array): brightness parameter for set_frame
+
+        Returns:
+            rows_on (1D array), lit (2D array): results of frame_ticks
+        '''
+        return frame_ticks(self._LEDs.shape[0:2], brightness)
 
-    def LED_blink(self, i, j=None, num_iter=0, period=1, bright=1):
+    def LED_blink(self, i, j=None, num_iter=0, period=1, bright=1, block=True):
         '''
         'Blinks' a given LED by turning it on and off with a specified period for a
         specified number of iterations. Calls LED_on and LED_off to turn the LED on and off.
+        Every on and off is scheduled on a background thread against time.monotonic() deadlines
+        measured from the start of the blink, so command latency does not make the period drift.
+        Several LEDs can be blinked at once with different periods by calling LED_blink with
+        block set to False.
 
         Parameters:
             self
             i (int): i parameter for LED_on and LED_off
             j (int): j parameter for LED_on and LED_off
-            num_iter (int): number of times to cycle the given LED;
-                            1 cycle is defined as 1 iteration of turning the LED on then off;
-                            default value 0 corresponds to no iterations
+            num_iter (int | None): number of times to cycle the given LED;
+                                   1 cycle is defined as 1 iteration of turning the LED on then
+                                   off; default value 0 corresponds to no iterations;
+                                   None corresponds to blinking until the Blink obj is stopped,
+                                   which requires block to be False
             period (float): total time length of 1 cycle in seconds;
                             the LED is turned on, then period / 2 seconds pass,
                             the LED is turned off, then period / 2 seconds pass again for a cycle;
@@ -316,15 +845,258 @@ class Arduino:
             bright (iterable | float): bright parameter for LED_on;
                                        default value 1 corresponds to turning the LED on at full
                                        brightness
+            block (bool): if True, returns once every cycle is complete, and stops the blink
+                          and turns the LED off if the wait is interrupted (for example by
+                          Ctrl-C);
+                          if False, returns immediately with a Blink obj which can be used to
+                          stop the blink and to query its achieved period
+
+        Returns:
+            blink (Blink obj | None): the running blink if block is False, otherwise None
+        '''
+        if num_iter is None and block:
+            raise ValueError('num_iter must be given when blocking, or the blink would never end')
+
+        blink = Blink(self.__blink_stop, (i, j), period, bright, num_iter)
+        with self.__blink_condition:
+            if self.__blink_thread is None:
+                self.__blink_thread = threading.Thread(target=self.__blink_scheduler,
+                                                       daemon=True)
+                self.__blink_thread.start()
+            heapq.heappush(self.__blink_events,
+                           [blink.start, next(self.__blink_sequence), blink, 'on'])
+            self.__blink_condition.notify()
+
+        if not block:
+            return blink
+        try:
+            blink.wait()
+        except BaseException:
+            blink.stop()
+            raise
+        if blink.error is not None:
+            raise blink.error
+        return None
+
+    def __blink_scheduler(self):
+        '''
+        Private method run by the blink scheduler thread.
+        Waits for the earliest pending blink action and runs it once its deadline has passed.
+        Actions of stopped blinks are discarded.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        with self.__blink_condition:
+            while True:
+                if not self.__blink_events:
+                    self.__blink_condition.wait()
+                    continue
+                deadline, _, blink, action = self.__blink_events[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0 and not blink.done:
+                    self.__blink_condition.wait(remaining)
+                    continue
+                heapq.heappop(self.__blink_events)
+                if not blink.done:
+                    self.__blink_step(blink, action, deadline)
+
+    def __blink_step(self, blink, action, deadline):
+        '''
+        Private helper method for __blink_scheduler.
+        Runs one blink action and schedules the blink's next action. Turning the LED on records
+        the time it happened in the Blink obj's period statistics.
+
+        Parameters:
+            self
+            blink (Blink obj): blink whose action is run
+            action (str): 'on' turns the LED on, 'off' turns the LED off, and 'end' marks the blink
+                          as complete
+            deadline (float): time.monotonic() value the action was scheduled for
+
+        Returns:
+            None
+        '''
+        i, j = blink.LED
+        try:
+            if action == 'on':
+                self.LED_on(i, j, blink.bright)
+                blink._record(deadline, time.monotonic())
+                next_action, next_deadline = 'off', deadline + blink.period / 2
+            elif action == 'off':
+                self.LED_off(i, j)
+                blink.cycles += 1
+                next_deadline = blink.start + blink.cycles * blink.period
+                if blink.num_iter is not None and blink.cycles >= blink.num_iter:
+                    next_action = 'end'
+                else:
+                    next_action = 'on'
+            else:
+                blink._finish()
+                return
+        except Exception as error:
+            blink.error = error
+            blink._finish()
+            return
+
+        heapq.heappush(self.__blink_events,
+                       [next_deadline, next(self.__blink_sequence), blink, next_action])
+
+    def __blink_stop(self, blink):
+        '''
+        Private method called by Blink.stop.
+        Marks the blink as complete, removes its pending actions from the schedule, and turns its
+        LED off.
+
+        Parameters:
+            self
+            blink (Blink obj): blink to stop
+
+        Returns:
+            None
+        '''
+        with self.__blink_condition:
+            if blink.done:
+                return
+            blink._finish()
+            self.__blink_events[:] = [event for event in self.__blink_events
+                                      if event[2] is not blink]
+            heapq.heapify(self.__blink_events)
+            self.LED_off(*blink.LED)
+            self.__blink_condition.notify()
+
+    def scan(self, order, dwell, bright=1):
+        '''
+        Lights each LED in order for dwell seconds, one at a time, as in a raster scan.
+        The commands for every step (turning the previous LED off and the next LED on) are
+        encoded before the scan starts and sent in a single write per step. Steps are scheduled
+        against time.monotonic() deadlines measured from the start of the scan rather than from
+        the previous step, so command latency never accumulates; each write is also issued early
+        by the time its bytes take to transmit at the serial baud rate, so that the LED changes
+        at its deadline. If the scan is interrupted, the shadow state is discarded and global_off
+        is called before the exception is raised again. If an event log was given to the
+        constructor, each step's LED changes are recorded when its write is sent rather than
+        when it is encoded.
+
+        Parameters:
+            self
+            order (iterable): LED numbers to light, in order; LED numbers are defined as in LED_on
+            dwell (float): time in seconds that each LED is lit for
+            bright (iterable | float): bright parameter for LED_on;
+                                       default value 1 corresponds to turning the LEDs on at full
+                                       brightness
+
+        Returns:
+            log (2D array): one row per step; columns are [LED number, deadline, write start,
+                            write end], where the times are time.monotonic() values in seconds
+        '''
+        order = [int(n) for n in order]
+        log = np.zeros((len(order), 4))
+        if not order:
+            return log
+
+        with self.__lock:
+            # Encoding every step up front also leaves the shadow state as it will be after the scan
+            event_log, self._event_log = self._event_log, None
+            streams = []
+            changes = []
+            ticks = self.__LED_ticks()
+            previous = None
+            try:
+                for n in order + [None]:
+                    with self.__board.capture_commands() as stream:
+                        if previous is not None:
+                            self.LED_off(previous)
+                        if n is not None:
+                            self.LED_on(n, bright=bright)
+                    streams.append(bytes(stream))
+                    if event_log is not None:
+                        ticks, step_changes = self.__LED_changes(ticks)
+                        changes.append(step_changes)
+                    previous = n
+            finally:
+                self._event_log = event_log
+
+            serial_port = self.__board.serial_port
+            seconds_per_byte = 10 / serial_port.baudrate if serial_port else 0
+
+            try:
+                start = time.monotonic() + len(streams[0]) * seconds_per_byte
+                for k, stream in enumerate(streams):
+                    deadline = start + k * dwell
+                    self.__wait_until(deadline - len(stream) * seconds_per_byte)
+                    write_start = time.monotonic()
+                    before = time.monotonic_ns()
+                    self.__board.write_encoded(stream)
+                    if event_log is not None:
+                        event_log.record_many(EventLog.LED, *changes[k], before,
+                                              time.monotonic_ns())
+                    if k < len(order):
+                        log[k] = order[k], deadline, write_start, time.monotonic()
+            except BaseException:
+                self._pin_modes.clear()
+                self._pin_levels.clear()
+                self._channel_ticks.clear()
+                self.global_off()
+                raise
+
+        return log
+
+    @staticmethod
+    def __wait_until(deadline):
+        '''
+        Private helper method for scan.
+        Sleeps until shortly before a time.monotonic() deadline, then spins until the deadline
+        itself, since time.sleep alone can overshoot by more than a millisecond.
+
+        Parameters:
+            deadline (float): time.monotonic() value to wait for
+
+        Returns:
+            None
+        '''
+        remaining = deadline - time.monotonic()
+        if remaining > 0.002:
+            time.sleep(remaining - 0.002)
+        while time.monotonic() < deadline:
+            pass
+
+    def resync(self):
+        '''
+        Re-sends every pin mode, pin output, and channel output held in the shadow state, for
+        example after the board or a driver was reset externally. Each driver's mode, address,
+        and prescaler registers are first rewritten from its register shadow by
+        TelemetrixPCA9685.restore, outside of the batch, since the driver must wait for its
+        oscillator to settle before its PWM channels restart. Pins whose level is known are
+        switched to write mode before their level is written and are then returned to their
+        shadowed mode.
+
+        Parameters:
+            self
 
         Returns:
-            None                             
+            None
         '''
-        for _ in range(num_iter):
-            self.LED_on(i, j, bright)
-            time.sleep(period / 2)
-            self.LED_off(i, j)
-            time.sleep(period / 2)
+        with self.__lock:
+            for driver in self.__drivers:
+                driver.restore()
+
+            with self.__board.batch():
+                pin_modes = self._pin_modes
+                pin_levels = self._pin_levels
+                channel_ticks = self._channel_ticks
+                self._pin_modes, self._pin_levels, self._channel_ticks = {}, {}, {}
+
+                for pin, value in pin_levels.items():
+                    self._pin_mode(pin, 'WRITE')
+                    self._pin_out(pin, value)
+                for pin, mode in pin_modes.items():
+                    self._pin_mode(pin, mode)
+                for (address, channel), ticks in channel_ticks.items():
+                    self._channel_out(address, channel, *ticks)
 
     def get_attributes(self):
         '''
@@ -334,11 +1106,793 @@ class Arduino:
             self
 
         Returns:
-            attributes (dict): keys are ['Board', 'Drivers', 'Addresses', 'LEDs'];
+            attributes (dict): keys are ['Board', 'Drivers', 'Addresses', 'Broadcast', 'OE Pin',
+                               'LEDs', 'Rows On', 'Columns', 'Pin Modes', 'Pin Levels',
+                               'Channel Ticks'];
                                values are self's associated attributes
         '''
         attributes = {'Board': self.__board,
                       'Drivers': self.__drivers,
                       'Addresses': self.__addresses,
-                      'LEDs': self._LEDs}
+                      'Broadcast': self.__broadcast,
+                      'OE Pin': self._oe_pin,
+                      'LEDs': self._LEDs,
+                      'Rows On': self._rows_on,
+                      'Columns': self._cols,
+                      'Pin Modes': self._pin_modes,
+                      'Pin Levels': self._pin_levels,
+                      'Channel Ticks': self._channel_ticks}
+        return attributes
+
+
+class Blink:
+
+    '''
+    The Blink object is a handle to an LED blinking in the background, as returned by
+    Arduino.LED_blink when block is False.
+
+    Attributes:
+        LED (tuple): (i, j) parameters for LED_on and LED_off
+        period (float): target time length of 1 cycle in seconds
+        bright (iterable | float): bright parameter for LED_on
+        num_iter (int | None): number of cycles to run; None if the blink runs until stopped
+        start (float): time.monotonic() value at which the first cycle starts
+        cycles (int): number of completed cycles
+        error (Exception | None): exception raised by the LED_on or LED_off calls which ended the
+                                  blink, if any
+        __stop (method): Arduino method which stops the blink
+        __done (Event): set once the blink has stopped or completed
+        __count (int), __mean (float), __M2 (float), __min (float), __max (float): running
+            statistics of the time between consecutive LED_on calls
+        __last_on (float | None): time.monotonic() value of the last LED_on call
+        __max_lateness (float): largest delay of an LED_on call past its deadline
+
+    Methods:
+        __init__ (dunder): constructor
+        done (property): whether the blink has stopped or completed
+        stop (public): stops the blink and turns its LED off
+        wait (public): waits for the blink to stop or complete
+        period_stats (public): returns statistics of the achieved period
+        _record (internal): adds an LED_on call to the period statistics
+        _finish (internal): marks the blink as stopped or complete
+    '''
+
+    def __init__(self, stop, LED, period, bright, num_iter):
+        '''
+        Constructor method for the Blink class. Blinks should be created through
+        Arduino.LED_blink rather than directly.
+
+        Parameters:
+            self
+            stop (method): Arduino method which stops the blink
+            LED (tuple): (i, j) parameters for LED_on and LED_off
+            period (float): target time length of 1 cycle in seconds
+            bright (iterable | float): bright parameter for LED_on
+            num_iter (int | None): number of cycles to run; None to run until stopped
+
+        Returns:
+            None
+        '''
+        self.LED = LED
+        self.period = period
+        self.bright = bright
+        self.num_iter = num_iter
+        self.start = time.monotonic()
+        self.cycles = 0
+        self.error = None
+        self.__stop = stop
+        self.__done = threading.Event()
+        if num_iter is not None and num_iter <= 0:
+            self.__done.set()
+
+        self.__count = 0
+        self.__mean = 0.0
+        self.__M2 = 0.0
+        self.__min = float('inf')
+        self.__max = 0.0
+        self.__last_on = None
+        self.__max_lateness = 0.0
+
+    @property
+    def done(self):
+        '''
+        Whether the blink has stopped or completed.
+
+        Returns:
+            done (bool)
+        '''
+        return self.__done.is_set()
+
+    def stop(self):
+        '''
+        Stops the blink and turns its LED off. Has no effect if the blink is already done.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__stop(self)
+
+    def wait(self, timeout=None):
+        '''
+        Waits for the blink to stop or complete.
+
+        Parameters:
+            self
+            timeout (float | None): maximum time to wait in seconds;
+                                    default value None corresponds to waiting indefinitely
+
+        Returns:
+            done (bool): True if the blink is done, False if the wait timed out
+        '''
+        return self.__done.wait(timeout)
+
+    def period_stats(self):
+        '''
+        Returns statistics of the achieved period, measured as the time between consecutive
+        LED_on calls, along with how late the LED_on calls were relative to their deadlines.
+
+        Parameters:
+            self
+
+        Returns:
+            stats (dict): keys are ['Cycles', 'Mean Period', 'Std Period', 'Min Period',
+                          'Max Period', 'Max Lateness'];
+                          periods are NaN until at least 2 LED_on calls have been made
+        '''
+        if self.__count:
+            std = (self.__M2 / self.__count) ** 0.5
+            low, high = self.__min, self.__max
+            mean = self.__mean
+        else:
+            mean = std = low = high = float('nan')
+        stats = {'Cycles': self.cycles,
+                 'Mean Period': mean,
+                 'Std Period': std,
+                 'Min Period': low,
+                 'Max Period': high,
+                 'Max Lateness': self.__max_lateness}
+        return stats
+
+    def _record(self, deadline, time_on):
+        '''
+        Adds an LED_on call to the period statistics using Welford's running mean and variance,
+        so memory use does not grow with the number of cycles.
+
+        Parameters:
+            self
+            deadline (float): time.monotonic() value the LED_on call was scheduled for
+            time_on (float): time.monotonic() value after the LED_on call returned
+
+        Returns:
+            None
+        '''
+        self.__max_lateness = max(self.__max_lateness, time_on - deadline)
+        if self.__last_on is not None:
+            period = time_on - self.__last_on
+            self.__count += 1
+            delta = period - self.__mean
+            self.__mean += delta / self.__count
+            self.__M2 += delta * (period - self.__mean)
+            self.__min = min(self.__min, period)
+            self.__max = max(self.__max, period)
+        self.__last_on = time_on
+
+    def _finish(self):
+        '''
+        Marks the blink as stopped or complete.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__done.set()
+
+class EventLog:
+
+    '''
+    The EventLog object records every LED state change commanded by an Arduino object, with
+    time.monotonic_ns() timestamps taken just before the commands were written to the board and
+    just after the write returned, so LED states can be lined up with other time-stamped data.
+    Events are stored in a structured NumPy array allocated once by the constructor and used as a
+    ring buffer: once it is full, each new event overwrites the oldest one, so recording an event
+    never allocates memory. If file_path is given, the ring buffer is a memory-mapped .npy file,
+    so the events are written to disk by the operating system without being copied, and the file
+    can be opened with load by another process while events are still being recorded.
+
+    Events are recorded by the Arduino object while it holds its lock. An EventLog should only be
+    given to one Arduino object, and events recorded while save or events is running may or may
+    not be included in the result.
+
+    Attributes:
+        DTYPE (dtype): fields of each event:
+                           sequence: number of events recorded before this one; -1 for an unused
+                                     slot of the ring buffer
+                           event: one of LED, GLOBAL_OFF, BLANK, or UNBLANK
+                           LED: LED number (as defined in Arduino.LED_on) for LED events; -1 for
+                                events which apply to the whole LED array
+                           on, off: [on, off] parameters written to the LED's anode channel, as
+                                    for Arduino._channel_out; [0, 0] if the LED was turned off
+                           before_ns: time.monotonic_ns() value before the commands were written
+                           after_ns: time.monotonic_ns() value after the write returned
+        LED, GLOBAL_OFF, BLANK, UNBLANK (int): values of the event field for a single LED turned
+                                               on or off, global_off, blank, and unblank calls
+        capacity (int): number of events the ring buffer holds
+        count (int): number of events recorded so far, including overwritten events
+        _buffer (1D array): ring buffer of DTYPE events; event number k is at index k % capacity
+        _bytes (memoryview): _buffer's memory as bytes, which record packs each event into
+
+    Methods:
+        __init__ (dunder): constructor
+        __len__ (dunder): returns the number of events currently held
+        record (public): records one event
+        record_many (public): records one event for each of several LEDs
+        events (public): returns the held events in the order they were recorded
+        save (public): writes the held events to a .npy file in the order they were recorded
+        flush (public): writes a memory-mapped ring buffer's changes to its file
+        load (public): reads the events from a file written by save or a memory-mapped ring buffer
+    '''
+
+    DTYPE = np.dtype([('sequence', '<i8'), ('event', 'u1'), ('LED', '<i4'), ('on', '<u2'),
+                      ('off', '<u2'), ('before_ns', '<i8'), ('after_ns', '<i8')])
+    # Packs one DTYPE event straight into the ring buffer's memory
+    _STRUCT = struct.Struct('<qBiHHqq')
+    # record_many records fewer events than this one at a time, which is faster than its array
+    # assignments for the few LEDs a single LED_on or LED_off changes
+    _FEW_EVENTS = 16
+    LED, GLOBAL_OFF, BLANK, UNBLANK = range(4)
+
+    def __init__(self, capacity=2**20, file_path=None):
+        '''
+        Constructor method for the EventLog class.
+
+        Parameters:
+            self
+            capacity (int): number of events the ring buffer holds; default value 2**20 uses
+                            32 MiB
+            file_path (str | None): if given, the ring buffer is created as a memory-mapped .npy
+                                    file at this path, replacing any existing file;
+                                    default value None keeps the ring buffer in memory
+
+        Returns:
+            None
+        '''
+        if capacity < 1:
+            raise ValueError(f'Event log capacity must be at least 1, not {capacity}')
+        if file_path is None:
+            self._buffer = np.empty(capacity, dtype=self.DTYPE)
+        else:
+            self._buffer = np.lib.format.open_memmap(file_path, mode='w+', dtype=self.DTYPE,
+                                                     shape=(capacity,))
+        self._buffer['sequence'] = -1
+        self._bytes = memoryview(self._buffer.view(np.uint8))
+        self.capacity = capacity
+        self.count = 0
+
+    def __len__(self):
+        '''
+        Returns the number of events currently held, which is at most capacity.
+
+        Parameters:
+            self
+
+        Returns:
+            length (int)
+        '''
+        return min(self.count, self.capacity)
+
+    def record(self, event, LED, on, off, before_ns, after_ns):
+        '''
+        Records one event, overwriting the oldest event if the ring buffer is full.
+
+        Parameters:
+            self
+            event (int): one of LED, GLOBAL_OFF, BLANK, or UNBLANK
+            LED (int): LED number; -1 for events which apply to the whole LED array
+            on (int), off (int): [on, off] parameters written to the LED's anode channel
+            before_ns (int): time.monotonic_ns() value before the commands were written
+            after_ns (int): time.monotonic_ns() value after the write returned
+
+        Returns:
+            None
+        '''
+        count = self.count
+        self._STRUCT.pack_into(self._bytes, count % self.capacity * self._STRUCT.size, count,
+                               event, LED, on, off, before_ns, after_ns)
+        self.count = count + 1
+
+    def record_many(self, event, LEDs, on, off, before_ns, after_ns):
+        '''
+        Records one event for each of several LEDs changed by the same write, such as by
+        Arduino.set_frame. If more LEDs are given than the ring buffer holds, only the last
+        capacity of them are kept.
+
+        Parameters:
+            self
+            event (int): one of LED, GLOBAL_OFF, BLANK, or UNBLANK
+            LEDs (1D array): LED numbers
+            on (1D array | int), off (1D array | int): [on, off] parameters written to each LED's
+                                                       anode channel
+            before_ns (int): time.monotonic_ns() value before the commands were written
+            after_ns (int): time.monotonic_ns() value after the write returned
+
+        Returns:
+            None
+        '''
+        if len(LEDs) < self._FEW_EVENTS:
+            on = np.asarray(on, dtype=np.int64).tolist() if np.ndim(on) else [int(on)] * len(LEDs)
+            off = (np.asarray(off, dtype=np.int64).tolist() if np.ndim(off) else
+                   [int(off)] * len(LEDs))
+            for LED, LED_on, LED_off in zip(np.asarray(LEDs, dtype=np.int64).tolist(), on, off):
+                self.record(event, LED, LED_on, LED_off, before_ns, after_ns)
+            return
+
+        sequence = np.arange(self.count, self.count + len(LEDs))
+        slots = sequence[-self.capacity:] % self.capacity
+        keep = slice(len(LEDs) - len(slots), None)
+        self._buffer['sequence'][slots] = sequence[keep]
+        self._buffer['event'][slots] = event
+        self._buffer['LED'][slots] = np.asarray(LEDs)[keep]
+        self._buffer['on'][slots] = np.broadcast_to(on, sequence.shape)[keep]
+        self._buffer['off'][slots] = np.broadcast_to(off, sequence.shape)[keep]
+        self._buffer['before_ns'][slots] = before_ns
+        self._buffer['after_ns'][slots] = after_ns
+        self.count += len(LEDs)
+
+    def __segments(self):
+        '''
+        Private helper method for events and save.
+        Returns views of the ring buffer which hold the recorded events in order, oldest first.
+
+        Parameters:
+            self
+
+        Returns:
+            segments (list): 1 or 2 views of _buffer
+        '''
+        count = self.count
+        if count <= self.capacity:
+            return [self._buffer[:count]]
+        start = count % self.capacity
+        return [self._buffer[start:], self._buffer[:start]]
+
+    def events(self):
+        '''
+        Returns the held events in the order they were recorded. Until the ring buffer has
+        wrapped around, this is a view of the ring buffer rather than a copy, so it changes as
+        the oldest events are overwritten; use save or copy the result to keep it.
+
+        Parameters:
+            self
+
+        Returns:
+            events (1D array): DTYPE events, oldest first
+        '''
+        segments = self.__segments()
+        if len(segments) == 1:
+            return segments[0]
+        return np.concatenate(segments)
+
+    def save(self, file):
+        '''
+        Writes the held events to a .npy file in the order they were recorded, which can be read
+        with np.load or load. The ring buffer is written directly from its memory, without
+        copying the events into a new array first.
+
+        Parameters:
+            self
+            file (str | file obj): path of the .npy file, or a binary file to write to
+
+        Returns:
+            None
+        '''
+        if isinstance(file, str):
+            with open(file, 'wb') as opened:
+                self.save(opened)
+            return
+
+        segments = self.__segments()
+        header = {'descr': np.lib.format.dtype_to_descr(self.DTYPE),
+                  'fortran_order': False,
+                  'shape': (sum(len(segment) for segment in segments),)}
+        np.lib.format.write_array_header_1_0(file, header)
+        for segment in segments:
+            file.write(segment.view(np.uint8).data)
+
+    def flush(self):
+        '''
+        Writes a memory-mapped ring buffer's changes to its file. Has no effect if the ring
+        buffer is in memory.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        if isinstance(self._buffer, np.memmap):
+            self._buffer.flush()
+
+    @staticmethod
+    def load(file_path):
+        '''
+        Reads the events from a .npy file written by save, or from the file of a memory-mapped
+        ring buffer, in the order they were recorded.
+
+        Parameters:
+            file_path (str): path of the .npy file
+
+        Returns:
+            events (1D array): DTYPE events, oldest first
+        '''
+        events = np.load(file_path, mmap_mode='r')
+        events = events[events['sequence'] >= 0]
+        return events[np.argsort(events['sequence'], kind='stable')]
+
+class MultiArduino:
+
+    '''
+    The MultiArduino object presents the LEDs of several Arduino boards as a single LED array, for
+    arrays which need more cathode pins than one board has. Every row of the array belongs to one
+    board, and every board drives all of the array's columns through its own drivers, so each
+    board controls the part of the array made of its own rows. Commands are routed to the board
+    which owns the LED, and commands for several boards are sent in parallel on a thread pool,
+    each board with a single write, so set_frame and global_off take as long as the slowest
+    board rather than the sum of all boards. scan is not available across boards; each board's
+    Arduino object can be reached through get_attributes.
+
+    Attributes:
+        __boards (list): Arduino objects, one per board, in board order
+        __pool (ThreadPoolExecutor): runs commands for several boards in parallel, with one
+                                     worker per board
+        __board_rows (list): for each board, the array's row numbers which belong to it, in the
+                             board's own row order
+        _row_boards (1D array): index in __boards of the board which owns each row of the array
+        _row_local (1D array): 0-indexed row number of each row of the array within its board
+        _shape (tuple): (rows, columns) of the whole LED array
+
+    Methods:
+        __init__ (dunder): constructor
+        __split_config (private): helper method for the constructor
+        __parallel (private): calls a method of several boards at once and waits for all of them
+        __route (private): finds the board and the board's row and column for an LED
+        LED_on (public): turns a given LED on
+        LED_off (public): turns a given LED off
+        LED_blink (public): blinks a given LED on its board
+        global_off (public): turns every LED of every board off
+        set_pwm_freq (public): sets the PWM frequency of every driver of every board
+        blank (public): disables the outputs of every board through their OE lines
+        unblank (public): re-enables the outputs of every board through their OE lines
+        set_frame (public): drives the whole LED array to a 2D brightness array
+        resync (public): re-sends every board's driver mode registers and shadowed pin and
+                         channel states
+        shutdown (public): shuts down every board's Telemetrix connection
+        get_attributes (public): returns all attributes as a dictionary,
+                                 including private attributes
+    '''
+
+    def __init__(self, config, boards):
+        '''
+        Constructor method for the MultiArduino class.
+        Creates an Arduino object for every board, in parallel.
+
+        Parameters:
+            self
+            config (str | list): either the file path of one configuration file with a fourth
+                                 column giving the 0-indexed board number of every row and column
+                                 (the row numbers count across all boards, while every board's
+                                 columns are numbered from 1), or a list with the file path of
+                                 each board's own configuration file, in which case the boards'
+                                 rows are stacked in board order
+            boards (list): dict of keyword arguments for each board's Arduino constructor, in
+                           board order, such as com_port (or ip_address and ip_port),
+                           broadcast_address, oe_pin, and event_log (each board needs its own
+                           EventLog obj, which records the board's own LED numbers)
+
+        Returns:
+            None
+        '''
+        if isinstance(config, str):
+            configs, row_boards = self.__split_config(np.loadtxt(config, ndmin=2), len(boards))
+        else:
+            if len(config) != len(boards):
+                raise ValueError(f'{len(config)} configuration files were given for '
+                                 f'{len(boards)} boards')
+            configs = [config_compiler.compile_config(file_path) for file_path in config]
+            row_boards = np.concatenate([np.full(board_config.shape[0], board)
+                                         for board, board_config in enumerate(configs)])
+
+        num_cols = {board_config.shape[1] for board_config in configs}
+        if len(num_cols) != 1:
+            raise ValueError(f'Every board must drive the same number of columns, not '
+                             f'{sorted(num_cols)}')
+
+        self.__pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(boards))
+        futures = [self.__pool.submit(Arduino, board_config, **board_kwargs)
+                   for board_config, board_kwargs in zip(configs, boards)]
+        concurrent.futures.wait(futures)
+        errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            # Boards which did connect are released before the error is raised
+            for future in futures:
+                if not future.exception():
+                    future.result().get_attributes()['Board'].shutdown()
+            self.__pool.shutdown()
+            raise errors[0]
+        self.__boards = [future.result() for future in futures]
+
+        self._row_boards = row_boards
+        self._row_local = np.zeros(len(row_boards), dtype=int)
+        self.__board_rows = []
+        for board in range(len(boards)):
+            rows = np.where(row_boards == board)[0]
+            self._row_local[rows] = np.arange(len(rows))
+            self.__board_rows.append(rows)
+        self._shape = (len(row_boards), num_cols.pop())
+
+    def __split_config(self, config, num_boards):
+        '''
+        Private helper method for the MultiArduino object's constructor.
+        Splits a configuration file with a board column into one configuration per board,
+        renumbering each board's rows from 1 in the order of their row numbers. Every board's
+        configuration is checked by config_compiler.validate_config, and a ValueError listing
+        the mistakes of every board is raised before any board's configuration is compiled.
+
+        Parameters:
+            self
+            config (2D array): result of np.loadtxt call on the configuration file; axis 1 is
+                               [row_or_col_number, pin_or_channel_number, driver_address, board]
+            num_boards (int): number of boards
+
+        Returns:
+            configs (list): compiled configuration (CompiledConfig obj) for each board
+            row_boards (1D array): board number of each row of the whole array
+        '''
+        if config.ndim != 2 or config.shape[1] != 4:
+            raise ValueError('A configuration file shared by several boards must have a board '
+                             'column')
+        if np.any(config != np.round(config)):
+            raise ValueError('Configuration values must all be integers')
+        config = config.astype(int)
+        if np.any(config[:, 3] < 0) or np.any(config[:, 3] >= num_boards):
+            raise ValueError(f'Board numbers must be between 0 and {num_boards - 1}')
+
+        rows = config[config[:, 2] == 0]
+        rows = rows[np.argsort(rows[:, 0])]
+        if not np.array_equal(rows[:, 0], np.arange(1, len(rows) + 1)):
+            raise ValueError('Row numbers must count from 1 without gaps or repeats')
+
+        board_configs = []
+        errors = []
+        for board in range(num_boards):
+            board_rows = rows[rows[:, 3] == board][:, :3]
+            board_rows[:, 0] = np.arange(1, len(board_rows) + 1)
+            board_cols = config[(config[:, 2] != 0) & (config[:, 3] == board)][:, :3]
+            board_config = np.concatenate((board_rows, board_cols))
+            errors += [f'Board {board}: {error}'
+                       for error in config_compiler.validate_config(board_config)]
+            board_configs.append(board_config)
+        if errors:
+            raise ValueError('Invalid LED array configuration:\n    ' + '\n    '.join(errors))
+
+        configs = [config_compiler.compile_array(board_config) for board_config in board_configs]
+        return configs, rows[:, 3]
+
+    def __parallel(self, calls):
+        '''
+        Private helper method which makes several calls at once on the thread pool and waits for
+        all of them to return. A single call is made directly.
+
+        Parameters:
+            self
+            calls (list): [function, args] for each call
+
+        Returns:
+            results (list): the return value of each call, in order; if any call raised an
+                            exception, the first one is raised once every call has returned
+        '''
+        if len(calls) == 1:
+            function, args = calls[0]
+            return [function(*args)]
+        futures = [self.__pool.submit(function, *args) for function, args in calls]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    def __route(self, i, j):
+        '''
+        Private helper method which finds the board owning an LED and the LED's coordinates in
+        that board's array.
+
+        Parameters:
+            self
+            i (int): either the 0-indexed row coordinate of the LED, or its LED number
+            j (int | None): 0-indexed column coordinate of the LED, or None if i is the LED number
+
+        Returns:
+            board (Arduino obj): board which owns the LED
+            row (int): 0-indexed row coordinate of the LED in the board's array
+            col (int): 0-indexed column coordinate of the LED
+        '''
+        _, i, j = LED_number(self._shape[1], i, j)
+        return self.__boards[self._row_boards[i]], int(self._row_local[i]), j
+
+    def LED_on(self, i, j=None, bright=1):
+        '''
+        Turns a given LED on by calling LED_on of the board which owns it.
+
+        Parameters:
+            self
+            i (int): either the 0-indexed row coordinate of the desired LED in the whole array,
+                     or the desired LED's LED number, counted as in Arduino.LED_on
+            j (int): 0-indexed column coordinate of the desired LED;
+                     default value None should be maintained if i parameter is the LED number
+            bright (iterable | float): bright parameter for Arduino.LED_on
+
+        Returns:
+            None
+        '''
+        board, row, col = self.__route(i, j)
+        board.LED_on(row, col, bright)
+
+    def LED_off(self, i, j=None):
+        '''
+        Turns a given LED off by calling LED_off of the board which owns it.
+
+        Parameters:
+            self
+            i (int): i parameter for LED_on
+            j (int): j parameter for LED_on
+
+        Returns:
+            None
+        '''
+        board, row, col = self.__route(i, j)
+        board.LED_off(row, col)
+
+    def LED_blink(self, i, j=None, num_iter=0, period=1, bright=1, block=True):
+        '''
+        Blinks a given LED by calling LED_blink of the board which owns it. LEDs of different
+        boards can be blinked at once by setting block to False.
+
+        Parameters:
+            self
+            i (int): i parameter for LED_on
+            j (int): j parameter for LED_on
+            num_iter, period, bright, block: parameters for Arduino.LED_blink
+
+        Returns:
+            blink (Blink obj | None): the running blink if block is False, otherwise None
+        '''
+        board, row, col = self.__route(i, j)
+        return board.LED_blink(row, col, num_iter, period, bright, block)
+
+    def global_off(self, timeout=1):
+        '''
+        Turns every LED off by calling global_off of every board in parallel, including each
+        board's readback confirming its LEDs are off.
+
+        Parameters:
+            self
+            timeout (float): timeout parameter for Arduino.global_off; default value 1
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.global_off, (timeout,)] for board in self.__boards])
+
+    def set_pwm_freq(self, freq):
+        '''
+        Sets the PWM frequency of every driver of every board, with the boards updated in
+        parallel.
+
+        Parameters:
+            self
+            freq (float): freq parameter for Arduino.set_pwm_freq
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.set_pwm_freq, (freq,)] for board in self.__boards])
+
+    def blank(self):
+        '''
+        Disables the outputs of every board through their OE lines, with the boards updated in
+        parallel. Requires every board to have been given oe_pin.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.blank, ()] for board in self.__boards])
+
+    def unblank(self):
+        '''
+        Re-enables the outputs of every board through their OE lines, with the boards updated in
+        parallel. Requires every board to have been given oe_pin.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.unblank, ()] for board in self.__boards])
+
+    def set_frame(self, brightness):
+        '''
+        Drives the whole LED array to the state described by a 2D brightness array, by calling
+        set_frame of every board in parallel with the board's own rows of the frame. Since each
+        board has its own columns, only the lit rows of the same board need to share a brightness
+        pattern. Every board's part of the frame is checked before any board is updated, so a
+        frame which cannot be displayed raises a ValueError without changing any LED.
+
+        Parameters:
+            self
+            brightness (2D array): same shape as the whole LED array; brightness parameter for
+                                   Arduino.set_frame
+
+        Returns:
+            None
+        '''
+        brightness = np.asarray(brightness, dtype=float)
+        if brightness.shape != self._shape:
+            raise ValueError(f'Frame shape {brightness.shape} does not match LED array shape '
+                             f'{self._shape}')
+
+        frames = [brightness[rows] for rows in self.__board_rows]
+        for board, frame in zip(self.__boards, frames):
+            board._frame_ticks(frame)
+        self.__parallel([[board.set_frame, (frame,)]
+                         for board, frame in zip(self.__boards, frames)])
+
+    def resync(self):
+        '''
+        Re-sends every board's driver mode registers and shadowed pin and channel states, as in
+        Arduino.resync, with the boards updated in parallel.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.resync, ()] for board in self.__boards])
+
+    def shutdown(self):
+        '''
+        Shuts down every board's Telemetrix connection in parallel, then stops the thread pool.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__parallel([[board.get_attributes()['Board'].shutdown, ()]
+                         for board in self.__boards])
+        self.__pool.shutdown()
+
+    def get_attributes(self):
+        '''
+        Returns all of self's attributes as a dictionary, including private attributes
+
+        Parameters:
+            self
+
+        Returns:
+            attributes (dict): keys are ['Boards', 'Board Rows', 'Row Boards', 'Row Local',
+                               'Shape'];
+                               values are self's associated attributes
+        '''
+        attributes = {'Boards': self.__boards,
+                      'Board Rows': self.__board_rows,
+                      'Row Boards': self._row_boards,
+                      'Row Local': self._row_local,
+                      'Shape': self._shape}
         return attributes
@@ -0,0 +1,507 @@
+'''
+This module is the asyncio counterpart of telemetrix_controller.py. The ArduinoAio class controls
+the same LED array through telemetrix.telemetrix_aio.TelemetrixAio and
+telemetrix_pca9685.telemetrix_pca9685_aio.TelemetrixPCA9685Aio, so the whole stack runs as
+coroutines in one event loop without any threads. This allows LED sequencing to share an event
+loop with other asyncio code, such as detector readout acquisition.
+
+The connection is made by awaiting the start method, or by using the ArduinoAio object as an
+async context manager, which also shuts the board down on exit:
+
+    async with ArduinoAio('warm_test.txt', com_port='/dev/ttyACM0') as arduino:
+        await arduino.LED_on(0)
+
+This module was created to be used with the LED Array Controller v3.0 PCB.
+'''
+
+import asyncio
+import numpy as np
+import config_compiler
+from telemetrix_controller import routing_tables, LED_number, bright_ticks, frame_ticks, \
+    frame_changes
+from telemetrix.telemetrix_aio import TelemetrixAio
+from telemetrix_pca9685 import pca9685_constants
+from telemetrix_pca9685.telemetrix_pca9685_aio import TelemetrixPCA9685Aio as Driver
+
+class ArduinoAio:
+
+    '''
+    The ArduinoAio object is the asyncio version of the telemetrix_controller.Arduino object. It
+    encapsulates the Arduino board, the Adafruit PCA9685 drivers hooked up to the board, and the
+    LED array which they are connected to. Every method which sends commands is a coroutine.
+
+    Attributes:
+        __board (TelemetrixAio obj):  represents the Arduino board itself
+        __drivers (1D array): contains all TelemetrixPCA9685Aio objects (Adafruit driver
+                              representations); empty until start is awaited
+        __addresses (1D array): contains all addresses of the Adafruit drivers;
+                                order in __addresses is the same as __drivers
+        _LEDs (3D array): same as the telemetrix_controller.Arduino attribute
+        _led_pins (int array): cathode_pin of every LED, indexed by LED number
+        _led_channels (int array): anode_channel of every LED, indexed by LED number
+        _led_addresses (int array): address of every LED, indexed by LED number
+        _drivers_by_address (dict): maps each driver address to its TelemetrixPCA9685Aio object
+        _rows_on (1D array): last commanded state of each row's cathode pin; True if the pin is
+                             driven low as an output, False if it is released to read mode
+        _cols (2D array): last commanded [on, off] parameters of each column's anode channel
+        _pin_modes (dict): shadow of each Arduino board pin's mode ('READ', 'WRITE', or 'PWM');
+                           a pin is missing if its mode is unknown
+        _pin_levels (dict): shadow of the last digital output written to each Arduino board pin;
+                            a pin is missing if its level is unknown
+        _channel_ticks (dict): shadow of each driver channel's [on, off] parameters, keyed by
+                               (address, channel); a channel is missing if its state is unknown
+        __lock (asyncio.Lock): held while commands are sent, so that blinks running in other
+                               tasks do not interleave with other calls
+
+    Methods:
+        __init__ (dunder): constructor
+        __routing_tables (private): helper method for the constructor
+        start (public): connects to the board, initializes the drivers, and turns every LED off
+        shutdown (public): turns every LED off and closes the connection to the board
+        __aenter__ (dunder): awaits start when entering an async with block
+        __aexit__ (dunder): awaits shutdown when leaving an async with block
+        _pin_mode (internal): directly changes an Arduino board pin to digital input,
+                              digital output, or analog output mode, unless the pin is already
+                              in that mode
+        _pin_out (internal): writes a digital output to an Arduino board pin, unless the pin
+                             already has that output
+        _channel_out (internal): writes a PWM output to a PCA9685 driver channel, unless the
+                                 channel already has that output
+        LED_on (public): turns a given LED on
+        LED_off (public): turns a given LED off
+        LED_blink (public): blinks a given LED on and off by awaiting LED_on and LED_off
+        global_off (public): turns every driver channel off and releases every pin, then
+                             confirms the drivers are dark
+        _confirm_dark (internal): reads back every driver channel and raises an error unless
+                                  all of them are off
+        set_pwm_freq (public): sets the PWM frequency of every driver
+        set_frame (public): drives the whole LED array to a 2D brightness array, sending only the
+                            pins and channels which changed since the last commanded state
+        get_attributes (public): returns all attributes as a dictionary,
+                                 including private attributes
+    '''
+
+    def __init__(self, file_path, config_cache=config_compiler.DEFAULT_CACHE_DIR, **board_kwargs):
+        '''
+        Constructor method for the ArduinoAio class.
+        Calls config_compiler.compile_config to validate the configuration and compile it into
+        the LED array and its lookup tables.
+        Calls __routing_tables helper method to take the lookup tables from the compiled
+        configuration.
+        No connection is made until start is awaited.
+
+        Parameters:
+            self
+            file_path (str | 2D array | CompiledConfig obj): file_path parameter of
+                                                             telemetrix_controller.Arduino
+            config_cache (str | None): config_cache parameter of telemetrix_controller.Arduino
+            board_kwargs: keyword arguments passed on to the TelemetrixAio constructor, such as
+                          com_port, or ip_address and ip_port for a board reached over TCP/IP
+                          (for example a telemetrix_simulator.SimulatedArduino)
+
+        Returns:
+            None
+        '''
+        # Compiling the config file
+        compiled = config_compiler.compile_config(file_path, cache_dir=config_cache)
+
+        # Setting up private attributes
+        self.__board = TelemetrixAio(autostart=False, **board_kwargs)
+        self.__addresses = compiled.addresses
+        self.__drivers = np.array([])
+        # Created by start, so that it belongs to the running event loop
+        self.__lock = None
+
+        # Shadow copies of the hardware state; empty until the first write
+        self._pin_modes = {}
+        self._pin_levels = {}
+        self._channel_ticks = {}
+
+        # Initializing the LED array
+        self._LEDs = compiled.LEDs
+        self.__routing_tables(compiled)
+        num_rows, num_cols = self._LEDs.shape[0:2]
+        self._rows_on = np.zeros(num_rows, dtype=bool)
+        self._cols = np.zeros((num_cols, 2), dtype=int)
+
+    def __routing_tables(self, compiled):
+        '''
+        Private helper method for the ArduinoAio object's constructor.
+        Calls telemetrix_controller.routing_tables to take the compiled configuration's lookup
+        tables.
+
+        Parameters:
+            self
+            compiled (CompiledConfig obj): result of config_compiler.compile_config
+
+        Returns:
+            None
+        '''
+        self._led_pins, self._led_channels, self._led_addresses = routing_tables(compiled)
+        self._drivers_by_address = {}
+
+    async def start(self):
+        '''
+        Connects to the board, initializes every driver, and calls global_off to turn every LED
+        off. The drivers are initialized concurrently, since their register reads are matched to
+        replies by driver address.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__lock = asyncio.Lock()
+        await self.__board.start_aio()
+        await self.__board.set_pin_mode_i2c()
+        loop = asyncio.get_running_loop()
+        self.__drivers = np.array([Driver(board=self.__board, i2c_address=int(address),
+                                          loop=loop, autostart=False)
+                                   for address in self.__addresses])
+        await asyncio.gather(*(driver.begin() for driver in self.__drivers))
+        self._drivers_by_address = {int(address): driver for address, driver
+                                    in zip(self.__addresses, self.__drivers)}
+        await self.global_off()
+
+    async def shutdown(self):
+        '''
+        Turns every LED off with global_off, then closes the connection to the board.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        try:
+            await self.global_off()
+        finally:
+            await self.__board.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.shutdown()
+
+    async def _pin_mode(self, pin, mode):
+        '''
+        Directly changes an Arduino board pin to digital input, digital output, or analog output
+        mode. No command is sent if _pin_modes shows the pin is already in the given mode.
+
+        Parameters:
+            self
+            pin (int): pin number on the Arduino board whose mode should be changed
+            mode (str): must either be 'READ', 'WRITE', or 'PWM':
+                            'READ' calls set_pin_mode_digital_input
+                            'WRITE' calls set_pin_mode_digital_output
+                            'PWM' calls set_pin_mode_analog_output
+
+        Returns:
+            None
+        '''
+        if self._pin_modes.get(pin) == mode:
+            return
+
+        if mode == 'READ':
+            await self.__board.set_pin_mode_digital_input(pin)
+        elif mode == 'WRITE':
+            await self.__board.set_pin_mode_digital_output(pin)
+        elif mode == 'PWM':
+            await self.__board.set_pin_mode_analog_output(pin)
+        else:
+            raise NameError('Invalid mode; mode must be \'READ\', \'WRITE\', or \'PWM\'')
+        self._pin_modes[pin] = mode
+
+    async def _pin_out(self, pin, value):
+        '''
+        Writes a digital output to an Arduino board pin.
+        Assumes the specified pin is in digital output mode before the method is called.
+        No command is sent if _pin_levels shows the pin already has the given output.
+
+        Parameters:
+            self
+            pin (int): pin number on the Arduino board
+            value (int): 1 for high voltage or 0 for low voltage
+
+        Returns:
+            None
+        '''
+        if self._pin_levels.get(pin) == value:
+            return
+
+        await self.__board.digital_write(pin, value)
+        self._pin_levels[pin] = value
+
+    async def _channel_out(self, address, channel, on, off):
+        '''
+        Writes a PWM output to a PCA9685 driver channel.
+        No command is sent if _channel_ticks shows the channel already has the given output.
+
+        Parameters:
+            self
+            address (int): address of the driver whose channel should be written to
+            channel (int): channel number being written to
+            on (int): location in 4096-part cycle where the channel should be set to high;
+                     must be between 0 and 4095, inclusive
+            off (int): location in 4096-part cycle where the channel should be set to low;
+                       must be between 0 and 4095, inclusive
+
+        Returns:
+            None
+        '''
+        if self._channel_ticks.get((address, channel)) == (on, off):
+            return
+
+        await self._drivers_by_address[address].set_pwm(channel, on, off)
+        self._channel_ticks[(address, channel)] = (on, off)
+
+    async def LED_on(self, i, j=None, bright=1):
+        '''
+        Turns a given LED on, as in telemetrix_controller.Arduino.LED_on. Commands which would not
+        change a pin or channel's shadowed state are skipped, and the rest are sent in a single
+        write.
+
+        Parameters:
+            self
+            i (int): either the 0-indexed row coordinate of the desired LED,
+                     or the desired LED's LED number
+            j (int): 0-indexed column coordinate of the desired LED;
+                     default value None should be maintained if i parameter is the LED number
+            bright (iterable | float): if iterable, then [on, off] parameters for _channel_out();
+                                       if float, then creates [on, off] parameters as
+                                       [0,int(4095 * cycle)], so float must be between 0 and 1
+                                       inclusive and describes LED brightness; default value 1
+                                       corresponds to LED always on for max brightness
+
+        Returns:
+            None
+        '''
+        n, r, c = LED_number(self._LEDs.shape[1], i, j)
+        bright = bright_ticks(bright)
+
+        async with self.__lock:
+            with self.__board.batch():
+                pin = self._led_pins[n]
+                await self._pin_mode(pin, 'WRITE')
+                await self._pin_out(pin, 0)
+                await self._channel_out(self._led_addresses[n], self._led_channels[n], *bright)
+                self._rows_on[r] = True
+                self._cols[c] = bright
+
+    async def LED_off(self, i, j=None):
+        '''
+        Turns a given LED off, as in telemetrix_controller.Arduino.LED_off. Commands which would
+        not change a pin or channel's shadowed state are skipped, and the rest are sent in a
+        single write.
+
+        Parameters:
+            self
+            i (int): either the 0-indexed row coordinate of the desired LED,
+                     or the desired LED's LED number
+            j (int): 0-indexed column coordinate of the desired LED;
+                     default value None should be maintained if i parameter is the LED number
+
+        Returns:
+            None
+        '''
+        n, r, c = LED_number(self._LEDs.shape[1], i, j)
+
+        async with self.__lock:
+            with self.__board.batch():
+                pin = self._led_pins[n]
+                await self._channel_out(self._led_addresses[n], self._led_channels[n], 0, 0)
+                if self._pin_levels.get(pin) != 0:
+                    # The pin must be an output for its low voltage to be latched
+                    await self._pin_mode(pin, 'WRITE')
+                    await self._pin_out(pin, 0)
+                await self._pin_mode(pin, 'READ')
+                self._rows_on[r] = False
+                self._cols[c] = 0
+
+    async def LED_blink(self, i, j=None, num_iter=0, period=1, bright=1):
+        '''
+        'Blinks' a given LED by turning it on and off with a specified period for a
+        specified number of iterations. Every on and off is scheduled against event loop time
+        deadlines measured from the start of the blink, so command latency does not make the
+        period drift. Several LEDs can be blinked at once by running LED_blink in separate tasks,
+        for example with asyncio.gather or asyncio.create_task; cancelling a blink's task turns
+        its LED off.
+
+        Parameters:
+            self
+            i (int): i parameter for LED_on and LED_off
+            j (int): j parameter for LED_on and LED_off
+            num_iter (int | None): number of times to cycle the given LED;
+                                   1 cycle is defined as 1 iteration of turning the LED on then
+                                   off; default value 0 corresponds to no iterations;
+                                   None corresponds to blinking until the task is cancelled
+            period (float): total time length of 1 cycle in seconds
+            bright (iterable | float): bright parameter for LED_on
+
+        Returns:
+            None
+        '''
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        cycle = 0
+        try:
+            while num_iter is None or cycle < num_iter:
+                deadline = start + cycle * period
+                await asyncio.sleep(max(0, deadline - loop.time()))
+                await self.LED_on(i, j, bright)
+                await asyncio.sleep(max(0, deadline + period / 2 - loop.time()))
+                await self.LED_off(i, j)
+                cycle += 1
+        except asyncio.CancelledError:
+            await self.LED_off(i, j)
+            raise
+
+    async def global_off(self, timeout=1):
+        '''
+        Turns every LED off, thus never turning on any channels in their cycle and setting all
+        pins to read mode with a write-ready low voltage. Each driver's channels are all turned
+        off with a single write to its ALL_LED registers, and each distinct cathode pin is
+        released once, with the commands coalesced in a single write. Does not return until
+        _confirm_dark has read the channels back as off.
+
+        Parameters:
+            self
+            timeout (float): time in seconds to wait for the drivers' channels to be read back;
+                             default value 1
+
+        Returns:
+            None
+        '''
+        async with self.__lock:
+            with self.__board.batch():
+                for address, driver in self._drivers_by_address.items():
+                    await driver.set_all_pwm(0, 0)
+                    for channel in range(16):
+                        self._channel_ticks[(address, channel)] = (0, 0)
+
+                for pin in sorted(set(self._led_pins)):
+                    if self._pin_levels.get(pin) != 0:
+                        # The pin must be an output for its low voltage to be latched
+                        await self._pin_mode(pin, 'WRITE')
+                        await self._pin_out(pin, 0)
+                    await self._pin_mode(pin, 'READ')
+
+            self._rows_on[:] = False
+            self._cols[:] = 0
+            await self._confirm_dark(timeout)
+
+    async def _confirm_dark(self, timeout):
+        '''
+        Reads back the LEDn registers of every driver and raises a RuntimeError unless every
+        channel's [on, off] parameters are [0, 0], as in
+        telemetrix_controller.Arduino._confirm_dark. One driver's 4 reads are sent in a single
+        write, and their replies are awaited before the next driver's reads are sent, so the
+        reads in flight never overrun the board's 64-byte serial receive buffer.
+
+        Parameters:
+            self
+            timeout (float): time in seconds to wait for each driver's reads to complete
+
+        Returns:
+            None
+        '''
+        registers = [pca9685_constants.PCA9685_LED0_ON_L + 16 * block for block in range(4)]
+        for address in self._drivers_by_address:
+            with self.__board.batch():
+                replies = [await self.__board.i2c_read_future(address, register, 16,
+                                                              timeout=timeout)
+                           for register in registers]
+
+            for register, reply in zip(registers, replies):
+                try:
+                    # data is [i2c_read_report, port, number of bytes read, i2c address,
+                    #          device_register, data values..., time_stamp]
+                    values = (await reply)[5:-1]
+                except TimeoutError:
+                    raise RuntimeError('Could not confirm all LEDs are off; driver readback '
+                                       'timed out') from None
+                if any(values):
+                    raise RuntimeError(f'Could not confirm all LEDs are off; driver {address} '
+                                       f'register {register} read back {values}')
+
+    async def set_pwm_freq(self, freq):
+        '''
+        Sets the PWM frequency of every driver. The drivers are updated concurrently.
+
+        Parameters:
+            self
+            freq (float): PWM frequency in Hz, clamped by the drivers to between 1 and 3500
+
+        Returns:
+            None
+        '''
+        async with self.__lock:
+            await asyncio.gather(*(driver.set_pwm_freq(freq) for driver in self.__drivers))
+
+    async def set_frame(self, brightness):
+        '''
+        Drives the whole LED array to the state described by a 2D brightness array in one call,
+        as in telemetrix_controller.Arduino.set_frame. Only the pins and channels which changed
+        since the last commanded state are written to, in a single write. A ValueError is raised
+        if the frame cannot be displayed because its lit rows do not all show the same brightness
+        pattern. The frame is checked and compared with telemetrix_controller.frame_ticks and
+        frame_changes, which Arduino.set_frame also uses.
+
+        Parameters:
+            self
+            brightness (2D array): same shape as the LED array, where each element is the
+                                   brightness of the corresponding LED as a float between 0 and 1
+                                   inclusive
+
+        Returns:
+            None
+        '''
+        rows_on, lit = frame_ticks(self._LEDs.shape[0:2], brightness)
+
+        async with self.__lock:
+            cols, departing, changed, arriving = frame_changes(self._rows_on, self._cols,
+                                                               rows_on, lit)
+            num_cols = self._LEDs.shape[1]
+            pins = self._led_pins[::num_cols]
+            channels = self._led_channels[:num_cols]
+            addresses = self._led_addresses[:num_cols]
+
+            with self.__board.batch():
+                # Rows are released before channels change and enabled after, so no LED outside
+                # the new frame is lit while the update is in flight
+                for r in departing:
+                    await self._pin_mode(pins[r], 'READ')
+                    self._rows_on[r] = False
+                for c in changed:
+                    await self._channel_out(addresses[c], channels[c], *cols[c])
+                    self._cols[c] = cols[c]
+                for r in arriving:
+                    await self._pin_mode(pins[r], 'WRITE')
+                    await self._pin_out(pins[r], 0)
+                    self._rows_on[r] = True
+
+    def get_attributes(self):
+        '''
+        Returns all of self's attributes as a dictionary, including private attributes
+
+        Parameters:
+            self
+
+        Returns:
+            attributes (dict): keys are ['Board', 'Drivers', 'Addresses', 'LEDs', 'Rows On',
+                               'Columns', 'Pin Modes', 'Pin Levels', 'Channel Ticks'];
+                               values are self's associated attributes
+        '''
+        attributes = {'Board': self.__board,
+                      'Drivers': self.__drivers,
+                      'Addresses': self.__addresses,
+                      'LEDs': self._LEDs,
+                      'Rows On': self._rows_on,
+                      'Columns': self._cols,
+                      'Pin Modes': self._pin_modes,
+                      'Pin Levels': self._pin_levels,
+                      'Channel Ticks': self._channel_ticks}
+        return attributes
@@ -59,9 +59,20 @@ MODE2_OCH = 0x08  # Outputs change on ACK vs STOP
 MODE2_INVRT = 0x10  # Output logic state inverted 
 
 PCA9685_I2C_ADDRESS = 0x40  # Default PCA9685 I2C Slave Address
+PCA9685_ALLCALL_I2C_ADDRESS = 0x70  # Power-on LED All Call I2C address (ALLCALLADR >> 1)
 FREQUENCY_OSCILLATOR = 27000000  # Int. osc. frequency in datasheet
 
 PCA9685_PRESCALE_MIN = 3  # minimum prescale value
 PCA9685_PRESCALE_MAX = 255  # maximum prescale value
 
 DEFAULT_PWM_FREQUENCY = 50
+
+# time for the internal oscillator to stabilize after the SLEEP bit is cleared,
+# before the RESTART bit may be set (datasheet section 7.3.1.1)
+OSCILLATOR_SETTLE_TIME = 0.0005
+
+# Telemetrix4Arduino buffers at most MAX_COMMAND_LENGTH bytes after a command ID.
+# An i2c write uses 3 of them for the byte count, address and port, and 1 for the
+# starting register, leaving room for 6 channels of 4 bytes each.
+MAX_COMMAND_LENGTH = 30
+MAX_CHANNELS_PER_WRITE = (MAX_COMMAND_LENGTH - 4) // 4
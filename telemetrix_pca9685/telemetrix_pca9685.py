@@ -16,6 +16,7 @@
  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 """
 
+import threading
 import time
 from telemetrix_pca9685 import pca9685_constants
 
@@ -31,7 +32,7 @@ class TelemetrixPCA9685:
     def __init__(self, i2c_address=pca9685_constants.PCA9685_I2C_ADDRESS,
                  i2c_port=0, board=None,
                  osc_freq=pca9685_constants.FREQUENCY_OSCILLATOR,
-                 prescale=0, position_min=150, position_max=600):
+                 prescale=0, position_min=150, position_max=600, timeout=0.5):
         """
 
         :param i2c_address: i2c device address
@@ -48,6 +49,9 @@ class TelemetrixPCA9685:
 
         :param position_max: maximum servo position
 
+        :param timeout: maximum time in seconds to wait for a register
+                        read to complete
+
         """
         self.i2c_address = i2c_address
         self.i2c_port = i2c_port
@@ -59,12 +63,20 @@ class TelemetrixPCA9685:
         self.prescale = prescale
         self.position_min = position_min
         self.position_max = position_max
+        self.timeout = timeout
 
         self.totempole = True
         self.pwm_data = None
 
         self.oscillator_freq = osc_freq
 
+        # set when a register read callback has finished
+        self.operation_complete = threading.Event()
+
+        # copy of the device registers, filled from the device by reset()
+        # and updated by every write, so that mode changes need no reads
+        self.shadow_registers = bytearray(256)
+
         self.position_per_degree = (self.position_max - self.position_min) // 180
 
         self.reset()
@@ -81,113 +93,259 @@ class TelemetrixPCA9685:
 
     def reset(self):
         """
-        Sends a reset command to the PCA9685 chip over I2C
+        Sends a reset command to the PCA9685 chip over I2C, enabling
+        register auto-increment, and then reads the registers into
+        the shadow copy. The RESTART bit of MODE1 is left out of the
+        shadow copy, since the device clears it by itself and writing
+        it back would restart the PWM channels.
+        """
+        self._write_registers(pca9685_constants.PCA9685_MODE1,
+                              [pca9685_constants.MODE1_RESTART | pca9685_constants.MODE1_AI])
+        time.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+        for register, value in self._read_registers().items():
+            self.shadow_registers[register] = value
+        self.shadow_registers[pca9685_constants.PCA9685_MODE1] &= \
+            ~pca9685_constants.MODE1_RESTART
+
+    def _write_registers(self, register, values):
+        """
+        Writes values to the device starting at register and records
+        them in the shadow copy, following the device's handling of
+        auto-increment, the ALL_LED registers and PRESCALE.
+
+        :param register: first register to write
+
+        :param values: list of byte values
+        """
+        self.board.i2c_write(self.i2c_address, [register] + list(values))
+        self._record_registers(register, values)
+
+    def _record_registers(self, register, values):
+        """
+        Records values written to the device starting at register in the
+        shadow copy.
+
+        :param register: first register written
+
+        :param values: list of byte values
+        """
+        shadow = self.shadow_registers
+        auto_increment = shadow[pca9685_constants.PCA9685_MODE1] & pca9685_constants.MODE1_AI
+        for value in values:
+            if pca9685_constants.PCA9685_ALLLED_ON_L <= register <= \
+                    pca9685_constants.PCA9685_ALLLED_OFF_H:
+                offset = register - pca9685_constants.PCA9685_ALLLED_ON_L
+                for channel in range(16):
+                    shadow[pca9685_constants.PCA9685_LED0_ON_L + 4 * channel + offset] = value
+            elif register == pca9685_constants.PCA9685_PRESCALE:
+                # the prescaler can only be changed in sleep mode
+                if shadow[pca9685_constants.PCA9685_MODE1] & pca9685_constants.MODE1_SLEEP:
+                    shadow[register] = value
+            elif register == pca9685_constants.PCA9685_MODE1:
+                # writing 1 to RESTART clears it
+                shadow[register] = value & ~pca9685_constants.MODE1_RESTART
+            else:
+                shadow[register] = value
+            if auto_increment:
+                register = (register + 1) & 0xff
+
+    def _read_registers(self):
         """
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                pca9685_constants.MODE1_RESTART])
-        time.sleep(0.01)
+        Reads MODE1, MODE2, PRESCALE and the 16 LED channel registers
+        from the device. All the reads are sent before waiting for any
+        reply.
 
-    def sleep(self):
+        :return: dictionary of register: value
         """
-        Puts board into sleep mode.
-        First performs a read, and then processes return
-        in _i2c_read_complete_sleep.
+        reads = [(pca9685_constants.PCA9685_MODE1, 1), (pca9685_constants.PCA9685_MODE2, 1),
+                 (pca9685_constants.PCA9685_PRESCALE, 1)]
+        if self.shadow_registers[pca9685_constants.PCA9685_MODE1] & \
+                pca9685_constants.MODE1_AI:
+            reads += [(pca9685_constants.PCA9685_LED0_ON_L + 16 * block, 16)
+                      for block in range(4)]
+        else:
+            reads += [(pca9685_constants.PCA9685_LED0_ON_L + offset, 1)
+                      for offset in range(64)]
+
+        replies = [self.board.i2c_read_future(self.i2c_address, register, count,
+                                              i2c_port=self.i2c_port, timeout=self.timeout)
+                   for register, count in reads]
+
+        registers = {}
+        for (register, count), reply in zip(reads, replies):
+            try:
+                # data is [i2c_read_report, port, number of bytes read, i2c address,
+                #           device_register, data values..., time_stamp]
+                values = reply.result()[5:-1]
+            except TimeoutError:
+                raise RuntimeError(f'PCA9685 at address {self.i2c_address}: read of register '
+                                   f'{register} timed out') from None
+            for offset, value in enumerate(values):
+                registers[register + offset] = value
+        return registers
+
+    def set_allcall_address(self, address=pca9685_constants.PCA9685_ALLCALL_I2C_ADDRESS,
+                            enable=True):
         """
-        self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_sleep)
-        time.sleep(.5)
+        Sets the LED All Call i2c address, which every PCA9685 with
+        All Call enabled responds to, and enables or disables it.
 
-    def _i2c_read_complete_sleep(self, data):
+        :param address: 7-bit i2c address
+
+        :param enable: respond to the address if True
         """
-        Finish processing sleep command
+        self._write_registers(pca9685_constants.PCA9685_ALLCALLADR, [address << 1])
+        self._set_mode1_bit(pca9685_constants.MODE1_ALLCAL, enable)
 
-        :param data: data from i2c device
+    def set_subaddress(self, number, address, enable=True):
         """
-        # data is [i2c_read_report, port, number of bytes read, i2c address,
-        #           device_register, data value, time_stamp]
-        awake = data[5]
-        # set sleep-bit high
-        sleep_value = awake | pca9685_constants.MODE1_SLEEP
+        Sets one of the three i2c subaddresses, which can be shared by a
+        group of PCA9685s, and enables or disables it.
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                sleep_value])
-        time.sleep(.005)  # wait until cycle ends for sleep to be active
+        :param number: subaddress number (1 - 3)
 
-    def wakeup(self):
+        :param address: 7-bit i2c address
+
+        :param enable: respond to the address if True
         """
-        Wakes board from sleep.
-        First performs a read, and then continues processing
-        in the _i2c_read_complete_wake callback.
+        if number not in (1, 2, 3):
+            raise RuntimeError('set_subaddress: number must be 1, 2 or 3')
+        self._write_registers(pca9685_constants.PCA9685_SUBADR1 + number - 1, [address << 1])
+        bit = {1: pca9685_constants.MODE1_SUB1, 2: pca9685_constants.MODE1_SUB2,
+               3: pca9685_constants.MODE1_SUB3}[number]
+        self._set_mode1_bit(bit, enable)
+
+    def _set_mode1_bit(self, bit, value):
         """
-        self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_wake)
-        time.sleep(0.5)
+        Sets or clears a bit of MODE1.
 
-    def _i2c_read_complete_wake(self, data):
-        # data is [i2c_read_report, port, number of bytes read, i2c address,
-        #           device_register, data value, time_stamp]
+        :param bit: MODE1 bit mask
 
-        sleep = data[5]
+        :param value: set the bit if True, clear it if False
+        """
+        mode = self.shadow_registers[pca9685_constants.PCA9685_MODE1]
+        if value:
+            mode |= bit
+        else:
+            mode &= ~bit
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [mode])
+
+    def verify(self):
+        """
+        Reads the registers back from the device and compares them with
+        the shadow copy. The RESTART bit of MODE1 is set and cleared by
+        the device itself, so it is not compared.
+
+        :return: list of (register, expected value, device value) for
+                 every register that does not match; empty if all match
+        """
+        mismatches = []
+        for register, value in sorted(self._read_registers().items()):
+            expected = self.shadow_registers[register]
+            if register == pca9685_constants.PCA9685_MODE1:
+                value &= ~pca9685_constants.MODE1_RESTART
+                expected &= ~pca9685_constants.MODE1_RESTART
+            if value != expected:
+                mismatches.append((register, expected, value))
+        return mismatches
+
+    def restore(self):
+        """
+        Rewrites the mode, address and prescaler registers from the
+        shadow copy, for example after the device was power cycled and
+        lost them. PRESCALE is written in sleep mode, and unless the
+        shadow copy is asleep, the device is woken and its PWM channels
+        restarted once the oscillator has settled, as in set_pwm_freq.
+        The LED channel registers are not rewritten.
+        """
+        shadow = self.shadow_registers
+        mode = shadow[pca9685_constants.PCA9685_MODE1]
+        self._write_registers(pca9685_constants.PCA9685_MODE1,
+                              [mode | pca9685_constants.MODE1_SLEEP])
+        for register in (pca9685_constants.PCA9685_MODE2, pca9685_constants.PCA9685_SUBADR1,
+                         pca9685_constants.PCA9685_SUBADR2, pca9685_constants.PCA9685_SUBADR3,
+                         pca9685_constants.PCA9685_ALLCALLADR,
+                         pca9685_constants.PCA9685_PRESCALE):
+            self._write_registers(register, [shadow[register]])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [mode])
+        if mode & pca9685_constants.MODE1_SLEEP:
+            return
+        time.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+        self._write_registers(pca9685_constants.PCA9685_MODE1,
+                              [mode | pca9685_constants.MODE1_RESTART])
+
+    def _read_and_wait(self, register, callback):
+        """
+        Reads a register, waits for the reply and passes it to callback.
+        A read which times out is abandoned, so its late reply can not be
+        taken for the reply to a later read of the register.
+
+        :param register: register to read
+
+        :param callback: method to process the register value
+        """
+        reply = self.board.i2c_read_future(self.i2c_address, register, 1,
+                                           i2c_port=self.i2c_port, timeout=self.timeout)
+        try:
+            data = reply.result()
+        except TimeoutError:
+            raise RuntimeError(f'PCA9685 at address {self.i2c_address}: read of register '
+                               f'{register} timed out') from None
+        callback(data)
+
+    def sleep(self):
+        """
+        Puts board into sleep mode.
+        """
         # set sleep-bit high
-        wake = sleep & ~pca9685_constants.MODE1_SLEEP
+        sleep_value = self.shadow_registers[pca9685_constants.PCA9685_MODE1] | \
+            pca9685_constants.MODE1_SLEEP
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [sleep_value])
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                wake])
-        time.sleep(0.05)
+    def wakeup(self):
+        """
+        Wakes board from sleep.
+        """
+        # set sleep-bit low
+        wake = self.shadow_registers[pca9685_constants.PCA9685_MODE1] & \
+            ~pca9685_constants.MODE1_SLEEP
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [wake])
+        time.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
 
     def set_ext_clk(self, prescale):
         """
         Sets EXTCLK pin to use the external clock
-        First, performs a read, and then continues
-        processing in the _i2c_read_complete_ext_clock callback.
 
         :param prescale: prescale value
 
         """
         self.prescale = prescale
-        self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_ext_clock)
-        time.sleep(0.5)
-
-    def _i2c_read_complete_ext_clock(self, data):
-        # data is [i2c_read_report, port, number of bytes read, i2c address,
-        #           device_register, data value, time_stamp]
-        old_mode = data[5]  # offset of 5 is the External Clock data value
+        old_mode = self.shadow_registers[pca9685_constants.PCA9685_MODE1]
         new_mode = (old_mode & ~pca9685_constants.MODE1_RESTART) | \
                    pca9685_constants.MODE1_SLEEP
 
         # go to sleep, turn off internal oscillator
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                new_mode])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [new_mode])
         # this sets the SLEEP and EXTCLK bits of the mode1 register to
         # switch to use the external clock
 
         write_value = new_mode | pca9685_constants.MODE1_EXTCLK
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                write_value])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [write_value])
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_PRESCALE,
-                                                self.prescale])
-        time.sleep(.005)
+        self._write_registers(pca9685_constants.PCA9685_PRESCALE, [self.prescale])
 
         # clear the SLEEP bit to start
         write_value = (new_mode & ~pca9685_constants.MODE1_SLEEP)
         write_value |= pca9685_constants.MODE1_RESTART
         write_value |= pca9685_constants.MODE1_AI
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                write_value])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [write_value])
 
-        time.sleep(0.05)
+        time.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
 
     def set_pwm_freq(self, freq):
         """
         Sets the PWM frequency for the entire chip, up to ~1.6 KHz
-        Begins with a read, and then continues processing in the
-        _i2c_read_complete_set_pwm_freq callback
 
         :param freq: Floating point frequency that we will attempt to match
         """
@@ -205,55 +363,35 @@ class TelemetrixPCA9685:
 
         self.prescale = int(prescale_value)
 
-        self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_set_pwm_freq)
-        time.sleep(.1)
-
-    def _i2c_read_complete_set_pwm_freq(self, data):
-        old_mode = data[5]  # offset 5 is the reported mode value
+        old_mode = self.shadow_registers[pca9685_constants.PCA9685_MODE1]
         new_mode = (old_mode & ~pca9685_constants.MODE1_RESTART) | \
                    pca9685_constants.MODE1_SLEEP
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                new_mode])
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_PRESCALE,
-                                                int(self.prescale)])
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                old_mode])
-        time.sleep(0.005)
-
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                old_mode |
-                                                pca9685_constants.MODE1_RESTART |
-                                                pca9685_constants.MODE1_AI])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [new_mode])
+        self._write_registers(pca9685_constants.PCA9685_PRESCALE, [int(self.prescale)])
+        self._write_registers(pca9685_constants.PCA9685_MODE1, [old_mode])
+        time.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+
+        self._write_registers(pca9685_constants.PCA9685_MODE1,
+                              [old_mode | pca9685_constants.MODE1_RESTART |
+                               pca9685_constants.MODE1_AI])
 
     def set_output_mode(self, totempole=True):
         """
         Sets the output mode of the PCA9685 to either
         open drain or push pull / totempole.
 
-        Begins with a read and completes the operation
-        in the _i2c_read_complete_set_output callback
-
         Warning: LEDs with integrated zener diodes should
         only be driven in open drain mode.
 
         :param totempole: If true set to totempole, open drain if false.
         """
         self.totempole = totempole
-        self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE2, 1,
-                            self._i2c_read_complete_set_output)
-        time.sleep(0.5)
-
-    def _i2c_read_complete_set_output(self, data):
-        old_mode = data[5]
+        old_mode = self.shadow_registers[pca9685_constants.PCA9685_MODE2]
         if self.totempole:
             new_mode = old_mode | pca9685_constants.MODE2_OUTDRV
         else:
             new_mode = old_mode & ~pca9685_constants.MODE2_OUTDRV
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE2,
-                                                new_mode])
+        self._write_registers(pca9685_constants.PCA9685_MODE2, [new_mode])
 
     def read_pre_scale(self):
         """
@@ -264,9 +402,9 @@ class TelemetrixPCA9685:
         :return: prescale value
         """
         self.prescale = None
-        self.board.i2c_read(self.i2c_address, pca9685_constants.PCA9685_PRESCALE, 1,
+        self._read_and_wait(pca9685_constants.PCA9685_PRESCALE,
                             self._i2c_read_complete_read_prescale)
-        time.sleep(0.05)
+        return self.prescale
 
     def _i2c_read_complete_read_prescale(self, data):
         """
@@ -277,6 +415,8 @@ class TelemetrixPCA9685:
         """
         self.prescale_read = True
         self.prescale = int(data[5])  # data value returned
+        self.shadow_registers[pca9685_constants.PCA9685_PRESCALE] = self.prescale
+        self.operation_complete.set()
 
     def get_pwm(self, num):
         """
@@ -306,9 +446,44 @@ class TelemetrixPCA9685:
         :param off: Point in the 4096-part cycle to turn the PWM output OFF
         :return:
         """
-        self.board.i2c_write(self.i2c_address,
-                             [pca9685_constants.PCA9685_LED0_ON_L + 4 * num, on & 0xff,
-                              on >> 8, off & 0xff, off >> 8])
+        self._write_registers(pca9685_constants.PCA9685_LED0_ON_L + 4 * num,
+                              [on & 0xff, on >> 8, off & 0xff, off >> 8])
+
+    def set_pwm_many(self, start_channel, values):
+        """
+        Sets the PWM outputs of consecutive PCA9685 pins using the
+        auto-increment mode enabled by set_pwm_freq and set_ext_clk.
+        The registers are written in as few i2c writes as possible,
+        with each write limited to MAX_CHANNELS_PER_WRITE channels so
+        that it fits in the firmware's command buffer.
+
+        :param start_channel: First PWM output pin to set (0 - 15)
+        :param values: A list of [on, off] pairs, one per consecutive pin
+        :return:
+        """
+        if start_channel < 0 or start_channel + len(values) > 16:
+            raise RuntimeError('set_pwm_many: channels must be between 0 and 15')
+
+        step = pca9685_constants.MAX_CHANNELS_PER_WRITE
+        for first in range(0, len(values), step):
+            data = []
+            for on, off in values[first:first + step]:
+                data.extend([on & 0xff, on >> 8, off & 0xff, off >> 8])
+            self._write_registers(pca9685_constants.PCA9685_LED0_ON_L +
+                                  4 * (start_channel + first), data)
+
+    def set_all_pwm(self, on, off):
+        """
+        Sets the PWM output of all 16 PCA9685 pins at once by writing
+        the ALL_LED registers in a single i2c write. Relies on the
+        auto-increment mode enabled by set_pwm_freq and set_ext_clk.
+
+        :param on: Point in the 4096-part cycle to turn the PWM outputs ON
+        :param off: Point in the 4096-part cycle to turn the PWM outputs OFF
+        :return:
+        """
+        self._write_registers(pca9685_constants.PCA9685_ALLLED_ON_L,
+                              [on & 0xff, on >> 8, off & 0xff, off >> 8])
 
     def set_pin(self, num, value, invert=False):
         """
@@ -370,3 +545,115 @@ class TelemetrixPCA9685:
         :param angle: 0-180
         """
         self.set_pwm(servo_num, 0, (angle * self.position_per_degree) + self.position_min)
+
+
+# noinspection GrazieInspection
+class TelemetrixPCA9685Broadcast(TelemetrixPCA9685):
+    """
+    This class writes to a group of PCA9685 boards at once through their
+    LED All Call address or a shared subaddress, so that identical settings
+    reach every board in a single i2c write and take effect at the same time.
+
+    Broadcast addresses can only be written, so the methods which read the
+    device are not supported. The register shadow copy of every board in the
+    group is kept up to date.
+    """
+    def __init__(self, drivers,
+                 i2c_address=pca9685_constants.PCA9685_ALLCALL_I2C_ADDRESS,
+                 subaddress=None):
+        """
+
+        :param drivers: list of TelemetrixPCA9685 instances sharing one
+                        Telemetrix instance and i2c port
+
+        :param i2c_address: broadcast i2c address
+
+        :param subaddress: None to use the LED All Call address, or the
+                           subaddress number (1 - 3) to use
+        """
+        self.drivers = list(drivers)
+        if not self.drivers:
+            raise RuntimeError('At least one TelemetrixPCA9685 instance must be specified')
+        first = self.drivers[0]
+
+        self.i2c_address = i2c_address
+        self.i2c_port = first.i2c_port
+        self.board = first.board
+        self.timeout = first.timeout
+        self.prescale = first.prescale
+        self.position_min = first.position_min
+        self.position_max = first.position_max
+        self.position_per_degree = first.position_per_degree
+        self.oscillator_freq = first.oscillator_freq
+        self.totempole = first.totempole
+        self.pwm_data = None
+
+        for driver in self.drivers:
+            if subaddress is None:
+                driver.set_allcall_address(i2c_address)
+            else:
+                driver.set_subaddress(subaddress, i2c_address)
+
+        # mode changes are written to every board at once, so the boards
+        # must already agree on them
+        for register in (pca9685_constants.PCA9685_MODE1, pca9685_constants.PCA9685_MODE2):
+            if len({driver.shadow_registers[register] for driver in self.drivers}) > 1:
+                raise RuntimeError(f'Register {register} differs between the PCA9685 boards')
+        self.shadow_registers = bytearray(first.shadow_registers)
+
+    def _record_registers(self, register, values):
+        """
+        Records values written to the broadcast address in the shadow copy
+        of every board in the group.
+
+        :param register: first register written
+
+        :param values: list of byte values
+        """
+        TelemetrixPCA9685._record_registers(self, register, values)
+        for driver in self.drivers:
+            driver._record_registers(register, values)
+
+    def reset(self):
+        """
+        Resets every board in the group individually.
+        """
+        for driver in self.drivers:
+            driver.reset()
+        self.shadow_registers = bytearray(self.drivers[0].shadow_registers)
+
+    def restore(self):
+        """
+        Restores the registers of every board in the group individually.
+        """
+        for driver in self.drivers:
+            driver.restore()
+
+    def verify(self):
+        """
+        Verifies the register shadow copy of every board in the group.
+
+        :return: dictionary of board i2c address: list of mismatches,
+                 as returned by TelemetrixPCA9685.verify, for every board
+                 with mismatches
+        """
+        mismatches = {}
+        for driver in self.drivers:
+            driver_mismatches = driver.verify()
+            if driver_mismatches:
+                mismatches[driver.i2c_address] = driver_mismatches
+        return mismatches
+
+    def read_pre_scale(self):
+        """
+        Not supported, since broadcast addresses can only be written.
+        """
+        raise RuntimeError('read_pre_scale: broadcast addresses cannot be read')
+
+    def get_pwm(self, num):
+        """
+        Not supported, since broadcast addresses can only be written.
+
+        :param num: One of the PWM output pins (0 - 15)
+        """
+        raise RuntimeError('get_pwm: broadcast addresses cannot be read')
@@ -31,7 +31,8 @@ class TelemetrixPCA9685Aio:
     def __init__(self, i2c_address=pca9685_constants.PCA9685_I2C_ADDRESS,
                  i2c_port=0, board=None, loop=None,
                  osc_freq=pca9685_constants.FREQUENCY_OSCILLATOR,
-                 prescale=0, position_min=150, position_max=600):
+                 prescale=0, position_min=150, position_max=600, timeout=0.5,
+                 autostart=True):
         """
 
         :param i2c_address: i2c device address
@@ -50,6 +51,14 @@ class TelemetrixPCA9685Aio:
 
         :param position_max: maximum servo position
 
+        :param timeout: maximum time in seconds to wait for the register
+                        read of a read-modify-write operation to complete
+
+        :param autostart: If True, the constructor runs begin on loop. This
+                          requires a loop that is not already running; from
+                          within a coroutine, set autostart to False and
+                          await begin instead.
+
         """
         self.i2c_address = i2c_address
         self.i2c_port = i2c_port
@@ -66,6 +75,11 @@ class TelemetrixPCA9685Aio:
         self.prescale = prescale
         self.position_min = position_min
         self.position_max = position_max
+        self.timeout = timeout
+
+        # set when a read-modify-write callback has finished its writes;
+        # created by _read_and_wait so it belongs to the running loop
+        self.operation_complete = None
 
         self.totempole = True
         self.pwm_data = None
@@ -74,7 +88,8 @@ class TelemetrixPCA9685Aio:
 
         self.position_per_degree = (self.position_max - self.position_min) // 180
 
-        loop.run_until_complete(self.begin())
+        if autostart:
+            loop.run_until_complete(self.begin())
 
     async def begin(self):
         """
@@ -98,7 +113,28 @@ class TelemetrixPCA9685Aio:
         """
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
                                                 pca9685_constants.MODE1_RESTART])
-        await asyncio.sleep(.1)
+        await asyncio.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+
+    async def _read_and_wait(self, register, callback):
+        """
+        Reads a register, waits for the reply and passes it to callback.
+        A read which times out is abandoned, so its late reply can not be
+        taken for the reply to a later read of the register.
+
+        :param register: register to read
+
+        :param callback: method to process the register value
+        """
+        self.operation_complete = asyncio.Event()
+        reply = await self.board.i2c_read_future(self.i2c_address, register, 1,
+                                                 i2c_port=self.i2c_port,
+                                                 timeout=self.timeout)
+        try:
+            data = await reply
+        except TimeoutError:
+            raise RuntimeError(f'PCA9685 at address {self.i2c_address}: read of register '
+                               f'{register} timed out') from None
+        await callback(data)
 
     async def sleep(self):
         """
@@ -106,10 +142,8 @@ class TelemetrixPCA9685Aio:
         First performs a read, and then processes return
         in _i2c_read_complete_sleep.
         """
-        await self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_sleep)
-        await asyncio.sleep(.5)
+        await self._read_and_wait(pca9685_constants.PCA9685_MODE1,
+                                  self._i2c_read_complete_sleep)
 
     async def _i2c_read_complete_sleep(self, data):
         """
@@ -123,9 +157,9 @@ class TelemetrixPCA9685Aio:
         # set sleep-bit high
         sleep_value = awake | pca9685_constants.MODE1_SLEEP
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                sleep_value])
-        await asyncio.sleep(.005)  # wait until cycle ends for sleep to be active
+        await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
+                                                      sleep_value])
+        self.operation_complete.set()
 
     async def wakeup(self):
         """
@@ -133,10 +167,8 @@ class TelemetrixPCA9685Aio:
         First performs a read, and then continues processing
         in the _i2c_read_complete_wake callback.
         """
-        await self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_wake)
-        await asyncio.sleep(0.5)
+        await self._read_and_wait(pca9685_constants.PCA9685_MODE1,
+                                  self._i2c_read_complete_wake)
 
     async def _i2c_read_complete_wake(self, data):
         # data is [i2c_read_report, port, number of bytes read, i2c address,
@@ -146,9 +178,10 @@ class TelemetrixPCA9685Aio:
         # set sleep-bit high
         wake = sleep & ~pca9685_constants.MODE1_SLEEP
 
-        self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
-                                                wake])
-        await asyncio.sleep(0.05)
+        await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
+                                                      wake])
+        await asyncio.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+        self.operation_complete.set()
 
     async def set_ext_clk(self, prescale):
         """
@@ -160,10 +193,8 @@ class TelemetrixPCA9685Aio:
 
         """
         self.prescale = prescale
-        await self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_ext_clock)
-        await asyncio.sleep(0.5)
+        await self._read_and_wait(pca9685_constants.PCA9685_MODE1,
+                                  self._i2c_read_complete_ext_clock)
 
     async def _i2c_read_complete_ext_clock(self, data):
         # data is [i2c_read_report, port, number of bytes read, i2c address,
@@ -184,7 +215,6 @@ class TelemetrixPCA9685Aio:
 
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_PRESCALE,
                                                 self.prescale])
-        await asyncio.sleep(.005)
 
         # clear the SLEEP bit to start
         write_value = (new_mode & ~pca9685_constants.MODE1_SLEEP)
@@ -194,7 +224,8 @@ class TelemetrixPCA9685Aio:
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
                                                 write_value])
 
-        await asyncio.sleep(0.05)
+        await asyncio.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
+        self.operation_complete.set()
 
     async def set_pwm_freq(self, freq):
         """
@@ -218,9 +249,8 @@ class TelemetrixPCA9685Aio:
 
         self.prescale = int(prescale_value)
 
-        await self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE1, 1,
-                            self._i2c_read_complete_set_pwm_freq)
+        await self._read_and_wait(pca9685_constants.PCA9685_MODE1,
+                                  self._i2c_read_complete_set_pwm_freq)
 
     async def _i2c_read_complete_set_pwm_freq(self, data):
         old_mode = data[5]  # offset 5 is the reported mode value
@@ -232,12 +262,13 @@ class TelemetrixPCA9685Aio:
                                                 int(self.prescale)])
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
                                                 old_mode])
-        await asyncio.sleep(0.005)
+        await asyncio.sleep(pca9685_constants.OSCILLATOR_SETTLE_TIME)
 
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE1,
                                                 old_mode |
                                                 pca9685_constants.MODE1_RESTART |
                                                 pca9685_constants.MODE1_AI])
+        self.operation_complete.set()
 
     async def set_output_mode(self, totempole=True):
         """
@@ -253,10 +284,8 @@ class TelemetrixPCA9685Aio:
         :param totempole: If true set to totempole, open drain if false.
         """
         self.totempole = totempole
-        await self.board.i2c_read(self.i2c_address,
-                            pca9685_constants.PCA9685_MODE2, 1,
-                            self._i2c_read_complete_set_output)
-        await asyncio.sleep(0.5)
+        await self._read_and_wait(pca9685_constants.PCA9685_MODE2,
+                                  self._i2c_read_complete_set_output)
 
     async def _i2c_read_complete_set_output(self, data):
         old_mode = data[5]
@@ -266,6 +295,7 @@ class TelemetrixPCA9685Aio:
             new_mode = old_mode & ~pca9685_constants.MODE2_OUTDRV
         await self.board.i2c_write(self.i2c_address, [pca9685_constants.PCA9685_MODE2,
                                                 new_mode])
+        self.operation_complete.set()
 
     async def read_pre_scale(self):
         """
@@ -276,9 +306,9 @@ class TelemetrixPCA9685Aio:
         :return: prescale value
         """
         self.prescale = None
-        await self.board.i2c_read(self.i2c_address, pca9685_constants.PCA9685_PRESCALE, 1,
-                            self._i2c_read_complete_read_prescale)
-        await asyncio.sleep(0.05)
+        await self._read_and_wait(pca9685_constants.PCA9685_PRESCALE,
+                                  self._i2c_read_complete_read_prescale)
+        return self.prescale
 
     async def _i2c_read_complete_read_prescale(self, data):
         """
@@ -289,6 +319,7 @@ class TelemetrixPCA9685Aio:
         """
         self.prescale_read = True
         self.prescale = int(data[5])  # data value returned
+        self.operation_complete.set()
 
     async def get_pwm(self, num):
         """
@@ -322,6 +353,42 @@ class TelemetrixPCA9685Aio:
                              [pca9685_constants.PCA9685_LED0_ON_L + 4 * num, on & 0xff,
                               on >> 8, off & 0xff, off >> 8])
 
+    async def set_pwm_many(self, start_channel, values):
+        """
+        Sets the PWM outputs of consecutive PCA9685 pins using the
+        auto-increment mode enabled by set_pwm_freq and set_ext_clk.
+        The registers are written in as few i2c writes as possible,
+        with each write limited to MAX_CHANNELS_PER_WRITE channels so
+        that it fits in the firmware's command buffer.
+
+        :param start_channel: First PWM output pin to set (0 - 15)
+        :param values: A list of [on, off] pairs, one per consecutive pin
+        :return:
+        """
+        if start_channel < 0 or start_channel + len(values) > 16:
+            raise RuntimeError('set_pwm_many: channels must be between 0 and 15')
+
+        step = pca9685_constants.MAX_CHANNELS_PER_WRITE
+        for first in range(0, len(values), step):
+            data = [pca9685_constants.PCA9685_LED0_ON_L + 4 * (start_channel + first)]
+            for on, off in values[first:first + step]:
+                data.extend([on & 0xff, on >> 8, off & 0xff, off >> 8])
+            await self.board.i2c_write(self.i2c_address, data)
+
+    async def set_all_pwm(self, on, off):
+        """
+        Sets the PWM output of all 16 PCA9685 pins at once by writing
+        the ALL_LED registers in a single i2c write. Relies on the
+        auto-increment mode enabled by set_pwm_freq and set_ext_clk.
+
+        :param on: Point in the 4096-part cycle to turn the PWM outputs ON
+        :param off: Point in the 4096-part cycle to turn the PWM outputs OFF
+        :return:
+        """
+        await self.board.i2c_write(self.i2c_address,
+                             [pca9685_constants.PCA9685_ALLLED_ON_L, on & 0xff,
+                              on >> 8, off & 0xff, off >> 8])
+
     async def set_pin(self, num, value, invert=False):
         """
         Helper to set pin PWM output.
@@ -0,0 +1,586 @@
+'''
+This module simulates an Arduino running the Telemetrix4Arduino sketch with PCA9685 drivers on its
+I2C bus, so that telemetrix_controller can be tested and benchmarked without the LED Array
+Controller PCB or the cryostat. The simulated board speaks the same wire protocol as
+Telemetrix4Arduino.ino, using the command and report IDs in telemetrix/private_constants.py, and
+can be reached either over TCP (through the ip_address and ip_port parameters of Telemetrix) or
+over a pseudo-terminal (through the com_port parameter of Telemetrix).
+
+The simulated board keeps the mode and level of every pin and the full register file of every
+PCA9685 driver, including auto-increment, the ALL_LED registers, and the ALLCALL and subaddress
+broadcast addresses, so the hardware state reached by a sequence of commands can be checked
+directly. An optional baud rate and I2C clock throttle each command to the time it would take
+on real hardware.
+
+Example:
+    simulator = SimulatedArduino(i2c_addresses=[64])
+    host, port = simulator.serve_tcp()
+    arduino = telemetrix_controller.Arduino('warm_test.txt', ip_address=host, ip_port=port)
+
+The module can also be run directly to serve a simulated board until interrupted:
+    python telemetrix_simulator.py --tcp 31335
+    python telemetrix_simulator.py --pty
+
+--------------
+University of Chicago South Pole Telescope Group
+'''
+
+import argparse
+import os
+import socket
+import threading
+import time
+from telemetrix.private_constants import PrivateConstants
+from telemetrix_pca9685 import pca9685_constants
+
+class SimulatedPCA9685:
+
+    '''
+    The SimulatedPCA9685 object models the register file of a PCA9685 driver as seen over I2C.
+
+    Attributes:
+        address (int): 7-bit I2C address set by the driver's solder jumpers
+        registers (bytearray): all 256 register values, initialized to their power-on defaults
+        pointer (int): register which the next byte read or written will use
+
+    Methods:
+        __init__ (dunder): constructor
+        responds_to (public): checks whether the driver acknowledges an I2C address
+        write (public): handles an I2C write transaction
+        read (public): handles an I2C read transaction
+        channel (public): returns the [on, off] ticks of a channel
+        _advance (internal): moves the register pointer after a byte is read or written
+    '''
+
+    def __init__(self, address):
+        '''
+        Constructor method for the SimulatedPCA9685 class.
+
+        Parameters:
+            self
+            address (int): 7-bit I2C address set by the driver's solder jumpers
+
+        Returns:
+            None
+        '''
+        self.address = address
+        self.registers = bytearray(256)
+        self.registers[pca9685_constants.PCA9685_MODE1] = (pca9685_constants.MODE1_SLEEP |
+                                                            pca9685_constants.MODE1_ALLCAL)
+        self.registers[pca9685_constants.PCA9685_MODE2] = pca9685_constants.MODE2_OUTDRV
+        self.registers[pca9685_constants.PCA9685_SUBADR1] = 0xE2
+        self.registers[pca9685_constants.PCA9685_SUBADR2] = 0xE4
+        self.registers[pca9685_constants.PCA9685_SUBADR3] = 0xE8
+        self.registers[pca9685_constants.PCA9685_ALLCALLADR] = 0xE0
+        self.registers[pca9685_constants.PCA9685_PRESCALE] = 0x1E
+        for channel in range(16):
+            # Every channel powers up fully off
+            self.registers[pca9685_constants.PCA9685_LED0_OFF_H + 4 * channel] = 0x10
+        self.pointer = 0
+
+    def responds_to(self, address):
+        '''
+        Checks whether the driver acknowledges an I2C address: its own address, or the ALLCALL
+        or a subaddress if the matching MODE1 bit is set.
+
+        Parameters:
+            self
+            address (int): 7-bit I2C address
+
+        Returns:
+            responds (bool)
+        '''
+        if address == self.address:
+            return True
+        mode1 = self.registers[pca9685_constants.PCA9685_MODE1]
+        broadcasts = ((pca9685_constants.MODE1_ALLCAL, pca9685_constants.PCA9685_ALLCALLADR),
+                      (pca9685_constants.MODE1_SUB1, pca9685_constants.PCA9685_SUBADR1),
+                      (pca9685_constants.MODE1_SUB2, pca9685_constants.PCA9685_SUBADR2),
+                      (pca9685_constants.MODE1_SUB3, pca9685_constants.PCA9685_SUBADR3))
+        return any(mode1 & bit and self.registers[register] >> 1 == address
+                   for bit, register in broadcasts)
+
+    def write(self, data):
+        '''
+        Handles an I2C write transaction. The first byte selects the register; every following
+        byte is written to the register pointer, which only advances if MODE1_AI is set.
+        Writes to the ALL_LED registers are copied to the matching register of every channel,
+        and PRESCALE can only be written while MODE1_SLEEP is set, as on the real chip.
+
+        Parameters:
+            self
+            data (bytes): bytes of the transaction, starting with the register
+
+        Returns:
+            None
+        '''
+        if not data:
+            return
+        self.pointer = data[0]
+        for value in data[1:]:
+            register = self.pointer
+            if pca9685_constants.PCA9685_ALLLED_ON_L <= register <= \
+                    pca9685_constants.PCA9685_ALLLED_OFF_H:
+                offset = register - pca9685_constants.PCA9685_ALLLED_ON_L
+                for channel in range(16):
+                    self.registers[pca9685_constants.PCA9685_LED0_ON_L + 4 * channel +
+                                   offset] = value
+            elif register == pca9685_constants.PCA9685_PRESCALE:
+                if self.registers[pca9685_constants.PCA9685_MODE1] & \
+                        pca9685_constants.MODE1_SLEEP:
+                    self.registers[register] = value
+            else:
+                self.registers[register] = value
+            self._advance()
+
+    def read(self, number_of_bytes):
+        '''
+        Handles an I2C read transaction starting at the register pointer. The ALL_LED registers
+        always read back as 0, as on the real chip.
+
+        Parameters:
+            self
+            number_of_bytes (int): number of bytes to read
+
+        Returns:
+            data (bytes)
+        '''
+        data = bytearray()
+        for _ in range(number_of_bytes):
+            register = self.pointer
+            if pca9685_constants.PCA9685_ALLLED_ON_L <= register <= \
+                    pca9685_constants.PCA9685_ALLLED_OFF_H:
+                data.append(0)
+            else:
+                data.append(self.registers[register])
+            self._advance()
+        return bytes(data)
+
+    def channel(self, channel):
+        '''
+        Returns the ON and OFF tick values of a channel, including the full on and full off bits.
+
+        Parameters:
+            self
+            channel (int): channel number between 0 and 15 inclusive
+
+        Returns:
+            ticks (tuple): (on, off)
+        '''
+        base = pca9685_constants.PCA9685_LED0_ON_L + 4 * channel
+        LED = self.registers[base:base + 4]
+        return LED[0] | LED[1] << 8, LED[2] | LED[3] << 8
+
+    def _advance(self):
+        '''
+        Moves the register pointer to the next register if MODE1_AI is set.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        if self.registers[pca9685_constants.PCA9685_MODE1] & pca9685_constants.MODE1_AI:
+            self.pointer = (self.pointer + 1) & 0xFF
+
+
+class SimulatedArduino:
+
+    '''
+    The SimulatedArduino object models an Arduino running Telemetrix4Arduino with PCA9685 drivers
+    on its I2C bus, and serves it over TCP or a pseudo-terminal.
+
+    Attributes:
+        arduino_id (int): ARDUINO_ID reported in reply to ARE_U_THERE
+        drivers (dict): SimulatedPCA9685 objects keyed by I2C address
+        pin_modes (dict): last mode set for each pin, as a PrivateConstants pin mode value
+        pin_levels (dict): last value written to each pin by digital_write or analog_write
+        baud (int | None): serial baud rate to throttle commands to; None for no throttle
+        i2c_clock (int | None): I2C clock in Hz to throttle I2C transactions to; None for no
+                                throttle
+        command_count (int): number of commands handled
+        byte_count (int): number of bytes received
+        command_counts (dict): number of commands handled, keyed by command ID
+        errors (list): descriptions of malformed or unsupported commands
+        i2c_writes (list | None): (time.monotonic() value, address, data bytes) of every I2C
+                                  write handled; None unless record_i2c_writes was set
+        __buffer (bytearray): received bytes which do not yet form a complete command
+        __line_free (float): time.monotonic() value at which the simulated serial line is idle
+        __lock (Lock): held while a chunk of received bytes is handled
+        __stop (Event): set by close to stop the serving thread
+        __thread (Thread): thread serving the TCP connection or pseudo-terminal
+        __server (socket), __connection (socket): TCP listening and client sockets
+        __master (int), __slave (int): pseudo-terminal file descriptors
+
+    Methods:
+        __init__ (dunder): constructor
+        serve_tcp (public): serves the board on a TCP port
+        open_pty (public): serves the board on a pseudo-terminal
+        close (public): stops serving the board
+        feed (public): handles bytes received from the host and returns the reply bytes
+        __command (private): handles a single command
+        __i2c_read (private): handles an I2C_READ command
+        __i2c_write (private): handles an I2C_WRITE command
+        __throttle (private): delays a command for the time it takes on real hardware
+        __serve_tcp (private): TCP serving thread
+        __serve_pty (private): pseudo-terminal serving thread
+    '''
+
+    def __init__(self, i2c_addresses=(pca9685_constants.PCA9685_I2C_ADDRESS,), arduino_id=1,
+                 baud=None, i2c_clock=None, record_i2c_writes=False):
+        '''
+        Constructor method for the SimulatedArduino class.
+
+        Parameters:
+            self
+            i2c_addresses (iterable): 7-bit I2C addresses of the PCA9685 drivers on the bus;
+                                      default value is a single driver at 64 (0x40)
+            arduino_id (int): ARDUINO_ID of the simulated sketch; default value 1 matches the
+                              Telemetrix default
+            baud (int | None): serial baud rate to throttle commands to, such as 115200;
+                               default value None corresponds to no throttle
+            i2c_clock (int | None): I2C clock in Hz to throttle I2C transactions to, such as
+                                    100000; default value None corresponds to no throttle
+            record_i2c_writes (bool): if True, every I2C write is recorded in i2c_writes with
+                                      the time it was handled, so the timing of register
+                                      writes can be checked
+
+        Returns:
+            None
+        '''
+        self.arduino_id = arduino_id
+        self.drivers = {address: SimulatedPCA9685(address) for address in i2c_addresses}
+        self.pin_modes = {}
+        self.pin_levels = {}
+        self.baud = baud
+        self.i2c_clock = i2c_clock
+        self.command_count = 0
+        self.byte_count = 0
+        self.command_counts = {}
+        self.errors = []
+        self.i2c_writes = [] if record_i2c_writes else None
+        self.__buffer = bytearray()
+        self.__line_free = 0
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__server = None
+        self.__connection = None
+        self.__master = None
+        self.__slave = None
+
+    def serve_tcp(self, host='127.0.0.1', port=0):
+        '''
+        Serves the board on a TCP port in a background thread. One client is served at a time.
+
+        Parameters:
+            self
+            host (str): interface to listen on; default value '127.0.0.1'
+            port (int): port to listen on; default value 0 picks a free port
+
+        Returns:
+            address (tuple): (host, port) to pass to Telemetrix as ip_address and ip_port
+        '''
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__server.bind((host, port))
+        self.__server.listen(1)
+        self.__thread = threading.Thread(target=self.__serve_tcp, daemon=True)
+        self.__thread.start()
+        return self.__server.getsockname()
+
+    def open_pty(self):
+        '''
+        Serves the board on a pseudo-terminal in a background thread. Only available on POSIX
+        systems.
+
+        Parameters:
+            self
+
+        Returns:
+            device (str): path of the pseudo-terminal to pass to Telemetrix as com_port
+        '''
+        import tty
+
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        self.__thread = threading.Thread(target=self.__serve_pty, daemon=True)
+        self.__thread.start()
+        return os.ttyname(self.__slave)
+
+    def close(self):
+        '''
+        Stops serving the board and closes its socket or pseudo-terminal.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        self.__stop.set()
+        for sock in (self.__connection, self.__server):
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+        for fd in (self.__slave, self.__master):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        if self.__thread is not None:
+            self.__thread.join(1)
+
+    def feed(self, data):
+        '''
+        Handles bytes received from the host. Complete commands are handled in order; a trailing
+        partial command is kept until the rest of it arrives.
+
+        Parameters:
+            self
+            data (bytes): bytes received from the host
+
+        Returns:
+            reply (bytes): report bytes to send back to the host
+        '''
+        with self.__lock:
+            self.byte_count += len(data)
+            self.__buffer += data
+            reply = bytearray()
+            start = 0
+            while start < len(self.__buffer):
+                packet_length = self.__buffer[start]
+                end = start + 1 + packet_length
+                if end > len(self.__buffer):
+                    break
+                if packet_length:
+                    self.__throttle(1 + packet_length)
+                    self.__command(self.__buffer[start + 1], self.__buffer[start + 2:end], reply)
+                else:
+                    self.errors.append('Command with a packet length of zero')
+                start = end
+            del self.__buffer[:start]
+            return bytes(reply)
+
+    def __command(self, command, payload, reply):
+        '''
+        Private method which handles a single command, as get_next_command and the command_table
+        do in Telemetrix4Arduino.
+
+        Parameters:
+            self
+            command (int): command ID
+            payload (bytearray): bytes following the command ID
+            reply (bytearray): report bytes are appended here
+
+        Returns:
+            None
+        '''
+        self.command_count += 1
+        self.command_counts[command] = self.command_counts.get(command, 0) + 1
+        if len(payload) > pca9685_constants.MAX_COMMAND_LENGTH:
+            self.errors.append(f'Command {command} is {len(payload)} bytes long, which overflows '
+                               f'the {pca9685_constants.MAX_COMMAND_LENGTH} byte command buffer')
+            return
+
+        if command == PrivateConstants.LOOP_COMMAND:
+            reply += bytes([2, PrivateConstants.LOOP_COMMAND, payload[0]])
+        elif command == PrivateConstants.SET_PIN_MODE:
+            self.pin_modes[payload[0]] = payload[1]
+        elif command == PrivateConstants.DIGITAL_WRITE:
+            self.pin_levels[payload[0]] = payload[1]
+        elif command == PrivateConstants.ANALOG_WRITE:
+            self.pin_levels[payload[0]] = payload[1] << 8 | payload[2]
+        elif command == PrivateConstants.GET_FIRMWARE_VERSION:
+            reply += bytes([4, PrivateConstants.FIRMWARE_REPORT, 5, 4, 0])
+        elif command == PrivateConstants.ARE_U_THERE:
+            reply += bytes([2, PrivateConstants.I_AM_HERE_REPORT, self.arduino_id])
+        elif command == PrivateConstants.I2C_READ:
+            self.__i2c_read(payload, reply)
+        elif command == PrivateConstants.I2C_WRITE:
+            self.__i2c_write(payload)
+        elif command == PrivateConstants.GET_FEATURES:
+            reply += bytes([2, PrivateConstants.FEATURES, 0x7F])
+        elif command == PrivateConstants.RESET:
+            self.pin_modes.clear()
+        elif command in (PrivateConstants.MODIFY_REPORTING, PrivateConstants.I2C_BEGIN,
+                         PrivateConstants.STOP_ALL_REPORTS, PrivateConstants.ENABLE_ALL_REPORTS,
+                         PrivateConstants.SET_ANALOG_SCANNING_INTERVAL):
+            pass
+        else:
+            self.errors.append(f'Command {command} is not supported by the simulator')
+
+    def __i2c_read(self, payload, reply):
+        '''
+        Private method which handles an I2C_READ command. As in Telemetrix4Arduino, a read from
+        an address no driver acknowledges is reported as I2C_TOO_MANY_BYTES_RCVD, since fewer
+        bytes arrive than were requested.
+
+        Parameters:
+            self
+            payload (bytearray): [address, register, number of bytes, stop transmission,
+                                  i2c port, write register]
+            reply (bytearray): report bytes are appended here
+
+        Returns:
+            None
+        '''
+        address, register, number_of_bytes, _, i2c_port, write_register = payload[:6]
+        driver = self.drivers.get(address)
+        if driver is None:
+            reply += bytes([3, PrivateConstants.I2C_TOO_MANY_BYTES_RCVD, 1, address])
+            return
+        if write_register:
+            driver.pointer = register
+            self.__throttle_i2c(2)
+        data = driver.read(number_of_bytes)
+        self.__throttle_i2c(1 + number_of_bytes)
+        reply += bytes([number_of_bytes + 5, PrivateConstants.I2C_READ_REPORT, i2c_port,
+                        number_of_bytes, address, register]) + data
+
+    def __i2c_write(self, payload):
+        '''
+        Private method which handles an I2C_WRITE command. Every driver which acknowledges the
+        address receives the data, so broadcasts reach every listening driver.
+
+        Parameters:
+            self
+            payload (bytearray): [number of bytes, address, i2c port, data bytes...]
+
+        Returns:
+            None
+        '''
+        number_of_bytes, address = payload[0], payload[1]
+        data = bytes(payload[3:3 + number_of_bytes])
+        if self.i2c_writes is not None:
+            self.i2c_writes.append((time.monotonic(), address, data))
+        for driver in self.drivers.values():
+            if driver.responds_to(address):
+                driver.write(data)
+        self.__throttle_i2c(1 + number_of_bytes)
+
+    def __throttle(self, number_of_bytes):
+        '''
+        Private method which delays a command until its bytes would have arrived over a serial
+        line running at the simulated baud rate. Does nothing if baud is None.
+
+        Parameters:
+            self
+            number_of_bytes (int): length of the command including its packet length byte
+
+        Returns:
+            None
+        '''
+        if not self.baud:
+            return
+        now = time.monotonic()
+        self.__line_free = max(now, self.__line_free) + number_of_bytes * 10 / self.baud
+        if self.__line_free > now:
+            time.sleep(self.__line_free - now)
+
+    def __throttle_i2c(self, number_of_bytes):
+        '''
+        Private method which delays an I2C transaction for the time its bytes take on the bus at
+        the simulated I2C clock, at 9 clock cycles per byte. Does nothing if i2c_clock is None.
+
+        Parameters:
+            self
+            number_of_bytes (int): bytes in the transaction including the address byte
+
+        Returns:
+            None
+        '''
+        if self.i2c_clock:
+            time.sleep(number_of_bytes * 9 / self.i2c_clock)
+
+    def __serve_tcp(self):
+        '''
+        Private method run by the TCP serving thread. Accepts one client at a time and replies
+        to its commands until it disconnects or close is called.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        buffer = bytearray(4096)
+        while not self.__stop.is_set():
+            try:
+                self.__connection, _ = self.__server.accept()
+            except OSError:
+                return
+            self.__connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.__connection:
+                while not self.__stop.is_set():
+                    try:
+                        count = self.__connection.recv_into(buffer)
+                    except OSError:
+                        break
+                    if not count:
+                        break
+                    reply = self.feed(bytes(buffer[:count]))
+                    if reply:
+                        try:
+                            self.__connection.sendall(reply)
+                        except OSError:
+                            break
+            self.__connection = None
+            self.__buffer.clear()
+
+    def __serve_pty(self):
+        '''
+        Private method run by the pseudo-terminal serving thread. Replies to commands until
+        close is called.
+
+        Parameters:
+            self
+
+        Returns:
+            None
+        '''
+        while not self.__stop.is_set():
+            try:
+                data = os.read(self.__master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            reply = self.feed(data)
+            if reply:
+                os.write(self.__master, reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a simulated Telemetrix4Arduino board '
+                                                 'with PCA9685 drivers.')
+    transport = parser.add_mutually_exclusive_group(required=True)
+    transport.add_argument('--tcp', type=int, metavar='PORT', help='serve on a TCP port')
+    transport.add_argument('--pty', action='store_true', help='serve on a pseudo-terminal')
+    parser.add_argument('--address', type=int, action='append',
+                        help='I2C address of a PCA9685 driver; may be repeated (default 64)')
+    parser.add_argument('--baud', type=int, help='serial baud rate to throttle commands to')
+    parser.add_argument('--i2c-clock', type=int, help='I2C clock in Hz to throttle to')
+    args = parser.parse_args()
+
+    simulator = SimulatedArduino(i2c_addresses=args.address or [64], baud=args.baud,
+                                 i2c_clock=args.i2c_clock)
+    if args.pty:
+        print(f'Simulated board on {simulator.open_pty()}')
+    else:
+        host, port = simulator.serve_tcp(host='0.0.0.0', port=args.tcp)
+        print(f'Simulated board on {host}:{port}')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Shared pytest fixtures. Every test runs against a telemetrix_simulator.SimulatedArduino served
+over TCP, so the suite needs no hardware.
+
+Run from the repository root:
+    python -m pytest tests
+'''
+
+import contextlib
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetrix_controller
+from telemetrix_simulator import SimulatedArduino
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'warm_test.txt')
+
+
+def sync(board, timeout=5):
+    '''
+    Sends a loop back command and waits for its reply, so every command sent before it has been
+    handled by the simulated board.
+    '''
+    replied = threading.Event()
+    board.loop_back('S', callback=lambda data: replied.set())
+    if not replied.wait(timeout):
+        raise RuntimeError('Loop back reply timed out')
+
+
+@pytest.fixture
+def simulator():
+    simulator = SimulatedArduino(i2c_addresses=[64], record_i2c_writes=True)
+    yield simulator
+    simulator.close()
+
+
+@pytest.fixture
+def make_arduino(simulator):
+    '''
+    Returns a function which connects an Arduino to the simulator, passing on its keyword
+    arguments to the Arduino constructor. The board is shut down after the test.
+    '''
+    arduinos = []
+
+    def make_arduino(**kwargs):
+        host, port = simulator.serve_tcp()
+        with contextlib.redirect_stdout(sys.stderr):
+            arduino = telemetrix_controller.Arduino(CONFIG, config_cache=None, ip_address=host,
+                                                    ip_port=port, **kwargs)
+        arduinos.append(arduino)
+        return arduino
+
+    yield make_arduino
+    with contextlib.redirect_stdout(sys.stderr):
+        for arduino in arduinos:
+            arduino.get_attributes()['Board'].shutdown()
+
+
+@pytest.fixture
+def arduino(make_arduino):
+    return make_arduino()
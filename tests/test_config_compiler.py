@@ -0,0 +1,73 @@
+'''
+Tests of config_compiler's validation and compiled configuration cache.
+'''
+
+import numpy as np
+import pytest
+
+import config_compiler
+from conftest import CONFIG
+
+
+def write_config(path, config):
+    np.savetxt(path, config, fmt='%d')
+    return str(path)
+
+
+def assert_same_tables(first, second):
+    for name in config_compiler.CompiledConfig.TABLES:
+        np.testing.assert_array_equal(getattr(first, name), getattr(second, name))
+
+
+def test_duplicate_rows_are_rejected():
+    config = np.loadtxt(CONFIG, ndmin=2)
+    config[1, 0] = config[0, 0]
+
+    errors = config_compiler.validate_config(config)
+    assert f'Row {int(config[0, 0])} is configured 2 times' in errors
+    with pytest.raises(ValueError, match='configured 2 times'):
+        config_compiler.compile_array(config)
+
+
+@pytest.mark.parametrize('pin', config_compiler.SERIAL_PINS)
+def test_serial_pins_are_rejected_as_row_pins(tmp_path, pin):
+    config = np.loadtxt(CONFIG, ndmin=2)
+    config[0, 1] = pin
+
+    errors = config_compiler.validate_config(config)
+    assert any(error.startswith(f'Pin {pin} is one of the Arduino Nano\'s RX and TX pins')
+               for error in errors)
+    with pytest.raises(ValueError, match='RX and TX'):
+        config_compiler.compile_config(write_config(tmp_path / 'config.txt', config),
+                                       cache_dir=tmp_path / 'cache')
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_cache_hit_returns_identical_tables(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    compiled = config_compiler.compile_config(CONFIG, cache_dir=str(cache_dir))
+    assert len(list(cache_dir.glob('*.npz'))) == 1
+
+    # a cache hit neither parses nor validates the file again
+    def compile_array(config):
+        raise AssertionError('configuration was compiled again')
+
+    monkeypatch.setattr(config_compiler, 'compile_array', compile_array)
+    assert_same_tables(config_compiler.compile_config(CONFIG, cache_dir=str(cache_dir)),
+                       compiled)
+
+
+def test_edited_config_misses_the_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    config = np.loadtxt(CONFIG, ndmin=2)
+    file_path = write_config(tmp_path / 'config.txt', config)
+    compiled = config_compiler.compile_config(file_path, cache_dir=cache_dir)
+
+    # swap the pins of the first two rows
+    config[[0, 1], 1] = config[[1, 0], 1]
+    write_config(file_path, config)
+    edited = config_compiler.compile_config(file_path, cache_dir=cache_dir)
+
+    np.testing.assert_array_equal(edited.row_pins, compiled.row_pins[[1, 0, 2, 3, 4, 5]])
+    assert_same_tables(edited, config_compiler.compile_config(file_path, cache_dir=None))
+    assert len(list((tmp_path / 'cache').glob('*.npz'))) == 2
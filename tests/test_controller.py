@@ -0,0 +1,296 @@
+'''
+Tests of telemetrix_controller.Arduino against the simulated board.
+'''
+
+import time
+
+import numpy as np
+import pytest
+
+import telemetrix_controller
+from telemetrix.private_constants import PrivateConstants
+from telemetrix_pca9685 import pca9685_constants
+from telemetrix_simulator import SimulatedPCA9685
+from conftest import CONFIG, sync
+
+
+def test_interrupted_blocking_blink_turns_LED_off(arduino, simulator, monkeypatch):
+    wait = telemetrix_controller.Blink.wait
+
+    def interrupted_wait(blink, timeout=None):
+        # let the blink run for a few cycles, then interrupt it as Ctrl-C would
+        wait(blink, 0.25)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(telemetrix_controller.Blink, 'wait', interrupted_wait)
+    with pytest.raises(KeyboardInterrupt):
+        arduino.LED_blink(0, num_iter=100, period=0.1)
+
+    assert arduino._Arduino__blink_events == []
+    # any action which was still scheduled would have run by now
+    time.sleep(0.2)
+    board = arduino.get_attributes()['Board']
+    sync(board)
+
+    pin = arduino._led_pins[0]
+    channel = arduino._led_channels[0]
+    address = arduino._led_addresses[0]
+    assert simulator.drivers[address].channel(channel) == (0, 0)
+    assert simulator.pin_modes[pin] == PrivateConstants.AT_INPUT
+    assert not arduino._rows_on.any()
+    commands = simulator.command_count
+    time.sleep(0.2)
+    sync(board)
+    # only the loop back was handled, so the blink sent nothing more
+    assert simulator.command_count == commands + 1
+
+
+@pytest.mark.parametrize('broadcast_address', [None, 112])
+def test_set_pwm_freq_lets_oscillator_settle_before_restart(make_arduino, simulator,
+                                                            broadcast_address):
+    arduino = make_arduino(broadcast_address=broadcast_address)
+    simulator.i2c_writes.clear()
+    arduino.set_pwm_freq(200)
+    sync(arduino.get_attributes()['Board'])
+
+    mode1_writes = [(handled, data[1]) for handled, address, data in simulator.i2c_writes
+                    if data[0] == pca9685_constants.PCA9685_MODE1 and len(data) == 2]
+    # the last two MODE1 writes clear SLEEP, then set RESTART once the oscillator has settled
+    (woken, wake), (restarted, restart) = mode1_writes[-2:]
+    assert not wake & (pca9685_constants.MODE1_SLEEP | pca9685_constants.MODE1_RESTART)
+    assert restart & pca9685_constants.MODE1_RESTART
+    # the writes are timed where the simulator receives them, so allow for network jitter;
+    # batched writes would arrive together
+    assert restarted - woken >= pca9685_constants.OSCILLATOR_SETTLE_TIME / 2
+
+
+@pytest.mark.parametrize('bright', [[0, 5000], [-1, 100], [0, 10.5], 1.5])
+def test_invalid_brightness_is_rejected_before_any_write(make_arduino, simulator, bright):
+    event_log = telemetrix_controller.EventLog(capacity=16)
+    arduino = make_arduino(event_log=event_log)
+    board = arduino.get_attributes()['Board']
+    sync(board)
+    commands, events = simulator.command_count, event_log.count
+
+    with pytest.raises(ValueError):
+        arduino.LED_on(0, bright=bright)
+    sync(board)
+    # only the loop back was handled, and the shadow state and event log are unchanged
+    assert simulator.command_count == commands + 1
+    assert event_log.count == events
+    assert not arduino._rows_on.any()
+
+    arduino.LED_on(0, bright=[0, 4096])
+    assert event_log.events()[-1][['LED', 'on', 'off']].tolist() == (0, 0, 4096)
+
+
+def test_event_log_records_every_LED_a_change_lights_or_darkens(make_arduino):
+    event_log = telemetrix_controller.EventLog(capacity=64)
+    arduino = make_arduino(event_log=event_log)
+    num_cols = arduino._LEDs.shape[1]
+
+    def logged(action, *args, **kwargs):
+        count = event_log.count
+        action(*args, **kwargs)
+        return {(LED // num_cols, LED % num_cols, on, off)
+                for LED, on, off in event_log.events()[count - event_log.count:]
+                [['LED', 'on', 'off']].tolist()}
+
+    assert logged(arduino.LED_on, 0, 0) == {(0, 0, 0, 4095)}
+    assert logged(arduino.LED_on, 1, 0) == {(1, 0, 0, 4095)}
+    # lighting column 2 lights it in both rows which are on
+    assert logged(arduino.LED_on, 0, 2, bright=[0, 100]) == {(0, 2, 0, 100), (1, 2, 0, 100)}
+    # releasing row 0 and zeroing column 0 darkens the rest of row 0 and column 0
+    assert logged(arduino.LED_off, 0, 0) == {(0, 0, 0, 0), (0, 2, 0, 0), (1, 0, 0, 0)}
+
+    # each scan step's events are the LEDs its write changed, here in row 1 only
+    count = event_log.count
+    arduino.scan([num_cols + 1], 0.01, bright=[0, 100])
+    steps = event_log.events()[count - event_log.count:]
+    assert {(LED, on, off) for LED, on, off in steps[['LED', 'on', 'off']].tolist()} == {
+        (num_cols + 1, 0, 100), (num_cols + 2, 0, 0), (num_cols + 1, 0, 0)}
+
+
+def test_set_frame_only_writes_changed_rows_and_columns(arduino, simulator):
+    board = arduino.get_attributes()['Board']
+    num_rows, num_cols = arduino._LEDs.shape[0:2]
+    row_pins = list(arduino._led_pins[::num_cols])
+    channels = list(zip(arduino._led_addresses[:num_cols], arduino._led_channels[:num_cols]))
+
+    frame = np.zeros((num_rows, num_cols))
+    frame[[1, 3], 0] = 1
+    frame[[1, 3], 2] = 0.5
+    arduino.set_frame(frame)
+    sync(board)
+
+    # only columns 2 and 3 change, and the lit rows stay as they are
+    frame[[1, 3], 2] = 0
+    frame[[1, 3], 3] = 0.25
+    simulator.i2c_writes.clear()
+    commands = simulator.command_count
+    arduino.set_frame(frame)
+    sync(board)
+    assert sorted((address, data[0]) for _, address, data in simulator.i2c_writes) == sorted(
+        (int(address), pca9685_constants.PCA9685_LED0_ON_L + 4 * int(channel))
+        for address, channel in channels[2:4])
+    assert simulator.command_count == commands + 2 + 1
+
+    # only the lit rows change, so no channel is written
+    frame[[1, 3]] = 0
+    frame[4, [0, 3]] = 1, 0.25
+    simulator.i2c_writes.clear()
+    arduino.set_frame(frame)
+    sync(board)
+    assert simulator.i2c_writes == []
+    assert [simulator.pin_modes.get(pin) == PrivateConstants.AT_OUTPUT
+            for pin in row_pins] == [r == 4 for r in range(num_rows)]
+    assert simulator.pin_levels[row_pins[4]] == 0
+    for c, (address, channel) in enumerate(channels):
+        assert simulator.drivers[address].channel(channel) == (0, int(4095 * frame[4, c]))
+
+    # an unchanged frame sends nothing
+    commands = simulator.command_count
+    arduino.set_frame(frame)
+    sync(board)
+    assert simulator.command_count == commands + 1
+
+
+def test_OE_pin_blanks_the_outputs_while_a_frame_is_written(make_arduino, simulator,
+                                                           monkeypatch):
+    oe_pin = 12
+    arduino = make_arduino(oe_pin=oe_pin)
+    board = arduino.get_attributes()['Board']
+
+    arduino.blank()
+    sync(board)
+    assert simulator.pin_modes[oe_pin] == PrivateConstants.AT_OUTPUT
+    assert simulator.pin_levels[oe_pin] == 1
+    arduino.unblank()
+    sync(board)
+    assert simulator.pin_levels[oe_pin] == 0
+
+    # note the OE level at every channel write set_frame makes
+    oe_levels = []
+    for driver in simulator.drivers.values():
+        def write(data, write=driver.write):
+            oe_levels.append(simulator.pin_levels.get(oe_pin))
+            write(data)
+        monkeypatch.setattr(driver, 'write', write)
+    frame = np.zeros(arduino._LEDs.shape[0:2])
+    frame[[0, 2], 1] = 1
+    arduino.set_frame(frame)
+    sync(board)
+    assert oe_levels and set(oe_levels) == {1}
+    assert simulator.pin_levels[oe_pin] == 0
+
+    # set_frame leaves blanked outputs blanked
+    arduino.blank()
+    oe_levels.clear()
+    arduino.set_frame(frame * 0.5)
+    sync(board)
+    assert oe_levels and set(oe_levels) == {1}
+    assert simulator.pin_levels[oe_pin] == 1
+
+
+def test_event_log_keeps_the_newest_events_in_order_across_wrap_around(tmp_path):
+    ring_path = str(tmp_path / 'ring.npy')
+    event_log = telemetrix_controller.EventLog(capacity=24, file_path=ring_path)
+    EventLog = telemetrix_controller.EventLog
+
+    def expected(first, last):
+        sequence = np.arange(first, last)
+        return sequence, sequence % 7, 2 * sequence
+
+    # single events, then a record_many large enough to wrap around, then a few more of each
+    for n in range(10):
+        event_log.record(EventLog.LED, n % 7, 0, 2 * n, n, n + 1)
+    sequence, LEDs, off = expected(10, 30)
+    event_log.record_many(EventLog.LED, LEDs, 0, off, 10, 11)
+    sequence, LEDs, off = expected(30, 33)
+    event_log.record_many(EventLog.LED, LEDs, np.zeros(3), off, 30, 31)
+    for n in range(33, 35):
+        event_log.record(EventLog.LED, n % 7, 0, 2 * n, n, n + 1)
+    assert event_log.count == 35
+    assert len(event_log) == 24
+
+    sequence, LEDs, off = expected(11, 35)
+    events = event_log.events()
+    assert events['sequence'].tolist() == sequence.tolist()
+    assert events['LED'].tolist() == LEDs.tolist()
+    assert events['off'].tolist() == off.tolist()
+
+    saved_path = str(tmp_path / 'saved.npy')
+    event_log.save(saved_path)
+    np.testing.assert_array_equal(np.load(saved_path), events)
+    np.testing.assert_array_equal(EventLog.load(saved_path), events)
+    # the memory-mapped ring buffer holds the events in ring order until load sorts them
+    event_log.flush()
+    assert np.load(ring_path)['sequence'].tolist() != sequence.tolist()
+    np.testing.assert_array_equal(EventLog.load(ring_path), events)
+
+    # a ring buffer which has not wrapped around yet holds unused slots, which load drops
+    partial_path = str(tmp_path / 'partial.npy')
+    partial = EventLog(capacity=24, file_path=partial_path)
+    partial.record_many(EventLog.LED, LEDs[:5], 0, off[:5], 0, 1)
+    partial.flush()
+    assert EventLog.load(partial_path)['sequence'].tolist() == list(range(5))
+
+
+@pytest.mark.parametrize('oe_pin', [0, 1, 7])
+def test_OE_pin_cannot_be_a_serial_or_row_pin(make_arduino, simulator, oe_pin):
+    with pytest.raises(ValueError, match=f'OE pin {oe_pin}'):
+        make_arduino(oe_pin=oe_pin)
+    # the pin is checked before the board is connected to
+    assert simulator.command_count == 0
+
+
+@pytest.mark.parametrize('edit, error', [
+    # a fractional channel must not be truncated to a valid one
+    ((6, 1, 14.5), 'Configuration values must all be integers'),
+    # board 1's row 2 is on its RX pin
+    ((4, 1, 0), "Board 1: Pin 0 is one of the Arduino Nano's RX and TX pins"),
+    # board 0's columns 1 and 2 share a channel
+    ((7, 1, 15), 'Board 0: Channel 15 of driver 64 is used by columns [1, 2]'),
+])
+def test_shared_config_is_validated_for_every_board(tmp_path, edit, error):
+    config = np.loadtxt(CONFIG, ndmin=2)
+    # rows 1 to 3 on board 0 and rows 4 to 6 on board 1, each driving all 5 columns
+    config = np.concatenate((np.column_stack((config[:6], [0, 0, 0, 1, 1, 1])),
+                             np.column_stack((config[6:], np.zeros(5))),
+                             np.column_stack((config[6:], np.ones(5)))))
+    line, column, value = edit
+    config[line, column] = value
+    file_path = str(tmp_path / 'shared.txt')
+    np.savetxt(file_path, config, fmt='%g')
+
+    # the configuration is rejected before any board is connected to
+    with pytest.raises(ValueError) as raised:
+        telemetrix_controller.MultiArduino(file_path, [{}, {}])
+    assert error in str(raised.value)
+
+
+@pytest.mark.parametrize('broadcast_address', [None, 112])
+def test_resync_restores_a_power_cycled_driver(make_arduino, simulator, broadcast_address):
+    arduino = make_arduino(broadcast_address=broadcast_address)
+    attributes = arduino.get_attributes()
+    driver = attributes['Drivers'][0]
+    arduino.set_pwm_freq(200)
+    arduino.LED_on(0)
+    arduino.LED_on(arduino._LEDs.shape[1] + 2, bright=0.5)
+    sync(attributes['Board'])
+
+    # the driver loses every register, including MODE1's AI bit, PRESCALE and ALLCALLADR
+    simulator.drivers[driver.i2c_address] = SimulatedPCA9685(driver.i2c_address)
+    arduino.resync()
+    sync(attributes['Board'])
+
+    assert driver.verify() == []
+    simulated = simulator.drivers[driver.i2c_address]
+    assert not simulated.registers[pca9685_constants.PCA9685_MODE1] & \
+        pca9685_constants.MODE1_SLEEP
+    for n in (0, arduino._LEDs.shape[1] + 2):
+        assert simulated.channel(arduino._led_channels[n]) == \
+            arduino._channel_ticks[(arduino._led_addresses[n], arduino._led_channels[n])]
+    if broadcast_address is not None:
+        arduino.global_off()
+        assert all(simulated.channel(channel) == (0, 0) for channel in range(16))
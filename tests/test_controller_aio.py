@@ -0,0 +1,52 @@
+'''
+Tests of telemetrix_controller_aio.ArduinoAio against the simulated board.
+'''
+
+import asyncio
+import contextlib
+import sys
+
+import numpy as np
+import pytest
+
+from telemetrix_controller_aio import ArduinoAio
+from telemetrix_simulator import SimulatedArduino
+from conftest import CONFIG, sync
+
+
+def hardware_state(simulator):
+    return (dict(simulator.pin_modes), dict(simulator.pin_levels),
+            [simulator.drivers[64].channel(channel) for channel in range(16)])
+
+
+def test_set_frame_matches_sync_controller(arduino, simulator):
+    frame = np.zeros(arduino._LEDs.shape[0:2])
+    frame[[1, 3], 0] = 1
+    frame[[1, 3], 2] = 0.5
+    arduino.LED_on(0, 4, bright=0.25)
+    arduino.set_frame(frame)
+    sync(arduino.get_attributes()['Board'])
+
+    aio_simulator = SimulatedArduino(i2c_addresses=[64])
+    host, port = aio_simulator.serve_tcp()
+
+    async def drive():
+        async with ArduinoAio(CONFIG, config_cache=None, ip_address=host,
+                              ip_port=port) as aio_arduino:
+            await aio_arduino.LED_on(0, 4, bright=0.25)
+            await aio_arduino.set_frame(frame)
+            replied = asyncio.Event()
+            await aio_arduino.get_attributes()['Board'].loop_back(
+                'S', callback=lambda data: replied.set())
+            await asyncio.wait_for(replied.wait(), 5)
+            state = hardware_state(aio_simulator)
+            with pytest.raises(ValueError):
+                await aio_arduino.set_frame(np.eye(*frame.shape))
+            return state
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            aio_state = asyncio.run(drive())
+    finally:
+        aio_simulator.close()
+    assert aio_state == hardware_state(simulator)
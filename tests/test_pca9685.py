@@ -0,0 +1,82 @@
+'''
+Tests of telemetrix_pca9685.TelemetrixPCA9685 against the simulated board.
+'''
+
+import pytest
+
+from telemetrix_pca9685 import pca9685_constants
+from conftest import sync
+
+
+def test_reset_leaves_RESTART_out_of_shadow_MODE1(arduino, simulator):
+    driver = arduino.get_attributes()['Drivers'][0]
+    # the simulated MODE1 keeps RESTART set, as the real chip does until its PWM restarts
+    simulator.drivers[driver.i2c_address].registers[pca9685_constants.PCA9685_MODE1] |= \
+        pca9685_constants.MODE1_RESTART
+    driver.reset()
+
+    assert not (driver.shadow_registers[pca9685_constants.PCA9685_MODE1] &
+                pca9685_constants.MODE1_RESTART)
+    assert driver.verify() == []
+
+
+def test_timed_out_register_read_does_not_answer_the_next_read(arduino, simulator):
+    driver = arduino.get_attributes()['Drivers'][0]
+    # a 1 byte read takes over 100 ms at a 200 Hz I2C clock
+    simulator.i2c_clock = 200
+    driver.timeout = 0.05
+    with pytest.raises(RuntimeError):
+        driver.read_pre_scale()
+    simulator.i2c_clock = None
+    driver.timeout = 5
+
+    # the late reply to the abandoned read carries the old PRESCALE
+    old_prescale = driver.shadow_registers[pca9685_constants.PCA9685_PRESCALE]
+    driver.set_pwm_freq(200)
+    new_prescale = driver.shadow_registers[pca9685_constants.PCA9685_PRESCALE]
+    assert new_prescale != old_prescale
+    assert driver.read_pre_scale() == new_prescale
+    assert simulator.drivers[driver.i2c_address].registers[
+        pca9685_constants.PCA9685_PRESCALE] == new_prescale
+
+
+def test_set_pwm_many_splits_writes_to_fit_the_command_buffer(arduino, simulator):
+    driver = arduino.get_attributes()['Drivers'][0]
+    board = arduino.get_attributes()['Board']
+    values = [[channel, 100 * channel] for channel in range(16)]
+    sync(board)
+    simulator.i2c_writes.clear()
+    driver.set_pwm_many(0, values)
+    sync(board)
+
+    step = pca9685_constants.MAX_CHANNELS_PER_WRITE
+    assert [(address, data[0], len(data)) for _, address, data in simulator.i2c_writes] == [
+        (driver.i2c_address, pca9685_constants.PCA9685_LED0_ON_L + 4 * first,
+         1 + 4 * len(values[first:first + step])) for first in range(0, 16, step)]
+    simulated = simulator.drivers[driver.i2c_address]
+    assert [list(simulated.channel(channel)) for channel in range(16)] == values
+    assert driver.verify() == []
+
+
+def test_broadcast_writes_reach_every_driver_through_one_address(make_arduino, simulator):
+    arduino = make_arduino(broadcast_address=112)
+    attributes = arduino.get_attributes()
+    broadcast, driver = attributes['Broadcast'], attributes['Drivers'][0]
+    arduino.LED_on(0)
+    arduino.LED_on(arduino._LEDs.shape[1] + 2, bright=0.5)
+    sync(attributes['Board'])
+    simulator.i2c_writes.clear()
+
+    arduino.global_off()
+    arduino.set_pwm_freq(200)
+    sync(attributes['Board'])
+
+    assert {address for _, address, data in simulator.i2c_writes} == {112}
+    simulated = simulator.drivers[driver.i2c_address]
+    assert all(simulated.channel(channel) == (0, 0) for channel in range(16))
+    assert simulated.registers[pca9685_constants.PCA9685_PRESCALE] == \
+        driver.shadow_registers[pca9685_constants.PCA9685_PRESCALE] == \
+        broadcast.shadow_registers[pca9685_constants.PCA9685_PRESCALE]
+    assert broadcast.verify() == {}
+    with pytest.raises(RuntimeError):
+        broadcast.read_pre_scale()
@@ -0,0 +1,69 @@
+'''
+Tests of telemetrix.Telemetrix against the simulated board.
+'''
+
+import contextlib
+import sys
+import time
+
+import pytest
+
+from telemetrix import telemetrix
+from telemetrix_simulator import SimulatedArduino
+from conftest import sync
+
+
+@pytest.fixture
+def slow_board():
+    '''
+    A Telemetrix connected to a simulated board whose I2C clock is slow enough for a 1 byte read
+    to outlast a 50 ms timeout.
+    '''
+    simulator = SimulatedArduino(i2c_addresses=[64], i2c_clock=200)
+    host, port = simulator.serve_tcp()
+    with contextlib.redirect_stdout(sys.stderr):
+        board = telemetrix.Telemetrix(ip_address=host, ip_port=port)
+    board.set_pin_mode_i2c()
+    yield board, simulator
+    with contextlib.redirect_stdout(sys.stderr):
+        board.shutdown()
+    simulator.close()
+
+
+def test_late_reply_to_expired_read_is_dropped(slow_board):
+    board, simulator = slow_board
+    late = board.i2c_read_future(64, 0, 1, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        late.result(5)
+
+    # the late reply must neither kill the reporter thread nor complete the next read early
+    simulator.drivers[64].registers[0] = 0x5A
+    reply = board.i2c_read_future(64, 0, 1, timeout=5).result(5)
+    assert reply[5] == 0x5A
+    assert board.i2c_callback is None
+    assert board.i2c_expired == {}
+    sync(board)
+    assert simulator.errors == []
+
+
+def test_outstanding_reads_expire_independently(slow_board):
+    board, simulator = slow_board
+    first = board.i2c_read_future(64, 0, 1, timeout=0.05)
+    # the simulator replies to each chunk of bytes it receives at once, so keep the reads apart
+    time.sleep(0.01)
+    patient = board.i2c_read_future(64, 0, 1, timeout=5)
+    other = board.i2c_read_future(64, 1, 1, timeout=0.05)
+
+    for future in (first, other):
+        with pytest.raises(TimeoutError):
+            future.result(5)
+    # the reply to first arrives over 100 ms before patient's, and must not complete it
+    deadline = time.monotonic() + 5
+    while (0, 64, 0) in board.i2c_expired and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert (0, 64, 0) not in board.i2c_expired
+    assert not patient.done()
+    assert patient.result(5)[2:5] == [1, 64, 0]
+    sync(board)
+    assert board.i2c_pending == {}
+    assert board.i2c_expired == {}